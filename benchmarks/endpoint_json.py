@@ -0,0 +1,197 @@
+"""
+Times Endpoint.json on the shapes of the heaviest responses, quarterly bars
+of several groups and a sample of points on a map, against the former
+point by point implementation, and checks that both give the same output.
+
+    poetry run python benchmarks/endpoint_json.py --quarters 48 --points 1000
+"""
+
+import os
+import sys
+import timeit
+
+import click
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "deo_backend")]
+
+from fastapi_models import Endpoint, convert  # noqa: E402
+from plotly.graph_objs import Scatter  # noqa: E402
+
+
+def legacy_figure_json(fig) -> dict:
+    """Endpoint.json of a figure, formatting the hovertemplate of every point."""
+    x_axis_name = fig.layout.xaxis.title.text
+    y_axis_name = fig.layout.yaxis.title.text
+    annotations = list(fig.layout.annotations)
+    fig_data = []
+    fig_trendlines = []
+    for this_fig_data in fig.data:
+        i2 = 0
+        for x_val, y_val, custom_data in zip(
+            this_fig_data.x,
+            this_fig_data.y,
+            (
+                this_fig_data.customdata
+                if this_fig_data.customdata is not None
+                else [(y,) for y in this_fig_data.y]
+            ),
+        ):
+            if isinstance(this_fig_data, Scatter):
+                fig_trendlines.append(
+                    {
+                        "hover_text": this_fig_data.hovertemplate,
+                        x_axis_name: convert(x_val),
+                        y_axis_name: convert(y_val),
+                    }
+                )
+            else:
+                fig_data.append(
+                    {
+                        "group": this_fig_data["name"] or None,
+                        x_axis_name: convert(x_val),
+                        y_axis_name: convert(y_val),
+                        "annotation": annotations[i2].text if annotations else None,
+                        "hover_text": this_fig_data["hovertemplate"]
+                        .replace("%{", "{")
+                        .replace("customdata[0]", "z")
+                        .replace("customdata[1]", "z2")
+                        .replace("<extra></extra>", "")
+                        .format(
+                            x=x_val,
+                            y=y_val,
+                            z=custom_data[0],
+                            z2=custom_data[1] if len(custom_data) > 1 else "",
+                        )
+                        .split("<br>"),
+                    }
+                )
+            i2 += 1
+    return {
+        "properties": {
+            "xAxis": x_axis_name,
+            "yAxis": y_axis_name,
+            "title": fig.layout.title.text,
+        },
+        "trendlines": fig_trendlines,
+        "data": fig_data,
+    }
+
+
+def legacy_map_features(fig) -> list[dict]:
+    features = []
+    for map_data in fig.data:
+        lats = map_data["lat"]
+        lons = map_data["lon"]
+        customdata = getattr(map_data, "customdata", None)
+        for i, (lat, lon) in enumerate(zip(lats, lons)):
+            row = (
+                customdata[i]
+                if customdata is not None and i < len(customdata)
+                else None
+            )
+            hover_text = (
+                row[0] if row is not None and len(row) else (map_data["name"] or "")
+            )
+            features.append(
+                {
+                    "type": "Feature",
+                    "properties": {
+                        "name": map_data["name"] or hover_text,
+                        "hover_text": hover_text,
+                    },
+                    "geometry": {"type": "Point", "coordinates": [lon, lat]},
+                }
+            )
+    return features
+
+
+def quarterly_bars(quarters: int, groups: int):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "quarter": np.tile(
+                [f"{2010 + q // 4}-Q{q % 4 + 1}" for q in range(quarters)], groups
+            ),
+            "group": np.repeat([f"Group {g}" for g in range(groups)], quarters),
+            "n_stopped": rng.integers(0, 20_000, quarters * groups),
+            "rate": rng.random(quarters * groups),
+        }
+    )
+    fig = px.bar(
+        df,
+        x="quarter",
+        y="n_stopped",
+        color="group",
+        hover_data=["rate"],
+        labels={"quarter": "Quarter", "n_stopped": "Number of stops"},
+        title="Stops by group",
+    )
+    fig.update_traces(
+        hovertemplate="%{x}<br>%{y:,} stops<br>%{customdata[0]:.1%} of stops<extra></extra>"
+    )
+    return fig
+
+
+def sample_map(points: int):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame(
+        {
+            "lat": 39.95 + rng.random(points) / 10,
+            "lon": -75.16 + rng.random(points) / 10,
+            "hover": [f"Stop {i}" for i in range(points)],
+        }
+    )
+    return px.scatter_mapbox(
+        df, lat="lat", lon="lon", custom_data=["hover"], title="Sample of stops"
+    )
+
+
+def report(name: str, legacy, current, number: int):
+    legacy_time = min(timeit.repeat(legacy, number=number, repeat=5)) / number
+    current_time = min(timeit.repeat(current, number=number, repeat=5)) / number
+    print(
+        f"{name}: legacy {legacy_time * 1000:.2f}ms, "
+        f"current {current_time * 1000:.2f}ms, "
+        f"{legacy_time / current_time:.1f}x"
+    )
+
+
+@click.command
+@click.option("--quarters", default=48, show_default=True)
+@click.option("--groups", default=10, show_default=True)
+@click.option("--points", default=1000, show_default=True)
+@click.option("--number", default=20, show_default=True)
+def cli(quarters, groups, points, number):
+    endpoint = Endpoint("/benchmark", {})
+    bars = quarterly_bars(quarters, groups)
+    points_map = sample_map(points)
+
+    def current_bars():
+        return endpoint.json(fig_bars=bars)["figures"]["bars"]
+
+    def current_map():
+        return endpoint.json(map_points=points_map)["geojsons"][0]["features"]
+
+    assert current_bars() == legacy_figure_json(bars)
+    assert current_map() == legacy_map_features(points_map)
+
+    report(
+        f"bars ({quarters} quarters x {groups} groups)",
+        lambda: legacy_figure_json(bars),
+        current_bars,
+        number,
+    )
+    report(
+        f"map ({points} points)",
+        lambda: legacy_map_features(points_map),
+        current_map,
+        number,
+    )
+
+
+if __name__ == "__main__":
+    cli()
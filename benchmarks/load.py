@@ -0,0 +1,320 @@
+"""
+Load tests the real server: starts `main_fastapi:app` under uvicorn with
+`--workers` processes on localhost, sends a weighted mix of requests from
+`--concurrency` concurrent clients for `--duration` seconds, and reports the
+throughput, latency percentiles and the memory of each server process.
+
+    poetry run python benchmarks/load.py --workers 4 --concurrency 32
+    EXECUTION_BACKEND=processes poetry run python benchmarks/load.py
+
+The mix is either synthetic, every route equally often over the inputs of
+benchmarks/routes.py, or captured with `--traffic`: a file of uvicorn access
+log lines, or of `[weight] /path?query` lines. Responses are cached by the
+server as in production, unless `--bust-cache` makes every request unique.
+The env vars of the server (DB_FILENAME, EXECUTION_BACKEND...) are taken
+from this one's.
+
+Linux only, as memory is read from /proc.
+"""
+
+import asyncio
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+
+import click
+import httpx
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+BACKEND_DIR = os.path.join(ROOT, "deo_backend")
+
+ACCESS_LOG_REQUEST = re.compile(r'"GET (\S+) HTTP/[\d.]+"')
+
+
+def synthetic_mix() -> list[tuple[str, float]]:
+    """Every route with the same weight, spread over its inputs."""
+    from routes import ROUTERS, input_grid  # imports the app, so only if used
+
+    mix = []
+    for router in ROUTERS.values():
+        for route in router.routes:
+            grid = input_grid(route)
+            for _, params in grid:
+                query = urllib.parse.urlencode(params, doseq=True)
+                mix.append(
+                    (f"{route.path}?{query}" if query else route.path, 1 / len(grid))
+                )
+    return mix
+
+
+def captured_mix(path: str) -> list[tuple[str, float]]:
+    weights = {}
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            match = ACCESS_LOG_REQUEST.search(line)
+            if match:
+                weight, url = 1.0, match[1]
+            else:
+                parts = line.split()
+                weight, url = (
+                    (float(parts[0]), parts[1]) if len(parts) > 1 else (1.0, parts[0])
+                )
+            weights[url] = weights.get(url, 0) + weight
+    return list(weights.items())
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, port: int) -> subprocess.Popen:
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join([ROOT, BACKEND_DIR])}
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "main_fastapi:app",
+            "--app-dir",
+            BACKEND_DIR,
+            "--host",
+            "127.0.0.1",
+            "--port",
+            str(port),
+            "--workers",
+            str(workers),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+
+
+def wait_until_ready(server: subprocess.Popen, base_url: str, timeout: float = 300):
+    """Waits for a worker to answer, so once it loaded the data."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise click.ClickException(f"The server exited with {server.returncode}")
+        try:
+            if httpx.get(f"{base_url}/settings", timeout=5).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise click.ClickException(f"The server didn't answer within {timeout}s")
+
+
+def descendants(pid: int) -> list[tuple[int, int]]:
+    """The (pid, parent pid) of the processes under `pid`, parents first."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The command may have spaces, the fields after it don't
+                    parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+    found = []
+    queue = [pid]
+    while queue:
+        parent = queue.pop(0)
+        children = sorted(child for child, ppid in parents.items() if ppid == parent)
+        found += [(child, parent) for child in children]
+        queue += children
+    return found
+
+
+def memory(pid: int) -> dict:
+    """Current and peak resident memory of `pid`, in MB."""
+    fields = {}
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "VmHWM"):
+                fields[name] = round(int(value.split()[0]) / 1024, 1)
+    return {"rss_mb": fields.get("VmRSS"), "peak_rss_mb": fields.get("VmHWM")}
+
+
+def process_memory(server_pid: int) -> list[dict]:
+    processes = []
+    for pid, parent in [(server_pid, None), *descendants(server_pid)]:
+        try:
+            processes.append({"pid": pid, "parent": parent, **memory(pid)})
+        except OSError:
+            continue
+    return processes
+
+
+async def run_load(
+    base_url: str,
+    mix: list[tuple[str, float]],
+    concurrency: int,
+    warmup: float,
+    duration: float,
+    bust_cache: bool,
+    seed: int,
+) -> tuple[list[tuple[str, str, float]], float]:
+    """
+    The (route, status, seconds) of the requests sent after `warmup`, by
+    `concurrency` clients each sending its next request once answered.
+    """
+    urls = [url for url, _ in mix]
+    weights = [weight for _, weight in mix]
+    unique = itertools.count()
+    results = []
+    start = time.perf_counter()
+    record_from = start + warmup
+    stop_at = record_from + duration
+
+    async def client_loop(client: httpx.AsyncClient, rng: random.Random):
+        while time.perf_counter() < stop_at:
+            url = rng.choices(urls, weights)[0]
+            if bust_cache:
+                url += f"{'&' if '?' in url else '?'}nocache={next(unique)}"
+            sent = time.perf_counter()
+            try:
+                response = await client.get(url)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            if sent >= record_from:
+                results.append((url.split("?")[0], status, time.perf_counter() - sent))
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(
+        base_url=base_url, limits=limits, timeout=60
+    ) as client:
+        await asyncio.gather(
+            *[client_loop(client, random.Random(seed + i)) for i in range(concurrency)]
+        )
+    return results, time.perf_counter() - record_from
+
+
+def latency(seconds: list[float]) -> dict:
+    ms = np.array(seconds) * 1000
+    return {
+        "p50": round(float(np.percentile(ms, 50)), 1),
+        "p90": round(float(np.percentile(ms, 90)), 1),
+        "p99": round(float(np.percentile(ms, 99)), 1),
+        "max": round(float(ms.max()), 1),
+    }
+
+
+@click.command
+@click.option("--workers", default=1, show_default=True, help="uvicorn workers")
+@click.option("--concurrency", default=16, show_default=True, help="Concurrent clients")
+@click.option("--duration", default=30.0, show_default=True, help="Seconds measured")
+@click.option(
+    "--warmup", default=5.0, show_default=True, help="Seconds of load before measuring"
+)
+@click.option(
+    "--traffic",
+    type=click.Path(exists=True, dir_okay=False),
+    help="Captured requests to replay instead of the synthetic mix",
+)
+@click.option("--bust-cache", is_flag=True, help="Make every request miss the cache")
+@click.option("--port", type=int, help="Defaults to a free port")
+@click.option("--seed", default=0, show_default=True)
+@click.option(
+    "--output", type=click.Path(dir_okay=False), help="Where to write the JSON report"
+)
+def cli(
+    workers, concurrency, duration, warmup, traffic, bust_cache, port, seed, output
+):
+    mix = captured_mix(traffic) if traffic else synthetic_mix()
+    if not mix:
+        raise click.ClickException("No requests to send")
+    port = port or free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(workers, port)
+    try:
+        wait_until_ready(server, base_url)
+        cpu_start = time.process_time()
+        results, elapsed = asyncio.run(
+            run_load(base_url, mix, concurrency, warmup, duration, bust_cache, seed)
+        )
+        client_cpu = (time.process_time() - cpu_start) / (warmup + elapsed)
+        processes = process_memory(server.pid)
+    finally:
+        server.terminate()
+        try:
+            server.wait(30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    if not results:
+        raise click.ClickException("No request was answered")
+    statuses = {}
+    by_route = {}
+    for route, status, seconds in results:
+        statuses[status] = statuses.get(status, 0) + 1
+        by_route.setdefault(route, []).append(seconds)
+    report = {
+        "meta": {
+            "workers": workers,
+            "concurrency": concurrency,
+            "duration": round(elapsed, 1),
+            "mix": traffic or "synthetic",
+            "bust_cache": bust_cache,
+            "execution_backend": os.environ.get("EXECUTION_BACKEND", "threads"),
+            # Of a core, as the client shares the machine with the server
+            "client_cpu": round(client_cpu, 2),
+        },
+        "requests": len(results),
+        "throughput_rps": round(len(results) / elapsed, 1),
+        "statuses": dict(sorted(statuses.items())),
+        "latency_ms": latency([seconds for _, _, seconds in results]),
+        "routes": {
+            route: {"requests": len(seconds), "latency_ms": latency(seconds)}
+            for route, seconds in sorted(by_route.items())
+        },
+        "processes": processes,
+    }
+
+    print(
+        f"{report['requests']} requests in {elapsed:.1f}s: "
+        f"{report['throughput_rps']} req/s, statuses {report['statuses']}"
+    )
+    print("latency ms " + " ".join(f"{k} {v}" for k, v in report["latency_ms"].items()))
+    for route, summary in report["routes"].items():
+        lat = summary["latency_ms"]
+        print(
+            f"  {route}: {summary['requests']} requests,"
+            f" p50 {lat['p50']} p99 {lat['p99']} ms"
+        )
+    for process in processes:
+        role = (
+            "server" if process["parent"] is None else f"child of {process['parent']}"
+        )
+        print(
+            f"  pid {process['pid']} ({role}): {process['rss_mb']} MB,"
+            f" peak {process['peak_rss_mb']} MB"
+        )
+    if client_cpu > 0.8:
+        print(
+            f"WARNING: this client used {client_cpu:.0%} of a core, so it may be"
+            " the bottleneck rather than the server"
+        )
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,268 @@
+"""
+Times every route of ROUTERS in-process over a grid of inputs: each location
+level and a short and long quarter range for the routes taking them, and
+every value of their enum parameters. Each input is requested `--repeat`
+times cold (the response and filtered frame caches cleared) and as many
+times warm (only the response cache cleared, so the endpoint still runs).
+
+    poetry run python benchmarks/routes.py --output report.json
+    poetry run python benchmarks/routes.py --baseline report.json
+
+Exits with 1 when any request isn't answered with a 200, as its timing
+would be that of the error. With `--baseline`, also when the median cold or
+warm latency of a route is `--threshold` slower than in the baseline report
+(and at least `--min-ms` slower, to ignore noise on fast routes).
+"""
+
+import itertools
+import json
+import os
+import platform
+import sys
+import time
+import typing
+from datetime import datetime
+from enum import Enum
+
+import click
+import numpy as np
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path[:0] = [ROOT, os.path.join(ROOT, "deo_backend")]
+os.environ["SERVER_TYPE"] = "fastapi"
+
+from env import DB_FILENAME, FILTERED_DF_BACKEND  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from main_fastapi import app  # noqa: E402  (imports pages.*)
+from metrics import find_middleware  # noqa: E402
+from models import (  # noqa: E402
+    FILTERED_DF_CACHE,
+    FIRST_QUARTER,
+    FOUR_QUARTERS_AGO,
+    MOST_RECENT_QUARTER,
+    DemographicCategory,
+)
+from response_cache import ResponseCacheMiddleware  # noqa: E402
+from routers import ROUTERS  # noqa: E402
+
+LOCATIONS = {"citywide": "*", "division": "NWPD", "district": "22*", "psa": "22-1"}
+QUARTER_RANGES = {
+    "short": (FOUR_QUARTERS_AGO, MOST_RECENT_QUARTER),
+    "long": (FIRST_QUARTER, MOST_RECENT_QUARTER),
+}
+# Parameters whose values can't be told from their annotation
+VALUES_BY_NAME = {
+    "demographic_category": [category.value for category in DemographicCategory],
+}
+
+
+def choices(annotation) -> list | None:
+    """The values of an enum or Literal parameter, None for others."""
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        return [member.value for member in annotation]
+    if typing.get_origin(annotation) is typing.Literal:
+        return list(typing.get_args(annotation))
+    return None
+
+
+def required_value(name: str, annotation, params: dict):
+    """A value for a required parameter without a default."""
+    if name == "demographic_baseline":
+        return DemographicCategory(params["demographic_category"]).default_value
+    if name == "location":
+        return LOCATIONS["citywide"]
+    if name in VALUES_BY_NAME:
+        return VALUES_BY_NAME[name][0]
+    if typing.get_origin(annotation) is list:
+        # The first group of lists of groups
+        return choices(typing.get_args(annotation)[0])[:1]
+    return choices(annotation)[0]
+
+
+def input_grid(route) -> list[tuple[str, dict]]:
+    """The (label, query params) cases of `route`."""
+    fields = {field.alias: field for field in route.dependant.query_params}
+    variations = []
+    if "location" in fields:
+        variations.append(
+            [(f"location={k}", {"location": v}) for k, v in LOCATIONS.items()]
+        )
+    if "start_qyear" in fields and "end_qyear" in fields:
+        variations.append(
+            [
+                (f"quarters={k}", {"start_qyear": start, "end_qyear": end})
+                for k, (start, end) in QUARTER_RANGES.items()
+            ]
+        )
+    cases = [
+        (
+            ",".join(label for label, _ in combination),
+            dict(p for _, params in combination for p in params.items()),
+        )
+        for combination in itertools.product(*variations)
+    ]
+    for name, field in fields.items():
+        values = VALUES_BY_NAME.get(name) or choices(field.field_info.annotation)
+        if values is None or name == "location":
+            continue
+        cases += [(f"{name}={value}", {name: value}) for value in values]
+    cases = cases or [("", {})]
+
+    grid = {}
+    for label, params in cases:
+        for name, field in fields.items():
+            if field.required and name not in params:
+                params[name] = required_value(name, field.field_info.annotation, params)
+        key = json.dumps(params, sort_keys=True, default=str)
+        grid.setdefault(key, (label or "defaults", params))
+    return list(grid.values())
+
+
+def percentiles(values: list[float]) -> dict:
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "max": round(max(values), 2),
+    }
+
+
+def timed_get(
+    client: TestClient, path: str, params: dict, statuses: dict[int, int]
+) -> float:
+    """The milliseconds taken, counting the status in `statuses`."""
+    start = time.perf_counter()
+    response = client.get(path, params=params)
+    ms = (time.perf_counter() - start) * 1000
+    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    return ms
+
+
+def format_statuses(statuses: dict[int, int]) -> dict[str, int]:
+    return {str(status): n for status, n in sorted(statuses.items())}
+
+
+def compare(report: dict, baseline: dict, threshold: float, min_ms: float) -> list[str]:
+    regressions = []
+    for path, summary in report["routes"].items():
+        before = baseline["routes"].get(path)
+        if before is None:
+            continue
+        for temperature in ["cold", "warm"]:
+            new = summary[temperature]["p50"]
+            old = before[temperature]["p50"]
+            line = f"{path} {temperature}: {old:.1f} -> {new:.1f} ms"
+            if new > old * (1 + threshold) and new - old >= min_ms:
+                regressions.append(line)
+                line += "  REGRESSION"
+            print(line)
+    return regressions
+
+
+@click.command
+@click.option(
+    "--repeat",
+    default=3,
+    type=click.IntRange(min=1),
+    show_default=True,
+    help="Cold and warm requests per input",
+)
+@click.option(
+    "--route", "route_filter", default="", help="Only the routes containing this"
+)
+@click.option(
+    "--output", type=click.Path(dir_okay=False), help="Where to write the JSON report"
+)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    help="A report to compare to",
+)
+@click.option(
+    "--threshold", default=0.2, show_default=True, help="Slowdown ratio failing"
+)
+@click.option("--min-ms", default=5.0, show_default=True, help="Slowdown in ms ignored")
+def cli(repeat, route_filter, output, baseline, threshold, min_ms):
+    routes = [
+        route
+        for router in ROUTERS.values()
+        for route in router.routes
+        if route_filter in route.path
+    ]
+    report = {
+        "meta": {
+            "time": datetime.now().isoformat(timespec="seconds"),
+            "db": DB_FILENAME,
+            "filtered_df_backend": FILTERED_DF_BACKEND,
+            "python": platform.python_version(),
+            "repeat": repeat,
+        },
+        "routes": {},
+        "cases": [],
+    }
+    failed = []
+    # Entered to run the lifespan, which loads the data. Errors are counted as
+    # 500s rather than raised
+    with TestClient(app, raise_server_exceptions=False) as client:
+        client.get("/settings")  # builds the middleware stack
+        response_cache = find_middleware(app, ResponseCacheMiddleware)
+        for route in routes:
+            cold = []
+            warm = []
+            statuses = {}
+            for label, params in input_grid(route):
+                cold_ms = []
+                warm_ms = []
+                case_statuses = {}
+                for _ in range(repeat):
+                    response_cache.clear()
+                    FILTERED_DF_CACHE.clear()
+                    cold_ms.append(timed_get(client, route.path, params, case_statuses))
+                    response_cache.clear()
+                    warm_ms.append(timed_get(client, route.path, params, case_statuses))
+                for status, n in case_statuses.items():
+                    statuses[status] = statuses.get(status, 0) + n
+                if case_statuses.keys() != {200}:
+                    failed.append(f"{route.path} {label}: statuses {case_statuses}")
+                cold += cold_ms
+                warm += warm_ms
+                report["cases"].append(
+                    {
+                        "route": route.path,
+                        "case": label,
+                        "params": params,
+                        "statuses": format_statuses(case_statuses),
+                        "cold_ms": percentiles(cold_ms),
+                        "warm_ms": percentiles(warm_ms),
+                    }
+                )
+            report["routes"][route.path] = {
+                "inputs": len(cold) // repeat,
+                "statuses": format_statuses(statuses),
+                "cold": percentiles(cold),
+                "warm": percentiles(warm),
+            }
+            summary = report["routes"][route.path]
+            print(
+                f"{route.path}: {summary['inputs']} inputs, cold p50 {summary['cold']['p50']:.1f} ms,"
+                f" warm p50 {summary['warm']['p50']:.1f} ms, statuses {summary['statuses']}"
+            )
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Wrote {output}")
+    if failed:
+        print(f"{len(failed)} inputs answered with errors, their timings are moot:")
+        for line in failed:
+            print(f"  {line}")
+        sys.exit(1)
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(report, json.load(f), threshold, min_ms)
+        if regressions:
+            print(f"{len(regressions)} regressions past {threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
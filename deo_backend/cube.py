@@ -0,0 +1,144 @@
+import numpy as np
+import pandas as pd
+
+# Number of source rows that landed in each cell. Used to tell an observed
+# zero apart from a combination that never occurred in the table.
+ROW_COUNT = "n_rows"
+
+# Marginals kept by each cube
+MAX_MARGINALS = 32
+
+
+class StopCube:
+    """
+    Dense int32 array of pre-aggregated counts, one axis per dimension column
+    plus a trailing measure axis. Geography and time filters become integer
+    indexing on the first axes, and aggregations become axis sums.
+    """
+
+    def __init__(self, values: np.ndarray, labels: dict[str, pd.Index], measures):
+        self.values = values
+        self.labels = labels
+        self.dimensions = list(labels)
+        self.measures = list(measures)
+        # Sums over the dropped dimensions, by kept dimensions
+        self._marginals: dict[tuple[str, ...], np.ndarray] = {}
+
+    @classmethod
+    def from_df(
+        cls,
+        df: pd.DataFrame,
+        /,
+        *,
+        dimensions: dict[str, list[str] | None],
+        measures: list[str],
+    ):
+        labels = {}
+        codes = []
+        for dimension, order in dimensions.items():
+            column = df[dimension]
+            is_missing = column.isna().to_numpy()
+            observed = set(column[~is_missing].unique())
+            categories = [v for v in order or [] if v in observed]
+            categories += sorted(observed.difference(categories))
+            dimension_codes = pd.Index(categories).get_indexer(column)
+            if is_missing.any():
+                # Missing values (e.g. rows without a PSA) get their own label
+                # so that totals over the axis still match the table.
+                dimension_codes[is_missing] = len(categories)
+                categories.append(None)
+            labels[dimension] = pd.Index(categories, name=dimension, dtype=object)
+            codes.append(dimension_codes)
+
+        shape = tuple(len(v) for v in labels.values())
+        flat_codes = np.ravel_multi_index(codes, shape)
+        all_measures = list(measures) + [ROW_COUNT]
+        values = np.zeros((int(np.prod(shape)), len(all_measures)), dtype=np.int32)
+        for i, measure in enumerate(measures):
+            values[:, i] = np.bincount(
+                flat_codes, weights=df[measure].to_numpy(), minlength=values.shape[0]
+            )
+        values[:, -1] = np.bincount(flat_codes, minlength=values.shape[0])
+        return cls(values.reshape(shape + (len(all_measures),)), labels, all_measures)
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+    def _axis(self, dimension):
+        return self.dimensions.index(dimension)
+
+    def _marginal(self, kept_dimensions: tuple[str, ...]):
+        marginal = self._marginals.get(kept_dimensions)
+        if marginal is None:
+            dropped_axes = tuple(
+                self._axis(d) for d in self.dimensions if d not in kept_dimensions
+            )
+            marginal = self.values.sum(axis=dropped_axes, dtype=np.int64)
+            if len(self._marginals) >= MAX_MARGINALS:
+                # The oldest, as they are as large as the cube at worst
+                self._marginals.pop(next(iter(self._marginals)), None)
+            self._marginals[kept_dimensions] = marginal
+        return marginal
+
+    def _indexer(self, dimension, selection):
+        labels = self.labels[dimension]
+        if selection is None:
+            return slice(None)
+        if isinstance(selection, tuple):
+            # (first, last) inclusive range; the axis labels are sorted
+            first, last = selection
+            return slice(
+                labels.searchsorted(first, side="left"),
+                labels.searchsorted(last, side="right"),
+            )
+        if isinstance(selection, str):
+            selection = [selection]
+        positions = labels.get_indexer(selection)
+        return [int(p) for p in positions if p != -1]
+
+    def select(
+        self,
+        measures: list[str],
+        /,
+        *,
+        by: list[str] = (),
+        where: dict[str, str | list[str] | tuple[str, str] | None] | None = None,
+    ):
+        """
+        Returns the summed `measures` (plus the row count) for the cells
+        matching `where`, kept along the `by` dimensions, along with the labels
+        of each kept axis.
+        """
+        where = {k: v for k, v in (where or {}).items() if v is not None}
+        kept = tuple(d for d in self.dimensions if d in where or d in by)
+        values = self._marginal(kept)
+        labels = {}
+        for i, dimension in enumerate(kept):
+            indexer = self._indexer(dimension, where.get(dimension))
+            index = [slice(None)] * values.ndim
+            index[i] = indexer
+            values = values[tuple(index)]
+            labels[dimension] = self.labels[dimension][indexer]
+        summed_axes = tuple(i for i, d in enumerate(kept) if d not in by)
+        values = values.sum(axis=summed_axes)
+        measure_positions = [self.measures.index(m) for m in measures] + [-1]
+        return values[..., measure_positions], {d: labels[d] for d in by}
+
+    def total(self, measures: list[str], /, *, where=None) -> pd.Series:
+        values, _ = self.select(measures, where=where)
+        return pd.Series(values, index=list(measures) + [ROW_COUNT])
+
+    def aggregate(self, measures: list[str], /, *, by: list[str], where=None):
+        """
+        Equivalent of `df.groupby(by)[measures].sum()` for the rows matching
+        `where`: only combinations that occur in the source table are kept.
+        """
+        values, labels = self.select(measures, by=by, where=where)
+        index = pd.MultiIndex.from_product(labels.values(), names=list(by))
+        df = pd.DataFrame(
+            values.reshape(-1, len(measures) + 1),
+            index=index if len(by) > 1 else index.get_level_values(0),
+            columns=list(measures) + [ROW_COUNT],
+        )
+        return df[df[ROW_COUNT] > 0].drop(columns=ROW_COUNT)
@@ -61,19 +61,22 @@ def demographic_dropdown(html_id, plural: bool = False):
     )
 
 
+LOCATION_OPTIONS = [
+    {"label": "PSA 22-1", "value": "22-1"},
+    {"label": "PSA 19-2", "value": "19-2"},
+    {"label": "PSA 17-1", "value": "17-1"},
+    {"label": "PSA 9-1", "value": "09-1"},
+    {"label": "District 22", "value": "22*"},
+    {"label": "District 24", "value": "24*"},
+    {"label": "NWPD", "value": "NWPD"},
+    {"label": "Philadelphia", "value": "*"},
+]
+
+
 def location_dropdown(html_id):
     return dcc.Dropdown(
         placeholder="location",
-        options=[
-            {"label": "PSA 22-1", "value": "22-1"},
-            {"label": "PSA 19-2", "value": "19-2"},
-            {"label": "PSA 17-1", "value": "17-1"},
-            {"label": "PSA 9-1", "value": "09-1"},
-            {"label": "District 22", "value": "22*"},
-            {"label": "District 24", "value": "24*"},
-            {"label": "NWPD", "value": "NWPD"},
-            {"label": "Philadelphia", "value": "*"},
-        ],
+        options=LOCATION_OPTIONS,
         value="*",
         id=html_id,
         style={"display": "inline-block", "width": "200px"},
@@ -84,8 +87,10 @@ def qyear_dropdown(html_id, /, *, default, how: QuarterHow = QuarterHow.start):
     return dcc.Dropdown(
         placeholder="quarter-year",
         options=[
-            {"label": v.month_and_year(how), "value": v.quarter_and_year}
-            for v in QUARTERS.values
+            {"label": label, "value": value}
+            for label, value in zip(
+                QUARTERS.month_and_year_labels(how), QUARTERS.year_quarters
+            )
         ],
         value=default,
         id=html_id,
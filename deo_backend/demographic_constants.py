@@ -2,50 +2,85 @@ import pandas as pd
 from models import RacialGroup
 import os
 from deo_backend.env import DATA_DIR
+from lazy import cache_once, lazy_module_getattr
 
 
+@cache_once
+def police_geographies():
+    return pd.read_csv(
+        os.path.join(DATA_DIR, "demographics/police_geographies.csv"),
+        dtype=str,
+    )
 
-POLICE_GEOGRAPHIES = pd.read_csv(
-    os.path.join(DATA_DIR, "demographics/police_geographies.csv"),
-    dtype=str,
-)
 
-DEMOGRAPHICS_DF = pd.read_csv(
-    os.path.join(DATA_DIR, "demographics/police_service_area.csv"),
-    dtype={"PSA_NUM": str},
-).set_index("PSA_NUM")
-
-DEMOGRAPHICS_PSA = DEMOGRAPHICS_DF.to_dict("index")
-
-DEMOGRAPHICS_DISTRICT = DEMOGRAPHICS_DF.join(
-    POLICE_GEOGRAPHIES.set_index("full_psa_num")["district"]
-).set_index("district")
-DEMOGRAPHICS_DISTRICT = DEMOGRAPHICS_DISTRICT.groupby(DEMOGRAPHICS_DISTRICT.index).sum()
-
-DEMOGRAPHICS_DIVISION = DEMOGRAPHICS_DF.join(
-    POLICE_GEOGRAPHIES.set_index("full_psa_num")["division"]
-).set_index("division")
-DEMOGRAPHICS_DIVISION = DEMOGRAPHICS_DIVISION.groupby(DEMOGRAPHICS_DIVISION.index).sum()
-DEMOGRAPHICS_TOTAL = DEMOGRAPHICS_DF.sum().to_dict()
-
-# Align with ODP columns
-DEMOGRAPHICS_TOTAL.pop("total")
-DEMOGRAPHICS_TOTAL[RacialGroup.white.value] = DEMOGRAPHICS_TOTAL.pop("white")
-DEMOGRAPHICS_TOTAL[RacialGroup.black.value] = DEMOGRAPHICS_TOTAL.pop("black")
-DEMOGRAPHICS_TOTAL[RacialGroup.asian.value] = DEMOGRAPHICS_TOTAL.pop("asian")
-DEMOGRAPHICS_TOTAL[RacialGroup.latino.value] = DEMOGRAPHICS_TOTAL.pop(
-    "hispanic_or_latino"
-)
-DEMOGRAPHICS_TOTAL[RacialGroup.other_race.value] = DEMOGRAPHICS_TOTAL.pop(
-    "american_indian"
-) + DEMOGRAPHICS_TOTAL.pop("unknown")
+@cache_once
+def demographics_df():
+    return pd.read_csv(
+        os.path.join(DATA_DIR, "demographics/police_service_area.csv"),
+        dtype={"PSA_NUM": str},
+    ).set_index("PSA_NUM")
+
+
+@cache_once
+def demographics_district():
+    df = (
+        demographics_df()
+        .join(police_geographies().set_index("full_psa_num")["district"])
+        .set_index("district")
+    )
+    return df.groupby(df.index).sum()
+
+
+@cache_once
+def demographics_division():
+    df = (
+        demographics_df()
+        .join(police_geographies().set_index("full_psa_num")["division"])
+        .set_index("division")
+    )
+    return df.groupby(df.index).sum()
+
+
+@cache_once
+def demographics_total():
+    total = demographics_df().sum().to_dict()
+
+    # Align with ODP columns
+    total.pop("total")
+    total[RacialGroup.white.value] = total.pop("white")
+    total[RacialGroup.black.value] = total.pop("black")
+    total[RacialGroup.asian.value] = total.pop("asian")
+    total[RacialGroup.latino.value] = total.pop("hispanic_or_latino")
+    total[RacialGroup.other_race.value] = total.pop("american_indian") + total.pop(
+        "unknown"
+    )
+    return total
+
 
 # By neighborhood
-whiteness_of_districts = (
-    DEMOGRAPHICS_DISTRICT["white"] / DEMOGRAPHICS_DISTRICT["total"]
-).sort_values()
-districts_by_nonwhiteness = whiteness_of_districts.index
-MAJORITY_WHITE_DISTRICTS = whiteness_of_districts[whiteness_of_districts > 0.5].index
-MAJORITY_NONWHITE_DISTRICTS = whiteness_of_districts[
-    whiteness_of_districts <= 0.5
-].index
+@cache_once
+def _whiteness_of_districts():
+    district = demographics_district()
+    return (district["white"] / district["total"]).sort_values()
+
+
+# The CSVs are read on first access to these names rather than at import
+__getattr__ = lazy_module_getattr(
+    __name__,
+    {
+        "POLICE_GEOGRAPHIES": police_geographies,
+        "DEMOGRAPHICS_DF": demographics_df,
+        "DEMOGRAPHICS_PSA": lambda: demographics_df().to_dict("index"),
+        "DEMOGRAPHICS_DISTRICT": demographics_district,
+        "DEMOGRAPHICS_DIVISION": demographics_division,
+        "DEMOGRAPHICS_TOTAL": demographics_total,
+        "whiteness_of_districts": _whiteness_of_districts,
+        "districts_by_nonwhiteness": lambda: _whiteness_of_districts().index,
+        "MAJORITY_WHITE_DISTRICTS": lambda: _whiteness_of_districts()[
+            _whiteness_of_districts() > 0.5
+        ].index,
+        "MAJORITY_NONWHITE_DISTRICTS": lambda: _whiteness_of_districts()[
+            _whiteness_of_districts() <= 0.5
+        ].index,
+    },
+)
@@ -32,3 +32,28 @@ def db_name(zip_filename):
 
 # DB_FILENAME is derived from the zip filename: open_data_philly_YYYY_MM_DD.db
 DB_FILENAME = os.environ.get("DB_FILENAME") or db_name(ZIP_FILENAME)
+
+# "memory" serves FilteredDf from tables loaded in each worker, "sql" pushes
+# filters and aggregations down to the SQLite DB to keep workers small.
+FILTERED_DF_BACKEND = os.environ.get("FILTERED_DF_BACKEND", "memory")
+
+# Directory written by prerender.py. When set, the responses in it are served
+# instead of calling the endpoints, as long as they were rendered for this DB.
+PRERENDER_DIR = os.environ.get("PRERENDER_DIR")
+
+# "threads" runs the endpoints in the threadpool of the API process,
+# "processes" in EXECUTION_WORKERS processes forked once the tables are
+# loaded, with at most EXECUTION_QUEUE_SIZE requests waiting for one before
+# answering 503.
+EXECUTION_BACKEND = os.environ.get("EXECUTION_BACKEND", "threads")
+EXECUTION_WORKERS = int(os.environ.get("EXECUTION_WORKERS") or os.cpu_count())
+EXECUTION_QUEUE_SIZE = int(
+    os.environ.get("EXECUTION_QUEUE_SIZE") or 4 * EXECUTION_WORKERS
+)
+
+# See profiling.py. Endpoints slower than PROFILE_THRESHOLD_MS are sampled
+# and requests signed with PROFILE_SECRET are profiled, keeping the last
+# PROFILE_BUFFER_SIZE profiles.
+PROFILE_THRESHOLD_MS = os.environ.get("PROFILE_THRESHOLD_MS")
+PROFILE_SECRET = os.environ.get("PROFILE_SECRET")
+PROFILE_BUFFER_SIZE = int(os.environ.get("PROFILE_BUFFER_SIZE") or 20)
@@ -0,0 +1,215 @@
+"""
+Where the endpoints of the routers run. FastAPI runs sync endpoints in the
+threadpool of the API process, where the pandas and Plotly work of every
+request shares one GIL. Once `start_process_pool()` is called (see
+EXECUTION_BACKEND), they run in processes forked after the tables were
+loaded, which also encode the responses, so that a single API process uses
+every core.
+"""
+
+import asyncio
+import importlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable
+
+from fastapi import HTTPException, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from profiling import PROFILE_REQUEST, Capture, keep_profile, run_profiled
+from response_format import GEOMETRY_DETAIL, GEOMETRY_FORMAT, RESPONSE_FORMAT
+from starlette.concurrency import run_in_threadpool
+from starlette.routing import request_response
+from timing import STAGES, add_stages, span
+
+# Set by the route dependencies and read by the endpoints
+CONTEXT_VARS = [RESPONSE_FORMAT, GEOMETRY_FORMAT, GEOMETRY_DETAIL, PROFILE_REQUEST]
+
+# The endpoints of the ExecutionRoutes by route id, which the forked workers
+# have too
+ENDPOINTS: dict[str, Callable] = {}
+
+
+async def join_body(response: StreamingResponse) -> bytes:
+    return b"".join([chunk async for chunk in response.body_iterator])
+
+
+def call_endpoint(
+    route_id: str, values: dict, context: list
+) -> tuple[int, list[tuple[bytes, bytes]], bytes, dict[str, float], Capture | None]:
+    """
+    Runs an endpoint in a worker, returning its encoded response, the stages
+    timed doing so and its profile if any.
+    """
+    for var, value in zip(CONTEXT_VARS, context):
+        var.set(value)
+    stages = {}
+    STAGES.set(stages)
+    capture = None
+    try:
+        with span("handler"):
+            response, capture = run_profiled(ENDPOINTS[route_id], values)
+    except HTTPException as e:
+        # Like FastAPI's handler, as it can't be pickled back
+        response = JSONResponse(
+            {"detail": e.detail}, status_code=e.status_code, headers=e.headers
+        )
+    with span("encode"):
+        if isinstance(response, StreamingResponse):
+            body = asyncio.run(join_body(response))
+        elif isinstance(response, Response):
+            body = response.body
+        else:
+            response = JSONResponse(jsonable_encoder(response))
+            body = response.body
+    return response.status_code, response.raw_headers, body, stages, capture
+
+
+class ProcessPool:
+    """
+    `workers` processes running the endpoints, with at most `queue_size`
+    requests waiting for one. Requests beyond that are answered with a 503
+    rather than queued.
+
+    When a worker dies (e.g. killed for its memory), the pool can't run
+    anything anymore: the requests it was running are answered with a 503
+    and new workers are started. Those are spawned rather than forked, since
+    this process is running threads by then, and run `warmup` themselves.
+    """
+
+    def __init__(self, workers: int, queue_size: int, warmup: Callable[[], None]):
+        self.workers = workers
+        self.warmup = warmup
+        self.executor = self._fork()
+        self.max_pending = workers + queue_size
+        self.pending = 0
+
+    def _fork(self) -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(
+            self.workers, mp_context=multiprocessing.get_context("fork")
+        )
+        # The first task forks every worker, at startup before any other
+        # thread starts
+        executor.submit(int).result()
+        return executor
+
+    def _spawn(self) -> ProcessPoolExecutor:
+        # Started as tasks come, without waiting for them to load the tables
+        modules = sorted({endpoint.__module__ for endpoint in ENDPOINTS.values()})
+        return ProcessPoolExecutor(
+            self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=load_worker,
+            initargs=(modules, self.warmup),
+        )
+
+    def _restart(self, broken: ProcessPoolExecutor):
+        # Once for all the requests that were running in the broken pool
+        if self.executor is not broken:
+            return
+        print("EXECUTION: a worker died, spawning the process pool again")
+        broken.shutdown(wait=False, cancel_futures=True)
+        self.executor = self._spawn()
+
+    async def run(self, route_id: str, values: dict) -> tuple[Response, Capture | None]:
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                503, "Too many requests, retry shortly", headers={"Retry-After": "1"}
+            )
+        context = [var.get() for var in CONTEXT_VARS]
+        executor = self.executor
+        try:
+            future = executor.submit(call_endpoint, route_id, values, context)
+        except BrokenProcessPool:
+            # Broke while idle, so nothing ran yet
+            self._restart(executor)
+            executor = self.executor
+            future = executor.submit(call_endpoint, route_id, values, context)
+        self.pending += 1
+        try:
+            with span("pool"):
+                status_code, headers, body, stages, capture = await asyncio.wrap_future(
+                    future
+                )
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise HTTPException(
+                503, "A worker died, retry shortly", headers={"Retry-After": "1"}
+            )
+        finally:
+            self.pending -= 1
+        add_stages(stages)
+        response = Response(body, status_code)
+        response.raw_headers += [
+            (name, value) for name, value in headers if name != b"content-length"
+        ]
+        return response, capture
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+def load_worker(modules: list[str], warmup: Callable[[], None]):
+    """
+    Sets up a spawned worker: importing the modules of the endpoints adds
+    them to ENDPOINTS, then `warmup` loads the tables.
+    """
+    for module in modules:
+        importlib.import_module(module)
+    warmup()
+
+
+_pool: ProcessPool | None = None
+
+
+def start_process_pool(workers: int, queue_size: int, warmup: Callable[[], None]):
+    """
+    Forks the workers, so once the tables they use are loaded by `warmup`,
+    which the workers started again after one died run themselves.
+    """
+    global _pool
+    _pool = ProcessPool(workers, queue_size, warmup)
+
+
+def stop_process_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
+
+
+def process_pool_pending() -> int | None:
+    """The requests running or waiting in the pool, None without a pool."""
+    return None if _pool is None else _pool.pending
+
+
+class ExecutionRoute(APIRoute):
+    """
+    An APIRoute running its sync endpoint in the process pool once started,
+    or in the threadpool like FastAPI does otherwise, profiled as set up in
+    profiling.py.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, endpoint, **kwargs)
+        if asyncio.iscoroutinefunction(endpoint):
+            return
+        route_id = self.unique_id
+        ENDPOINTS[route_id] = endpoint
+
+        async def dispatch(**values):
+            if _pool is None:
+                with span("handler"):
+                    result, capture = await run_in_threadpool(
+                        run_profiled, endpoint, values
+                    )
+            else:
+                result, capture = await _pool.run(route_id, values)
+            keep_profile(path, values, capture)
+            return result
+
+        self.dependant.call = dispatch
+        # Built again so that FastAPI awaits `dispatch`
+        self.app = request_response(self.get_route_handler())
@@ -1,14 +1,30 @@
+import itertools
+import json
 import os
 import urllib.parse
-from typing import Annotated
+from typing import Annotated, Callable, Iterable, Iterator
 
 import numpy as np
 import pandas as pd
 from dash import dcc
 from fastapi import Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from figure_specs import BarSpec, ChoroplethSpec, bar_records
 from flask import request
 from models import DemographicCategory
 from plotly.graph_objs import Scatter
+from geometry import geometry_url, load_geometry
+from timing import span
+from response_format import (
+    GEOMETRY_DETAIL,
+    GEOMETRY_FORMAT,
+    RESPONSE_FORMAT,
+    GeometryDetail,
+    GeometryFormat,
+    ResponseFormat,
+    columnar,
+)
 
 API_DOMAIN = os.environ.get("API_DOMAIN", "http://0.0.0.0:8123")
 
@@ -26,7 +42,7 @@ demographic_annotation = Annotated[
 
 
 def convert(x):
-    if isinstance(x, np.int64):
+    if isinstance(x, np.integer):
         return int(x)
     elif isinstance(x, float):
         if pd.isna(x) or np.isinf(x):
@@ -37,6 +53,112 @@ def convert(x):
         return x
 
 
+def point_features(map_data) -> Iterator[dict]:
+    """GeoJSON points of a mapbox trace, hovering the first customdata column."""
+    name = map_data["name"] or ""
+    lats = map_data["lat"]
+    lons = map_data["lon"]
+    n = min(len(lats), len(lons))
+    hover_texts = [name] * n
+    customdata = getattr(map_data, "customdata", None)
+    if customdata is not None:
+        hover_texts[: len(customdata)] = [
+            row[0] if len(row) else name for row in customdata[:n]
+        ]
+    for lat, lon, hover_text in zip(lats, lons, hover_texts):
+        yield {
+            "type": "Feature",
+            "properties": {
+                "name": name or hover_text,
+                "hover_text": hover_text,
+            },
+            "geometry": {
+                "type": "Point",
+                "coordinates": [lon, lat],
+            },
+        }
+
+
+class LazyFeatures:
+    """
+    The features of an Endpoint.json GeoJSON, made one at a time each time
+    they are iterated, by json_chunks, rather than built up front. Lists are
+    added with `extend` and generators with `extend_with` their function, so
+    that the same GeoJSON can be encoded more than once.
+    """
+
+    def __init__(self):
+        self.sources: list[Callable[[], Iterable[dict]]] = []
+
+    def extend(self, features: list[dict]):
+        self.sources.append(lambda: features)
+
+    def extend_with(self, func: Callable[..., Iterable[dict]], *args):
+        self.sources.append(lambda: func(*args))
+
+    def __iter__(self) -> Iterator[dict]:
+        for source in self.sources:
+            yield from source()
+
+
+def dumps(value) -> str:
+    # The encoding of FastAPI's JSONResponse
+    return json.dumps(
+        value,
+        ensure_ascii=False,
+        allow_nan=False,
+        indent=None,
+        separators=(",", ":"),
+        default=jsonable_encoder,
+    )
+
+
+def json_chunks(content: dict, chunk_size: int = 2**16) -> Iterator[bytes]:
+    """
+    The JSON of an Endpoint.json response, encoding the features of its
+    GeoJSONs one at a time, as they are made, rather than the whole response
+    at once.
+    """
+
+    def members(obj: dict, encode_value) -> Iterator[str]:
+        yield "{"
+        for i, (key, value) in enumerate(obj.items()):
+            yield f"{',' if i else ''}{dumps(key)}:"
+            yield from encode_value(key, value)
+        yield "}"
+
+    def geojson_value(key, value) -> Iterator[str]:
+        if key != "features":
+            yield dumps(value)
+            return
+        yield "["
+        for i, feature in enumerate(value):
+            yield ("," if i else "") + dumps(feature)
+        yield "]"
+
+    def content_value(key, value) -> Iterator[str]:
+        if key != "geojsons":
+            yield dumps(jsonable_encoder(value))
+            return
+        yield "["
+        for i, geojson in enumerate(value):
+            if i:
+                yield ","
+            yield from members(geojson, geojson_value)
+        yield "]"
+
+    buffer = []
+    size = 0
+    for part in members(content, content_value):
+        buffer.append(part)
+        size += len(part)
+        if size >= chunk_size:
+            yield "".join(buffer).encode()
+            buffer = []
+            size = 0
+    yield "".join(buffer).encode()
+
+
 class Endpoint:
     def __init__(self, api_route, inputs, data=None, **kwargs):
         for kw in kwargs:
@@ -50,6 +172,16 @@ class Endpoint:
     def output(self, data=None, **kwargs):
         if os.environ.get("SERVER_TYPE", "dash") == "dash":
             return self.plotly(**kwargs)
+        elif any(kw.startswith("map_") for kw in kwargs):
+            # GeoJSONs are large, so they are sent as they are encoded. The
+            # first chunk is encoded before the response starts, so that an
+            # error making the first features is still answered with a 500.
+            # One after that aborts the response, which isn't cached.
+            chunks = json_chunks(self.json(data=data, **kwargs))
+            first = next(chunks)
+            return StreamingResponse(
+                itertools.chain([first], chunks), media_type="application/json"
+            )
         else:
             return self.json(data=data, **kwargs)
 
@@ -72,6 +204,8 @@ class Endpoint:
                 )
             elif isinstance(val, dcc.Markdown):
                 raise NotImplementedError("Replace with direct string")
+            elif isinstance(val, (BarSpec, ChoroplethSpec)):
+                kwarg_vals.append(val.plotly())
             else:
                 kwarg_vals.append(val)
 
@@ -81,21 +215,39 @@ class Endpoint:
     def full_api_route(self) -> str:
         return f"{API_DOMAIN}{self.api_route}"
 
+    @span("json")
     def json(self, data=None, **kwargs):
         figures = {}
         texts = []
         tables = {}
         geojsons = []
+        reference = GEOMETRY_FORMAT.get() == GeometryFormat.reference
+        detail = GEOMETRY_DETAIL.get()
         for map_key in [kw for kw in kwargs if kw.startswith("map_")]:
+            if isinstance(kwargs[map_key], ChoroplethSpec):
+                geojsons.append(
+                    kwargs[map_key].json(map_key, reference=reference, detail=detail)
+                )
+                continue
             geojson = {
                 "type": "FeatureCollection",
-                "features": [],
+                "features": LazyFeatures(),
                 "properties": {
                     "title": kwargs[map_key].layout.title.text,
                     "map_key": map_key,
                 },
             }
-            if kwargs[map_key].layout.mapbox.layers:
+            meta = kwargs[map_key].layout.meta or {}
+            if reference and "geometry" in meta:
+                # The layers are the features of one of the GEOMETRIES
+                geojson["properties"]["geometry"] = geometry_url(
+                    meta["geometry"], detail
+                )
+            elif "geometry" in meta and detail != GeometryDetail.full:
+                geojson["features"].extend(
+                    load_geometry(meta["geometry"], detail)["features"]
+                )
+            elif kwargs[map_key].layout.mapbox.layers:
                 # Used by the HIN Map
                 geojson["features"].extend(
                     [feature.source for feature in kwargs[map_key].layout.mapbox.layers]
@@ -106,81 +258,48 @@ class Endpoint:
                         # Used by Comparison by District Maps
                         geojson["features"].extend(map_data.geojson["features"])
                     elif map_data.subplot == "mapbox":
-                        lats = map_data["lat"]
-                        lons = map_data["lon"]
-                        customdata = getattr(map_data, "customdata", None)
-                        for i, (lat, lon) in enumerate(zip(lats, lons)):
-                            row = customdata[i] if customdata is not None and i < len(customdata) else None
-                            hover_text = row[0] if row is not None and len(row) else (map_data["name"] or "")
-                            geojson["features"].append(
-                                {
-                                    "type": "Feature",
-                                    "properties": {
-                                        "name": map_data["name"] or hover_text,
-                                        "hover_text": hover_text,
-                                    },
-                                    "geometry": {
-                                        "type": "Point",
-                                        "coordinates": [lon, lat],
-                                    },
-                                }
-                            )
+                        geojson["features"].extend_with(point_features, map_data)
                     geojsons.append(geojson)
         for fig_key in [kw for kw in kwargs if kw.startswith("fig_")]:
             fig_name = fig_key[len("fig_") :]
             fig = kwargs[fig_key]
+            if isinstance(fig, BarSpec):
+                figures[fig_name] = fig.json()
+                continue
 
             x_axis_name = fig.layout.xaxis.title.text
             y_axis_name = fig.layout.yaxis.title.text
-            annotations = list(fig.layout.annotations)
+            annotations = [annotation.text for annotation in fig.layout.annotations]
 
             fig_data = []
             fig_trendlines = []
 
-            for i, this_fig_data in enumerate(fig.data):
-                i2 = 0
-                for x_val, y_val, custom_data in zip(
-                    this_fig_data.x,
-                    this_fig_data.y,
-                    (
-                        this_fig_data.customdata
-                        if this_fig_data.customdata is not None
-                        else [(y,) for y in this_fig_data.y]
-                    ),
-                ):
-                    if isinstance(this_fig_data, Scatter):
-                        # Indicates a trendline
-                        fig_trendlines.append(
-                            {
-                                "hover_text": this_fig_data.hovertemplate,
-                                x_axis_name: convert(x_val),
-                                y_axis_name: convert(y_val),
-                            }
-                        )
-                    else:
-                        fig_data.append(
-                            {
-                                "group": this_fig_data["name"] or None,
-                                x_axis_name: convert(x_val),
-                                y_axis_name: convert(y_val),
-                                "annotation": annotations[i2].text
-                                if annotations
-                                else None,
-                                "hover_text": this_fig_data["hovertemplate"]
-                                .replace("%{", "{")
-                                .replace("customdata[0]", "z")
-                                .replace("customdata[1]", "z2")
-                                .replace("<extra></extra>", "")
-                                .format(
-                                    x=x_val,
-                                    y=y_val,
-                                    z=custom_data[0],
-                                    z2=custom_data[1] if len(custom_data) > 1 else "",
-                                )
-                                .split("<br>"),
-                            }
-                        )
-                    i2 += 1
+            for this_fig_data in fig.data:
+                x_vals = this_fig_data.x
+                y_vals = this_fig_data.y
+                if isinstance(this_fig_data, Scatter):
+                    # Indicates a trendline
+                    fig_trendlines += [
+                        {
+                            "hover_text": this_fig_data.hovertemplate,
+                            x_axis_name: convert(x_val),
+                            y_axis_name: convert(y_val),
+                        }
+                        for x_val, y_val in zip(x_vals, y_vals)
+                    ]
+                    continue
+                fig_data += bar_records(
+                    group=this_fig_data["name"] or None,
+                    x_axis_name=x_axis_name,
+                    y_axis_name=y_axis_name,
+                    x=x_vals,
+                    y=y_vals,
+                    x_values=list(map(convert, x_vals)),
+                    y_values=list(map(convert, y_vals)),
+                    customdata=this_fig_data.customdata,
+                    annotations=annotations,
+                    hovertemplate=this_fig_data["hovertemplate"],
+                )
             figures[fig_name] = {
                 "properties": {
                     "xAxis": x_axis_name,
@@ -200,6 +319,11 @@ class Endpoint:
             table_name = table_key[len("table_") :]
             table = kwargs[table_key]
             tables[table_name] = table.rowData
+        if RESPONSE_FORMAT.get() == ResponseFormat.columnar:
+            for figure in figures.values():
+                figure["data"] = columnar(figure["data"])
+                figure["trendlines"] = columnar(figure["trendlines"])
+            tables = {name: columnar(rows) for name, rows in tables.items()}
         return {
             "text": texts,
             "figures": figures,
@@ -0,0 +1,292 @@
+import itertools
+import re
+import string
+from dataclasses import dataclass, field
+from typing import Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+from geometry import GEOMETRIES, feature_id, geometry_url, load_geometry
+from response_format import GeometryDetail
+from timing import span
+
+
+def json_values(series: pd.Series) -> list:
+    """Python values of `series`, with None for NaN and infinities."""
+    values = series.tolist()
+    if pd.api.types.is_float_dtype(series.dtype):
+        for i in np.flatnonzero(~np.isfinite(series.to_numpy())):
+            values[i] = None
+    return values
+
+
+class HoverTemplate:
+    """
+    A hovertemplate parsed once into the literal text and `str.format` fields
+    of each of its `<br>` lines. `%{customdata[0]}` and `%{customdata[1]}`
+    are the fields `z` and `z2`.
+    """
+
+    CONVERSIONS = {"r": repr, "s": str, "a": ascii}
+    # The argument name of a field like `x.attr` or `z[0]`
+    ARG_NAME = re.compile(r"[^.\[]*")
+
+    def __init__(self, hovertemplate: str):
+        template = (
+            hovertemplate.replace("%{", "{")
+            .replace("customdata[0]", "z")
+            .replace("customdata[1]", "z2")
+            .replace("<extra></extra>", "")
+        )
+        self.lines = [
+            list(string.Formatter().parse(line)) for line in template.split("<br>")
+        ]
+
+    def render(self, n: int, fields: dict[str, Sequence]) -> list[list[str]]:
+        """
+        The hover text lines of `n` points, formatting a whole column of
+        `fields` at a time.
+        """
+        lines = []
+        for line in self.lines:
+            parts = []
+            for literal, name, spec, conversion in line:
+                if literal:
+                    parts.append(itertools.repeat(literal, n))
+                if name is not None:
+                    values = self.field_values(name, fields)
+                    if conversion:
+                        values = map(self.CONVERSIONS[conversion], values)
+                    parts.append(map(format, values, itertools.repeat(spec, n)))
+            lines.append(["".join(p) for p in zip(*parts)] if parts else [""] * n)
+        return [list(texts) for texts in zip(*lines)]
+
+    @classmethod
+    def field_values(cls, name: str, fields: dict[str, Sequence]) -> Sequence:
+        """The values of field `name`, with its attributes and indexes if any."""
+        arg_name = cls.ARG_NAME.match(name)[0]
+        if arg_name == name:
+            return fields[name]
+        formatter = string.Formatter()
+        return [
+            formatter.get_field(name, (), {arg_name: value})[0]
+            for value in fields[arg_name]
+        ]
+
+
+def bar_records(
+    *,
+    group: str | None,
+    x_axis_name: str,
+    y_axis_name: str,
+    x: Sequence,
+    y: Sequence,
+    x_values: list,
+    y_values: list,
+    customdata: Sequence | None,
+    annotations: list[str],
+    hovertemplate: str,
+) -> list[dict]:
+    """
+    The Endpoint.json records of a bar trace, built column by column. `x`
+    and `y` are formatted in the hover text, `x_values` and `y_values` are
+    their JSON values.
+    """
+    if customdata is None:
+        n = min(len(x), len(y))
+        z, z2 = y, itertools.repeat("", n)
+    else:
+        n = min(len(x), len(y), len(customdata))
+        z = [row[0] for row in customdata]
+        z2 = [row[1] if len(row) > 1 else "" for row in customdata]
+    hover_texts = HoverTemplate(hovertemplate).render(
+        n, {"x": x, "y": y, "z": z, "z2": z2}
+    )
+    if annotations:
+        annotations = [annotations[i] for i in range(n)]
+    else:
+        annotations = itertools.repeat(None, n)
+    return [
+        {
+            "group": group,
+            x_axis_name: x_value,
+            y_axis_name: y_value,
+            "annotation": annotation,
+            "hover_text": hover_text,
+        }
+        for x_value, y_value, annotation, hover_text in zip(
+            x_values, y_values, annotations, hover_texts
+        )
+    ]
+
+
+@dataclass
+class BarSpec:
+    """
+    The arguments of a `px.bar` figure, with the hovertemplate of its traces
+    (per `color` value if a dict, with px's own for the values left out) and
+    the updates made to its layout and traces. Dash renders it with
+    `plotly()`, while `json()` builds the Endpoint.json figure straight from
+    `df` without making a Figure.
+    """
+
+    df: pd.DataFrame
+    x: str
+    y: str
+    title: str
+    hovertemplate: str | dict[str, str]
+    labels: dict[str, str] = field(default_factory=dict)
+    color: str | None = None
+    color_discrete_map: dict[str, str] | None = None
+    barmode: str | None = None
+    hover_data: list[str] = field(default_factory=list)
+    layout: dict = field(default_factory=dict)
+    traces: dict = field(default_factory=dict)
+
+    def trace_hovertemplate(self, group: str) -> str:
+        if isinstance(self.hovertemplate, str):
+            return self.hovertemplate
+        if group in self.hovertemplate:
+            return self.hovertemplate[group]
+        return self.default_hovertemplate(group)
+
+    def default_hovertemplate(self, group: str) -> str:
+        """The hovertemplate px.bar gives the trace of `group`."""
+        lines = [
+            f"{self.labels.get(self.x, self.x)}=%{{x}}",
+            f"{self.labels.get(self.y, self.y)}=%{{y}}",
+        ] + [
+            f"{self.labels.get(col, col)}=%{{customdata[{i}]}}"
+            for i, col in enumerate(self.hover_data)
+        ]
+        if self.color is not None:
+            lines.insert(0, f"{self.labels.get(self.color, self.color)}={group}")
+        return "<br>".join(lines) + "<extra></extra>"
+
+    def groups(self) -> list[tuple[str, pd.DataFrame]]:
+        """The rows of each trace, in the order px.bar makes the traces."""
+        if self.color is None:
+            return [("", self.df)]
+        colors = self.df[self.color]
+        return [(str(value), self.df[colors == value]) for value in colors.unique()]
+
+    def plotly(self) -> go.Figure:
+        options = {
+            "color": self.color,
+            "color_discrete_map": self.color_discrete_map,
+            "barmode": self.barmode,
+            "hover_data": self.hover_data or None,
+        }
+        fig = px.bar(
+            self.df,
+            x=self.x,
+            y=self.y,
+            title=self.title,
+            labels=self.labels,
+            **{k: v for k, v in options.items() if v is not None},
+        )
+        for trace in fig.data:
+            trace.hovertemplate = self.trace_hovertemplate(trace.legendgroup)
+        if self.layout:
+            fig.update_layout(**self.layout)
+        if self.traces:
+            fig.update_traces(**self.traces)
+        return fig
+
+    @span("figure")
+    def json(self) -> dict:
+        x_axis_name = self.labels.get(self.x, self.x)
+        y_axis_name = self.labels.get(self.y, self.y)
+        annotations = [a["text"] for a in self.layout.get("annotations", [])]
+        fig_data = []
+        for group, df in self.groups():
+            customdata = None
+            if self.hover_data:
+                customdata = list(zip(*(df[col].tolist() for col in self.hover_data)))
+            fig_data += bar_records(
+                group=group or None,
+                x_axis_name=x_axis_name,
+                y_axis_name=y_axis_name,
+                x=df[self.x].tolist(),
+                y=df[self.y].tolist(),
+                x_values=json_values(df[self.x]),
+                y_values=json_values(df[self.y]),
+                customdata=customdata,
+                annotations=annotations,
+                hovertemplate=self.trace_hovertemplate(group),
+            )
+        return {
+            "properties": {
+                "xAxis": x_axis_name,
+                "yAxis": y_axis_name,
+                "title": self.title,
+            },
+            "trendlines": [],
+            "data": fig_data,
+        }
+
+
+@dataclass
+class ChoroplethSpec:
+    """
+    A choropleth of one of the GEOMETRIES, with the `properties` added to the
+    features drawn, by feature id. Only those features are drawn, without
+    copying the shared geometry. `locations`, `z` and `text` are those of the
+    trace and `trace` its other arguments.
+    """
+
+    geometry: str
+    title: str
+    properties: dict[str, dict]
+    locations: list
+    z: list
+    text: list
+    trace: dict = field(default_factory=dict)
+    layout: dict = field(default_factory=dict)
+
+    def features(self, detail: GeometryDetail = GeometryDetail.full) -> Iterator[dict]:
+        """The features drawn, made one at a time as they are encoded."""
+        for feature in load_geometry(self.geometry, detail)["features"]:
+            properties = self.properties.get(feature_id(self.geometry, feature))
+            if properties is not None:
+                yield {**feature, "properties": {**feature["properties"], **properties}}
+
+    def plotly(self) -> go.Figure:
+        fig = go.Figure(
+            go.Choroplethmapbox(
+                geojson={
+                    "type": "FeatureCollection",
+                    "features": list(self.features()),
+                },
+                featureidkey=f"properties.{GEOMETRIES[self.geometry].id_property}",
+                locations=self.locations,
+                z=self.z,
+                text=self.text,
+                **self.trace,
+            )
+        )
+        fig.update_layout(title=self.title, **self.layout)
+        return fig
+
+    @span("figure")
+    def json(
+        self,
+        map_key: str,
+        reference: bool = False,
+        detail: GeometryDetail = GeometryDetail.full,
+    ) -> dict:
+        """
+        The Endpoint.json GeoJSON, or with `reference` the URL of the geometry
+        and the `values` to join to its features by id.
+        """
+        geojson = {
+            "type": "FeatureCollection",
+            "features": [] if reference else self.features(detail),
+            "properties": {"title": self.title, "map_key": map_key},
+        }
+        if reference:
+            geojson["properties"]["geometry"] = geometry_url(self.geometry, detail)
+            geojson["values"] = self.properties
+        return geojson
@@ -0,0 +1,64 @@
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, NamedTuple
+
+import pandas as pd
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    entries: int
+    nbytes: int
+
+
+class FrameCache:
+    """
+    LRU cache of DataFrames bounded by both entry count and memory.
+
+    Callers get a copy of the cached frame, so that neither adding columns to
+    it nor writing into it can change the cached entry.
+    """
+
+    def __init__(self, *, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[Hashable, tuple[pd.DataFrame, int]] = OrderedDict()
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, create: Callable[[], pd.DataFrame]) -> pd.DataFrame:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0].copy()
+            self.misses += 1
+
+        df = create()
+        nbytes = int(df.memory_usage(index=True).sum())
+        with self._lock:
+            if key not in self._entries and nbytes <= self.max_bytes:
+                self._entries[key] = (df, nbytes)
+                self._nbytes += nbytes
+                while (
+                    len(self._entries) > self.max_entries
+                    or self._nbytes > self.max_bytes
+                ):
+                    _, (_, evicted_nbytes) = self._entries.popitem(last=False)
+                    self._nbytes -= evicted_nbytes
+        return df.copy()
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, len(self._entries), self._nbytes)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+            self.hits = 0
+            self.misses = 0
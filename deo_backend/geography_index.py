@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+
+# The quarterly tables are far below 2**31 rows
+POSITION_DTYPE = np.int32
+EMPTY_POSITIONS = np.array([], dtype=POSITION_DTYPE)
+
+
+class GeographyIndex:
+    """
+    Sorted row positions of a table for every division, district and
+    `district-psa` key, so a geography filter is a single `take`.
+    """
+
+    def __init__(self, positions: dict[str, np.ndarray]):
+        self.positions = positions
+
+    @classmethod
+    def from_df(cls, df: pd.DataFrame, /, *, divisions: dict[str, list[str]]):
+        positions = {}
+        by_district: dict[str, list[np.ndarray]] = {}
+        groups = df.groupby(["districtoccur", "psa"], observed=True, dropna=False)
+        for (district, psa), rows in groups.indices.items():
+            rows = rows.astype(POSITION_DTYPE)
+            if pd.isna(district):
+                continue
+            by_district.setdefault(district, []).append(rows)
+            if not pd.isna(psa):
+                positions[f"{district}-{psa}"] = np.sort(rows)
+        for district, rows in by_district.items():
+            positions[district] = np.sort(np.concatenate(rows))
+        for division, districts in divisions.items():
+            rows = [positions[d] for d in districts if d in positions]
+            positions[division] = (
+                np.sort(np.concatenate(rows)) if rows else EMPTY_POSITIONS
+            )
+        return cls(positions)
+
+    def get(self, key: str) -> np.ndarray:
+        return self.positions.get(key, EMPTY_POSITIONS)
+
+    @property
+    def nbytes(self):
+        return sum(v.nbytes for v in self.positions.values())
@@ -0,0 +1,113 @@
+"""
+The geometries drawn by the maps, served by their own routes so that map
+responses requested with `geometry=reference` only carry the values of each
+feature and the versioned URL of the geometry to join them to. Each is also
+served simplified for `detail=medium|low`, see update_db/simplify_maps.py.
+"""
+
+import hashlib
+import json
+import os
+from typing import Annotated, Callable, NamedTuple
+
+from fastapi import APIRouter, Query, Response
+from lazy import cache_once
+from models import (
+    hin_geojson_2020,
+    hin_geojson_2025,
+    police_districts_geojson,
+    police_psas_geojson,
+)
+from response_format import GeometryDetail
+
+MAPS_DIR = os.path.join(os.path.dirname(__file__), "maps")
+
+
+class Geometry(NamedTuple):
+    load: Callable[[], dict]
+    # The property identifying a feature, which becomes its `id`
+    id_property: str
+    # The name of the maps/ files, `<filename>.<detail>.geojson` when simplified
+    filename: str
+
+
+GEOMETRIES = {
+    "police-districts": Geometry(
+        police_districts_geojson, "DIST_NUMC", "police_districts"
+    ),
+    "police-psas": Geometry(police_psas_geojson, "PSA_NUM", "police_psas"),
+    "hin-2020": Geometry(hin_geojson_2020, "objectid", "hin_2020"),
+    "hin-2025": Geometry(hin_geojson_2025, "objectid", "hin_2025"),
+}
+
+
+def feature_id(name: str, feature: dict):
+    return feature["properties"][GEOMETRIES[name].id_property]
+
+
+@cache_once
+def load_geometry(name: str, detail: GeometryDetail = GeometryDetail.full) -> dict:
+    geometry = GEOMETRIES[name]
+    if detail == GeometryDetail.full:
+        return geometry.load()
+    with open(
+        os.path.join(MAPS_DIR, f"{geometry.filename}.{detail.value}.geojson")
+    ) as f:
+        return json.load(f)
+
+
+@cache_once
+def geometry_body(name: str, detail: GeometryDetail) -> bytes:
+    features = [
+        {"type": "Feature", "id": feature_id(name, feature), **feature}
+        for feature in load_geometry(name, detail)["features"]
+    ]
+    return json.dumps(
+        {"type": "FeatureCollection", "features": features},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode()
+
+
+@cache_once
+def geometry_version(name: str, detail: GeometryDetail) -> str:
+    return hashlib.sha256(geometry_body(name, detail)).hexdigest()[:16]
+
+
+def geometry_url(name: str, detail: GeometryDetail = GeometryDetail.full) -> str:
+    query = "" if detail == GeometryDetail.full else f"detail={detail.value}&"
+    return f"/geometry/{name}?{query}v={geometry_version(name, detail)}"
+
+
+router = APIRouter(tags=["Geometry"])
+
+
+def geometry_route(name: str):
+    def api_func(
+        detail: GeometryDetail = GeometryDetail.full,
+        v: Annotated[
+            str | None,
+            Query(description="The version given in the URLs of the map responses"),
+        ] = None,
+    ) -> Response:
+        # The URL of a version never changes, others are revalidated
+        if v == geometry_version(name, detail):
+            cache_control = "public, max-age=31536000, immutable"
+        else:
+            cache_control = "no-cache"
+        return Response(
+            geometry_body(name, detail),
+            media_type="application/geo+json",
+            headers={"cache-control": cache_control},
+        )
+
+    return api_func
+
+
+for name in GEOMETRIES:
+    router.add_api_route(
+        f"/geometry/{name}",
+        geometry_route(name),
+        methods=["GET"],
+        summary=f"The {name} GeoJSON, with the `id` of each feature",
+    )
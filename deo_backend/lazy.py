@@ -0,0 +1,57 @@
+import functools
+import sys
+import threading
+from typing import Any, Callable
+
+
+def cache_once(func):
+    """
+    `functools.cache` for loaders shared between threads: concurrent first
+    calls with the same arguments wait for a single call to `func`.
+    """
+    results = {}
+    locks: dict[tuple, threading.Lock] = {}
+    locks_lock = threading.Lock()
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        try:
+            return results[args]
+        except KeyError:
+            pass
+        with locks_lock:
+            lock = locks.setdefault(args, threading.Lock())
+        with lock:
+            if args not in results:
+                results[args] = func(*args)
+        return results[args]
+
+    def cache_clear():
+        with locks_lock:
+            results.clear()
+            locks.clear()
+
+    wrapper.cache_clear = cache_clear
+    return wrapper
+
+
+def lazy_module_getattr(module_name: str, factories: dict[str, Callable[[], Any]]):
+    """
+    Module `__getattr__` (PEP 562) computing the globals in `factories` on
+    first access, e.g. `from models import QUARTERS`. The value is then stored
+    on the module so later lookups are plain attribute access.
+    """
+    factories = {name: cache_once(factory) for name, factory in factories.items()}
+
+    def __getattr__(name: str):
+        try:
+            factory = factories[name]
+        except KeyError:
+            raise AttributeError(
+                f"module {module_name!r} has no attribute {name!r}"
+            ) from None
+        value = factory()
+        setattr(sys.modules[module_name], name, value)
+        return value
+
+    return __getattr__
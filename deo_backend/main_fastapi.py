@@ -1,11 +1,34 @@
-from fastapi.responses import RedirectResponse
+from fastapi.responses import PlainTextResponse, RedirectResponse
 from models import DEO_YEARS
 from models import MOST_RECENT_QUARTER
+from models import DATA_VERSION
+from models import warmup
+from env import (
+    EXECUTION_BACKEND,
+    EXECUTION_QUEUE_SIZE,
+    EXECUTION_WORKERS,
+    PRERENDER_DIR,
+)
+from execution import process_pool_pending, start_process_pool, stop_process_pool
+from geometry import router as geometry_router
+from metrics import (
+    CONTENT_TYPE,
+    MetricsMiddleware,
+    RequestMetrics,
+    find_middleware,
+    info_lines,
+)
+from models import FILTERED_DF_CACHE
+from profiling import check_access, is_profile_request
+from profiling import router as profiling_router
+from response_cache import ResponseCacheMiddleware, StaticBundle, response_version
+from timing import StageTimes, TimingMiddleware
 from fastapi import status
 
 import os
 import uvicorn
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import Depends, FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 import pages.snapshot  # required before `from routers import ROUTERS` to load the routes
 import pages.stops  # required before `from routers import ROUTERS` to load the routes
@@ -31,7 +54,31 @@ origins = [
 os.environ["SERVER_TYPE"] = "fastapi"
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the data before serving instead of on the first requests
+    warmup()
+    if EXECUTION_BACKEND == "processes":
+        # Forked after warmup() so that the workers share the loaded tables
+        start_process_pool(EXECUTION_WORKERS, EXECUTION_QUEUE_SIZE, warmup)
+    yield
+    stop_process_pool()
+
+
+app = FastAPI(lifespan=lifespan)
+# Added before CORS so that cached responses still get the CORS headers
+app.add_middleware(
+    ResponseCacheMiddleware,
+    paths=[
+        route.path
+        for router in [*ROUTERS.values(), geometry_router]
+        for route in router.routes
+    ],
+    version=response_version(DATA_VERSION),
+    bundle=StaticBundle(PRERENDER_DIR) if PRERENDER_DIR else None,
+    # So that the endpoint runs to be profiled
+    bypass=is_profile_request,
+)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -51,7 +98,56 @@ def settings():
     return {"mostRecentQuarter": MOST_RECENT_QUARTER, "deoYears": DEO_YEARS}
 
 
+REQUEST_METRICS = RequestMetrics()
+STAGE_TIMES = StageTimes()
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    lines = list(REQUEST_METRICS.lines())
+    response_cache = find_middleware(app, ResponseCacheMiddleware)
+    if response_cache is not None:
+        lines += info_lines(
+            "deo_response_cache", "Response cache", response_cache.info()
+        )
+    # Of this process, the workers of the process pool have their own
+    lines += info_lines(
+        "deo_frame_cache", "Filtered frame cache", FILTERED_DF_CACHE.info()
+    )
+    pending = process_pool_pending()
+    if pending is not None:
+        lines += [
+            "# HELP deo_process_pool_pending Requests running or waiting in the process pool.",
+            "# TYPE deo_process_pool_pending gauge",
+            f"deo_process_pool_pending {pending}",
+        ]
+    return PlainTextResponse("\n".join(lines) + "\n", media_type=CONTENT_TYPE)
+
+
+@app.get(
+    "/debug/timings", include_in_schema=False, dependencies=[Depends(check_access)]
+)
+def debug_timings():
+    """The time spent in each stage of the requests, by route, see timing.py"""
+    return STAGE_TIMES.summary()
+
+
 [app.include_router(router) for router in ROUTERS.values()]
+app.include_router(geometry_router)
+app.include_router(profiling_router)
+# Outside of the cache, and labelling the requests by the paths of their
+# routes
+app.add_middleware(
+    TimingMiddleware,
+    stage_times=STAGE_TIMES,
+    routes=app.routes,
+)
+# Outermost, so that cached responses are measured too
+app.add_middleware(
+    MetricsMiddleware,
+    metrics=REQUEST_METRICS,
+    routes=app.routes,
+)
 
 
 if __name__ == "__main__":
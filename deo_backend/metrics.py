@@ -0,0 +1,196 @@
+"""
+Metrics of the API in the Prometheus text format, served at /metrics.
+Requests are labelled by the path of their route, with its parameters like
+`/debug/profiles/{profile_id}`, never by their own path or query. Paths that
+aren't routes are labelled "other", so that the number of series stays
+bounded.
+"""
+
+import time
+from bisect import bisect_left
+from typing import Iterator, NamedTuple, Sequence
+
+from starlette.routing import BaseRoute, Match
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Bytes
+SIZE_BUCKETS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def label_set(names: tuple[str, ...], values: tuple) -> str:
+    def escape(value) -> str:
+        return str(value).replace("\\", r"\\").replace('"', r"\"").replace("\n", r"\n")
+
+    pairs = ",".join(f'{name}="{escape(value)}"' for name, value in zip(names, values))
+    return f"{{{pairs}}}" if pairs else ""
+
+
+class Metric:
+    """A counter or gauge with a value per set of `labels`."""
+
+    def __init__(self, name: str, kind: str, help: str, labels: tuple[str, ...]):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labels = labels
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple, amount: float = 1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def lines(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for labels, value in sorted(self.values.items()):
+            yield f"{self.name}{label_set(self.labels, labels)} {value}"
+
+
+class Histogram:
+    def __init__(
+        self, name: str, help: str, labels: tuple[str, ...], buckets: tuple[float, ...]
+    ):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        # Per set of labels: the count of each bucket and of +Inf, and the sum
+        self.series: dict[tuple, tuple[list[int], list[float]]] = {}
+
+    def observe(self, labels: tuple, value: float):
+        counts, total = self.series.setdefault(
+            labels, ([0] * (len(self.buckets) + 1), [0.0])
+        )
+        counts[bisect_left(self.buckets, value)] += 1
+        total[0] += value
+
+    def lines(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        names = self.labels + ("le",)
+        for labels, (counts, total) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                le = label_set(names, labels + (bound,))
+                yield f"{self.name}_bucket{le} {cumulative}"
+            yield f"{self.name}_sum{label_set(self.labels, labels)} {total[0]}"
+            yield f"{self.name}_count{label_set(self.labels, labels)} {cumulative}"
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.in_flight = Metric(
+            "deo_http_requests_in_flight",
+            "gauge",
+            "Requests being answered.",
+            ("route",),
+        )
+        self.duration = Histogram(
+            "deo_http_request_duration_seconds",
+            "Time to answer a request, until the end of its body.",
+            ("route", "method", "status"),
+            LATENCY_BUCKETS,
+        )
+        self.size = Histogram(
+            "deo_http_response_size_bytes",
+            "Size of the response bodies as sent, so compressed if they were.",
+            ("route",),
+            SIZE_BUCKETS,
+        )
+        self.exceptions = Metric(
+            "deo_http_exceptions_total",
+            "counter",
+            "Requests that raised an exception, answered with a 500.",
+            ("route",),
+        )
+
+    def lines(self) -> Iterator[str]:
+        for metric in (self.in_flight, self.duration, self.size, self.exceptions):
+            yield from metric.lines()
+
+
+def info_lines(name: str, help: str, info: NamedTuple) -> Iterator[str]:
+    """
+    The fields of a cache's `info()`: `entries` and `nbytes` as gauges and
+    the others, which only grow, as counters.
+    """
+    for field, value in info._asdict().items():
+        kind = "gauge" if field in ("entries", "nbytes") else "counter"
+        metric = Metric(
+            f"{name}_{field}" + ("_total" if kind == "counter" else ""),
+            kind,
+            f"{help} ({field}).",
+            (),
+        )
+        metric.inc((), value)
+        yield from metric.lines()
+
+
+def route_path(routes: Sequence[BaseRoute], scope) -> str:
+    """
+    The path of the route the router would pick for `scope`, with its
+    parameters like `{name}`, or "other" when no route matches.
+    """
+    partial = "other"
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial == "other":
+            # The path of a route taking another method, answered with a 405
+            partial = route.path
+    return partial
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording the RequestMetrics of the HTTP requests."""
+
+    def __init__(self, app, *, metrics: RequestMetrics, routes: Sequence[BaseRoute]):
+        self.app = app
+        self.metrics = metrics
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = route_path(self.routes, scope)
+        status = 500
+        size = 0
+
+        async def measuring_send(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        self.metrics.in_flight.inc((route,))
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, measuring_send)
+        except Exception:
+            self.metrics.exceptions.inc((route,))
+            raise
+        finally:
+            self.metrics.in_flight.inc((route,), -1)
+            self.metrics.duration.observe(
+                (route, scope["method"], str(status)), time.perf_counter() - start
+            )
+            self.metrics.size.observe((route,), size)
+
+
+def find_middleware(app, cls):
+    """
+    The instance of the middleware `cls` of `app`, which Starlette makes
+    itself when it builds the middleware stack on the first request.
+    """
+    layer = app.middleware_stack
+    while layer is not None and not isinstance(layer, cls):
+        layer = getattr(layer, "app", None)
+    return layer
@@ -3,20 +3,25 @@ import os
 import sqlite3
 from datetime import date, datetime
 from enum import Enum, auto
-from functools import lru_cache
+from functools import cached_property
 
 import numpy as np
 import pandas as pd
-from env import DB_FILENAME
+import snapshot
+from cube import ROW_COUNT, StopCube
+from env import DB_FILENAME, FILTERED_DF_BACKEND
+from frame_cache import FrameCache
+from geography_index import GeographyIndex
+from lazy import cache_once, lazy_module_getattr
 from pydantic import BaseModel
+from sql_pushdown import SqlPushdown
+from timing import span
 
 import deo_backend
 
 DATA_DIR = os.path.dirname(deo_backend.__file__)
 
 SQLITE_FILE = os.path.join(DATA_DIR, "data", DB_FILENAME)
-if not os.path.exists(SQLITE_FILE):
-    raise ValueError(f"Can't find {SQLITE_FILE}")
 
 
 SEASON_QUARTER_MAPPING = {
@@ -28,19 +33,7 @@ SEASON_QUARTER_MAPPING = {
 SEASON_START_MAPPING = {"Q1": "Jan", "Q2": "Apr", "Q3": "Jul", "Q4": "Oct"}
 SEASON_END_MAPPING = {"Q1": "Mar", "Q2": "Jun", "Q3": "Sep", "Q4": "Dec"}
 
-MOST_RECENT_QUARTER_START = pd.read_sql(
-    "select most_recent_quarter from settings limit 1", sqlite3.connect(SQLITE_FILE)
-).iloc[0]["most_recent_quarter"]
-
-
-ALL_QUARTERS = pd.date_range(
-    "2013-12-31", MOST_RECENT_QUARTER_START, freq="QS-JAN", inclusive="right"
-)
-YEARS = list(range(ALL_QUARTERS[0].year, datetime.now().year))
 DEO_YEARS = list(range(2022, datetime.now().year))
-MOST_RECENT_QUARTER = f"{ALL_QUARTERS[-1].year}-Q{ALL_QUARTERS[-1].quarter}"
-FIRST_QUARTER = f"{ALL_QUARTERS[0].year}-Q{ALL_QUARTERS[0].quarter}"
-FOUR_QUARTERS_AGO = f"{ALL_QUARTERS[-4].year}-Q{ALL_QUARTERS[-4].quarter}"
 
 DIVISION_TO_DISTRICTS_MAPPING = {
     "SPD": ["01", "03", "17"],
@@ -67,6 +60,25 @@ VIOLATION_CATEGORIES_DEO_IMPACTED = [
 ]
 
 
+# Dimension columns loaded as pandas Categoricals. The demographic columns use
+# the order of their enum, the rest are sorted.
+DIMENSION_COLUMNS = [
+    "districtoccur",
+    "psa",
+    "quarter",
+    "Race",
+    "Gender",
+    "Age Range",
+    "violation_category",
+]
+# Written by update_db.add_quarterly_columns but derivable from `quarter`
+DERIVED_QUARTER_COLUMNS = ["quarter_dt_str", "quarter_dt", "quarter_date", "q_str"]
+# Quarters since 2014-Q1. Loaded tables are sorted on it, so a time window is a
+# contiguous range of rows.
+QUARTER_ORDINAL_COLUMN = "quarter_ordinal"
+QUARTER_ORDINAL_ORIGIN_YEAR = 2014
+
+
 def english_comma_separated(lst):
     if len(lst) > 1:
         return ", ".join(lst[:-1]) + " and " + lst[-1]
@@ -75,16 +87,155 @@ def english_comma_separated(lst):
     return ""
 
 
-@lru_cache
-def df_shootings_raw():
-    print(f"SQLITE: {SQLITE_FILE} shootings")
+def quarter_ordinal(year_quarter: str) -> int:
+    year, quarter = year_quarter.split("-Q")
+    return (int(year) - QUARTER_ORDINAL_ORIGIN_YEAR) * 4 + int(quarter) - 1
+
+
+def quarter_window(ordinals: np.ndarray, first: int, last: int) -> slice:
+    """Rows of the sorted `ordinals` between the `first` and `last` quarters"""
+    return slice(
+        ordinals.searchsorted(first, side="left"),
+        ordinals.searchsorted(last, side="right"),
+    )
+
+
+def check_sqlite_file():
+    if not os.path.exists(SQLITE_FILE):
+        raise ValueError(f"Can't find {SQLITE_FILE}")
+
+
+def connect() -> sqlite3.Connection:
+    check_sqlite_file()
+    return sqlite3.connect(SQLITE_FILE)
+
+
+def read_table(table: str, /, *, typed: bool = False) -> pd.DataFrame:
+    """
+    `select * from table`, from the Feather snapshot when pyarrow is
+    available. `typed` applies `typed_df` to the quarterly tables.
+    """
+    check_sqlite_file()
+    df = snapshot.read_table(
+        SQLITE_FILE,
+        table,
+        categorical=DIMENSION_COLUMNS if typed else (),
+        drop=DERIVED_QUARTER_COLUMNS if typed else (),
+    )
+    if df is None:
+        df = pd.read_sql(f"select * from {table}", connect())
+    return typed_df(df) if typed else df
+
+
+@cache_once
+def most_recent_quarter_start() -> str:
     return pd.read_sql(
-        "select * from shootings",
-        sqlite3.connect(SQLITE_FILE),
+        "select most_recent_quarter from settings limit 1", connect()
+    ).iloc[0]["most_recent_quarter"]
+
+
+@cache_once
+def all_quarters() -> pd.DatetimeIndex:
+    return pd.date_range(
+        "2013-12-31", most_recent_quarter_start(), freq="QS-JAN", inclusive="right"
+    )
+
+
+def quarter_label(dt: pd.Timestamp) -> str:
+    return f"{dt.year}-Q{dt.quarter}"
+
+
+def build_quarter_calendar(quarter_starts: pd.DatetimeIndex) -> pd.DataFrame:
+    """
+    One row per quarter, indexed by quarter ordinal, holding the labels the
+    pages display for it.
+    """
+    dt = pd.Series(quarter_starts)
+    year = dt.dt.year.astype(str)
+    quarter = "Q" + dt.dt.quarter.astype(str)
+    calendar = pd.DataFrame(
+        {
+            "dt": dt,
+            "year": dt.dt.year,
+            "quarter": quarter,
+            "label": year + "-" + quarter,
+            "season_label": quarter.map(SEASON_QUARTER_MAPPING) + " " + year,
+            "start_month": quarter.map(SEASON_START_MAPPING) + " " + year,
+            "end_month": quarter.map(SEASON_END_MAPPING) + " " + year,
+        }
+    )
+    calendar.index = pd.Index(
+        (dt.dt.year - QUARTER_ORDINAL_ORIGIN_YEAR) * 4 + dt.dt.quarter - 1,
+        name=QUARTER_ORDINAL_COLUMN,
     )
+    return calendar
 
 
-@lru_cache
+@cache_once
+def quarter_calendar() -> pd.DataFrame:
+    return build_quarter_calendar(all_quarters())
+
+
+@cache_once
+def year_season_label_mapping() -> pd.Series:
+    return quarter_calendar().set_index("label")["season_label"]
+
+
+def year_season_labels(year_quarters: pd.Series) -> pd.Series:
+    """Vectorized Quarter.year_quarter_to_year_season, e.g. 2020-Q2 -> Apr-Jun 2020"""
+    return year_quarters.astype(str).map(year_season_label_mapping())
+
+
+def dimension_dtype(column: str, values: pd.Series) -> pd.CategoricalDtype:
+    order = (
+        DemographicCategory(column).order_of_group
+        if column in [d.value for d in DemographicCategory]
+        else []
+    )
+    observed = set(values.dropna().unique())
+    return pd.CategoricalDtype(order + sorted(observed.difference(order)))
+
+
+def typed_df(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Drops the derivable quarter columns, turns the dimension columns into
+    Categoricals, downcasts the `n_*` counts to int32 where they fit and sorts
+    the rows by quarter.
+    """
+    df = df.drop(columns=[col for col in DERIVED_QUARTER_COLUMNS if col in df.columns])
+    for col in DIMENSION_COLUMNS:
+        if col in df.columns:
+            dtype = dimension_dtype(col, df[col])
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                # astype() keeps the order of the snapshot's categories, as
+                # unordered dtypes with the same categories compare equal
+                df[col] = df[col].cat.set_categories(dtype.categories)
+            else:
+                df[col] = df[col].astype(dtype)
+    for col in df.columns:
+        if col.startswith("n_"):
+            # Not smaller than int32: pandas keeps the input dtype for groupby
+            # sums that fit, so int8/int16 sums overflow in percentage math.
+            counts = pd.to_numeric(df[col], downcast="integer")
+            if pd.api.types.is_integer_dtype(counts):
+                counts = counts.astype(np.promote_types(counts.dtype, np.int32))
+            df[col] = counts
+    if "quarter" in df.columns:
+        ordinals = np.array(
+            [quarter_ordinal(q) for q in df["quarter"].cat.categories], dtype=np.int16
+        )
+        df[QUARTER_ORDINAL_COLUMN] = ordinals[df["quarter"].cat.codes]
+        df = df.sort_values(QUARTER_ORDINAL_COLUMN, kind="stable", ignore_index=True)
+    return df
+
+
+@cache_once
+def df_shootings_raw():
+    print(f"SQLITE: {SQLITE_FILE} shootings")
+    return read_table("shootings")
+
+
+@cache_once
 def police_districts_geojson():
     DATA_DIR = os.path.dirname(deo_backend.__file__)
     # https://opendata.arcgis.com/datasets/62ec63afb8824a15953399b1fa819df2_0.geojson
@@ -92,56 +243,64 @@ def police_districts_geojson():
     return json.load(open(os.path.join(DATA_DIR, "maps/police_districts.geojson"), "r"))
 
 
-@lru_cache
+@cache_once
+def police_psas_geojson():
+    DATA_DIR = os.path.dirname(deo_backend.__file__)
+    return json.load(open(os.path.join(DATA_DIR, "maps", "police_psas.geojson")))
+
+
+@cache_once
 def hin_sample_locations_df():
     print(f"SQLITE: {SQLITE_FILE} hin sample locations")
-    df = pd.read_sql(
-        "select * from car_ped_stops_hin_random_sample",
-        sqlite3.connect(SQLITE_FILE),
-    )
-    return df
+    return read_table("car_ped_stops_hin_random_sample")
 
 
-@lru_cache
+@cache_once
 def df_raw_by_hin():
     print(f"SQLITE: {SQLITE_FILE} raw by hin")
-    df = pd.read_sql(
-        "select * from car_ped_stops_hin_pct",
-        sqlite3.connect(SQLITE_FILE),
-    )
-    return df
+    return read_table("car_ped_stops_hin_pct", typed=True)
 
 
-@lru_cache
+@cache_once
 def hin_geojson_2020():
     DATA_DIR = os.path.dirname(deo_backend.__file__)
     print("Loading hin geojson")
     return json.load(open(os.path.join(DATA_DIR, "maps", "hin_2020.geojson")))
 
-@lru_cache
+@cache_once
 def hin_geojson_2025():
     DATA_DIR = os.path.dirname(deo_backend.__file__)
     print("Loading hin geojson")
     return json.load(open(os.path.join(DATA_DIR, "maps", "hin_2025.geojson")))
 
-@lru_cache
+@cache_once
 def df_raw():
     print(f"SQLITE: {SQLITE_FILE} raw")
-    df = pd.read_sql(
-        "select * from car_ped_stops_quarterly",
-        sqlite3.connect(SQLITE_FILE),
-    )
-    return df
+    return read_table("car_ped_stops_quarterly", typed=True)
 
 
-@lru_cache
+@cache_once
 def df_raw_reasons():
     print(f"SQLITE: {SQLITE_FILE} raw reasons")
-    df = pd.read_sql(
-        "select * from car_ped_stops_quarterly_reason",
-        sqlite3.connect(SQLITE_FILE),
+    return read_table("car_ped_stops_quarterly_reason", typed=True)
+
+
+@cache_once
+def stop_cube():
+    print(f"CUBE: {SQLITE_FILE} raw")
+    df = df_raw()
+    return StopCube.from_df(
+        df,
+        dimensions={
+            "districtoccur": None,
+            "psa": None,
+            "quarter": None,
+            DemographicCategory.race.value: DemographicCategory.race.order_of_group,
+            DemographicCategory.gender.value: DemographicCategory.gender.order_of_group,
+            DemographicCategory.age_range.value: DemographicCategory.age_range.order_of_group,
+        },
+        measures=[col for col in df.columns if col.startswith("n_")],
     )
-    return df
 
 
 class TimeAggregation(str, Enum):
@@ -154,6 +313,46 @@ class DfType(str, Enum):
     stops_by_reason = "stops_by_reason"
     stops_by_hin = "stops_by_hin"
 
+    @property
+    def table(self) -> str:
+        match self:
+            case DfType.stops:
+                return "car_ped_stops_quarterly"
+            case DfType.stops_by_reason:
+                return "car_ped_stops_quarterly_reason"
+            case DfType.stops_by_hin:
+                return "car_ped_stops_hin_pct"
+
+    def load(self) -> pd.DataFrame:
+        match self:
+            case DfType.stops:
+                return df_raw()
+            case DfType.stops_by_reason:
+                return df_raw_reasons()
+            case DfType.stops_by_hin:
+                return df_raw_by_hin()
+
+
+@cache_once
+def geography_index(df_type: DfType):
+    print(f"GEOGRAPHY INDEX: {SQLITE_FILE} {df_type.value}")
+    return GeographyIndex.from_df(
+        df_type.load(), divisions=DIVISION_TO_DISTRICTS_MAPPING
+    )
+
+
+FILTERED_DF_CACHE = FrameCache(max_entries=256, max_bytes=256 * 2**20)
+
+# With FILTERED_DF_BACKEND=sql, FilteredDf filters and aggregates in SQLite
+# and the quarterly tables are never loaded in full.
+match FILTERED_DF_BACKEND:
+    case "memory":
+        SQL_PUSHDOWN = None
+    case "sql":
+        SQL_PUSHDOWN = SqlPushdown(SQLITE_FILE)
+    case _:
+        raise ValueError(f"Unknown FILTERED_DF_BACKEND {FILTERED_DF_BACKEND}")
+
 
 class FilteredDf:
     def __init__(
@@ -169,13 +368,7 @@ class FilteredDf:
         self.location = location
         self.start_date = start_date
         self.end_date = end_date
-        match df_type:
-            case DfType.stops:
-                self.df = df_raw()
-            case DfType.stops_by_reason:
-                self.df = df_raw_reasons()
-            case DfType.stops_by_hin:
-                self.df = df_raw_by_hin()
+        self.df_type = df_type
 
         # Location Filtering
         if location == "":
@@ -184,25 +377,118 @@ class FilteredDf:
             self.geography = Geography()
         elif location in DIVISION_TO_DISTRICTS_MAPPING:
             self.geography = Geography(division=location)
-            self.df = self.df.query(self.geography.query)
         else:
             location_list = location.rstrip("*").split("-")
             district = location_list[0]
             psa = location_list[1] if len(location_list) > 1 else None
             self.geography = Geography(district=district, psa=psa)
-            self.df = self.df.query(self.geography.query)
 
         # Time Filtering
-        if start_date or end_date:
+        self.is_time_filtered = bool(start_date or end_date)
+        if self.is_time_filtered:
             self.quarters = Quarters(start_date=start_date, end_date=end_date)
-
-            # Graph1
-            self.df = self.df[self.df.quarter.isin(self.quarters.year_quarters)]
-            if self.df.empty and error_if_empty:
+            if error_if_empty and self.is_empty:
                 raise ValueError("Df is empty")
         else:
             self.quarters = Quarters()
 
+    @cached_property
+    def df(self):
+        return FILTERED_DF_CACHE.get(self.cache_key, self._filter)
+
+    @property
+    def cache_key(self):
+        return (
+            self.df_type,
+            self.geography.key,
+            self.quarters.ordinal_range if self.is_time_filtered else None,
+        )
+
+    @span("filter")
+    def _filter(self):
+        if SQL_PUSHDOWN is not None:
+            return typed_df(SQL_PUSHDOWN.rows(self.df_type.table, where=self.where))
+        df = self.df_type.load()
+        ordinals = df[QUARTER_ORDINAL_COLUMN].to_numpy()
+        if self.geography.key is not None:
+            # Positions are sorted, so their quarters are sorted as well
+            positions = geography_index(self.df_type).get(self.geography.key)
+            if self.is_time_filtered:
+                positions = positions[
+                    quarter_window(ordinals[positions], *self.quarters.ordinal_range)
+                ]
+            return df.take(positions)
+        if self.is_time_filtered:
+            return df.iloc[quarter_window(ordinals, *self.quarters.ordinal_range)]
+        return df
+
+    @property
+    def uses_cube(self):
+        return SQL_PUSHDOWN is None and self.df_type == DfType.stops
+
+    @property
+    def where(self):
+        if self.geography.division:
+            districts = DIVISION_TO_DISTRICTS_MAPPING[self.geography.division]
+        else:
+            districts = self.geography.district
+        return {
+            "districtoccur": districts,
+            "psa": self.geography.psa,
+            "quarter": (
+                (self.quarters.year_quarters[0], self.quarters.year_quarters[-1])
+                if self.is_time_filtered and self.quarters.year_quarters
+                else None
+            ),
+        }
+
+    @property
+    def is_empty(self):
+        if self.is_time_filtered and not self.quarters.year_quarters:
+            return True
+        if self.uses_cube:
+            return stop_cube().total([], where=self.where)[ROW_COUNT] == 0
+        if SQL_PUSHDOWN is not None:
+            return SQL_PUSHDOWN.count(self.df_type.table, where=self.where) == 0
+        return self.df.empty
+
+    @span("aggregate")
+    def aggregate(self, columns: list[str], /, *, by: list[str] = ()):
+        """
+        Sum of `columns` grouped by `by`, like `df.groupby(by)[columns].sum()`.
+        Served from the stop cube or SQLite without touching `df` when possible.
+        """
+        by = [col.value if isinstance(col, Enum) else col for col in by]
+        if SQL_PUSHDOWN is not None:
+            df = SQL_PUSHDOWN.aggregate(
+                self.df_type.table, columns, by=by, where=self.where
+            )
+            if not by:
+                return df.iloc[0][columns]
+            for col in by:
+                if col in DIMENSION_COLUMNS:
+                    df[col] = df[col].astype(dimension_dtype(col, df[col]))
+            return df.set_index(by).sort_index()
+        cube = stop_cube() if self.uses_cube else None
+        cube_by = ["quarter" if col == "year" else col for col in by]
+        if (
+            cube is None
+            or not set(columns).issubset(cube.measures)
+            or not set(cube_by).issubset(cube.dimensions)
+            or len(set(cube_by)) != len(cube_by)
+        ):
+            if not by:
+                return self.df[columns].sum()
+            return self.df.groupby(by, observed=True)[columns].sum()
+        if not by:
+            return cube.total(columns, where=self.where)[columns]
+        df = cube.aggregate(columns, by=cube_by, where=self.where)
+        if "year" in by:
+            df = df.reset_index()
+            df["year"] = df["quarter"].str[:4].astype(int)
+            df = df.groupby(by)[columns].sum()
+        return df
+
     def get_date_range_str_long(self, time_aggregation: TimeAggregation):
         return self.quarters.get_date_range_str_long(time_aggregation)
 
@@ -221,10 +507,40 @@ class FilteredDf:
         )
 
     def get_avg_monthly_value(self, police_action):
-        total = self.df[police_action.sql_column].sum()
-        num_quarters = len(self.df.quarter.unique())
+        by_quarter = self.aggregate([police_action.sql_column], by=["quarter"])
+        total = by_quarter[police_action.sql_column].sum()
+        num_quarters = len(by_quarter)
         return int(np.round(total / num_quarters / 3))
 
+    def aggregate_windows(
+        self, windows: dict[str, tuple[str, str]], columns: list[str], /
+    ) -> pd.DataFrame:
+        """
+        Sum, quarterly mean and monthly average of `columns` over each named
+        (first, last) quarter window, e.g. {"2019": ("2019-Q1", "2019-Q4")}.
+        All windows are sliced from a single per-quarter aggregation.
+
+        Returns one row per window and (column, statistic) columns.
+        """
+        by_quarter = self.aggregate(columns, by=["quarter"])
+        ordinals = np.array([quarter_ordinal(q) for q in by_quarter.index])
+        # Prefix sums make every window a difference of two rows
+        cumulative = np.zeros((len(by_quarter) + 1, len(columns)), dtype=np.int64)
+        cumulative[1:] = by_quarter.to_numpy().cumsum(axis=0)
+        bounds = [
+            quarter_window(ordinals, quarter_ordinal(first), quarter_ordinal(last))
+            for first, last in windows.values()
+        ]
+        starts = np.array([window.start for window in bounds], dtype=int)
+        stops = np.array([window.stop for window in bounds], dtype=int)
+        sums = pd.DataFrame(
+            cumulative[stops] - cumulative[starts], index=list(windows), columns=columns
+        )
+        means = sums.div(stops - starts, axis=0)
+        return pd.concat(
+            {"sum": sums, "mean": means, "monthly": means / 3}, axis=1
+        ).swaplevel(axis=1)[columns]
+
 
 class QuarterHow(str, Enum):
     start = auto()
@@ -235,24 +551,28 @@ class Quarters:
     def __init__(self, start_date: date | None = None, end_date: date | None = None):
         self.start_date = start_date
         self.end_date = end_date
-        self.values = (
-            [
-                Quarter(q)
-                for q in ALL_QUARTERS
-                if (start_date and q >= pd.to_datetime(start_date))
-                and (end_date and q <= pd.to_datetime(end_date))
-            ]
-            if start_date and end_date
-            else [Quarter(q) for q in ALL_QUARTERS]
-        )
-        quarters_str_list = [x.quarter_str for x in self.values]
-        self.quarters_str = ",".join([f"'{quarter}'" for quarter in quarters_str_list])
-        self.year_quarters = [x.quarter_and_year for x in self.values]
-        self.num = len(self.year_quarters)
-        self.year_seasons = [x.season_and_year for x in self.values]
-        self.start_str = self.values[0].month_and_year(how=QuarterHow.start)
-        self.end_str = self.values[-1].month_and_year(how=QuarterHow.end)
-        self.years = [x.year for x in self.values]
+        calendar = quarter_calendar()
+        if start_date and end_date:
+            first = calendar["dt"].searchsorted(pd.to_datetime(start_date), side="left")
+            stop = calendar["dt"].searchsorted(pd.to_datetime(end_date), side="right")
+            calendar = calendar.iloc[first:stop]
+        self.calendar = calendar
+        self.year_quarters = calendar["label"].tolist()
+        self.num = len(calendar)
+        self.year_seasons = calendar["season_label"].tolist()
+        self.start_str = calendar["start_month"].iloc[0]
+        self.end_str = calendar["end_month"].iloc[-1]
+        self.years = calendar["year"].tolist()
+        self.ordinal_range = (int(calendar.index[0]), int(calendar.index[-1]))
+
+    def month_and_year_labels(self, how: QuarterHow) -> list[str]:
+        match how:
+            case QuarterHow.start:
+                return self.calendar["start_month"].tolist()
+            case QuarterHow.end:
+                return self.calendar["end_month"].tolist()
+            case _:
+                raise NotImplementedError(how)
 
     def get_date_range_str_long(self, time_aggregation: TimeAggregation):
         return f"the start of {self.start_str} through the end of {self.end_str}"
@@ -497,6 +817,15 @@ class Geography(BaseModel):
                 queries.append(f"psa=='{self.psa}'")
         return "&".join(queries) if queries else "tuple()"
 
+    @property
+    def key(self):
+        """Key into `GeographyIndex`, None for city-wide"""
+        if self.division:
+            return self.division
+        if self.district and self.psa:
+            return f"{self.district}-{self.psa}"
+        return self.district
+
     @property
     def string(self):
         if self.psa is not None:
@@ -509,24 +838,44 @@ class Geography(BaseModel):
             return "Philadelphia"
 
 
-QUARTERS = Quarters()
+def warmup():
+    """
+    Loads what requests otherwise load on first use: the settings, the
+    quarterly tables with their geography indexes, and the stop cube.
+    """
+    quarter_calendar()
+    if SQL_PUSHDOWN is None:
+        for df_type in DfType:
+            geography_index(df_type)
+        stop_cube()
 
 
-before_deo_filter = FilteredDf(
-    location="*", start_date="2021-01-01", end_date="2021-12-31"
-)
-after_deo_filter = FilteredDf(
-    location="*", start_date="2022-04-01", end_date="2023-03-31"
-)
-before_deo_filter_hin = FilteredDf(
-    location="*",
-    start_date="2021-01-01",
-    end_date="2021-12-31",
-    df_type=DfType.stops_by_hin,
-)
-after_deo_filter_hin = FilteredDf(
-    location="*",
-    start_date="2022-04-01",
-    end_date="2023-03-31",
-    df_type=DfType.stops_by_hin,
+# Same periods as before_deo_filter and after_deo_filter, for aggregate_windows
+DEO_WINDOWS = {
+    "before_deo": ("2021-Q1", "2021-Q4"),
+    "after_deo": ("2022-Q2", "2023-Q1"),
+}
+
+
+# Globals that need the DB, computed on first access rather than at import
+__getattr__ = lazy_module_getattr(
+    __name__,
+    {
+        "MOST_RECENT_QUARTER_START": most_recent_quarter_start,
+        "ALL_QUARTERS": all_quarters,
+        "YEARS": lambda: list(range(all_quarters()[0].year, datetime.now().year)),
+        "MOST_RECENT_QUARTER": lambda: quarter_label(all_quarters()[-1]),
+        "FIRST_QUARTER": lambda: quarter_label(all_quarters()[0]),
+        "FOUR_QUARTERS_AGO": lambda: quarter_label(all_quarters()[-4]),
+        # Identifies the data behind the API responses, for caching them
+        "DATA_VERSION": lambda: f"{DB_FILENAME}:{quarter_label(all_quarters()[-1])}",
+        "QUARTER_CALENDAR": quarter_calendar,
+        "QUARTERS": lambda: Quarters(),
+        "before_deo_filter": lambda: FilteredDf(
+            location="*", start_date="2021-01-01", end_date="2021-12-31"
+        ),
+        "after_deo_filter": lambda: FilteredDf(
+            location="*", start_date="2022-04-01", end_date="2023-03-31"
+        ),
+    },
 )
@@ -9,18 +9,19 @@ import dash_ag_grid as dag
 import fastapi
 import numpy as np
 import pandas as pd
-import plotly.express as px
 from dash import Dash, Input, Output, callback, dcc, html, no_update
 from dash_helpers import (Subtitle, TimeAggregationChoice,
                           demographic_dropdown, location_dropdown,
                           qyear_dropdown)
 from fastapi import APIRouter, Query
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
+from figure_specs import BarSpec
 from models import (FIRST_QUARTER, MOST_RECENT_QUARTER, QUARTERS,
                     SEASON_QUARTER_MAPPING, AgeGroup, DemographicCategory,
                     FilteredDf, GenderGroup, Geography, PoliceAction, Quarter,
                     QuarterHow, RacialGroup, TimeAggregation)
 from routers import ROUTERS
+from timing import span
 
 prefixes = __name__.split(".")[-2:]
 prefix = prefixes[0].replace("_", "-") + "-" + prefixes[1].replace("_", "-")
@@ -131,17 +132,20 @@ def api_func(
     df_filtered = geo_filtered.df
     police_action = PoliceAction.intrusion.value
 
-    df_percent_action_by_demo = (
-        (
-            100
-            * df_filtered.groupby(demographic_category)[police_action.sql_column].sum()
-            / df_filtered.groupby(demographic_category)[
-                PoliceAction.stop.value.sql_column
-            ].sum()
+    with span("groupby"):
+        df_percent_action_by_demo = (
+            (
+                100
+                * df_filtered.groupby(demographic_category, observed=True)[
+                    police_action.sql_column
+                ].sum()
+                / df_filtered.groupby(demographic_category, observed=True)[
+                    PoliceAction.stop.value.sql_column
+                ].sum()
+            )
+            .to_frame("percentage")
+            .round(1)
         )
-        .to_frame("percentage")
-        .round(1)
-    )
     if demographic_baseline not in df_percent_action_by_demo.index:
         return no_update
 
@@ -180,19 +184,6 @@ def api_func(
             text = f"{val_text} of Baseline"
         return text
 
-    fig = px.bar(
-        df_percent_action_by_demo,
-        x=demographic_category.value,
-        y="percentage",
-        barmode="group",
-        labels={
-            "percentage": "Intrusion Rate (%)",
-        },
-        title=f"Intrusion Rates by {demographic_category} in {geo_level_str} from {geo_filtered.get_date_range_str(TimeAggregation.quarter)}",
-    )
-    for trace in fig.data:
-        trace.hovertemplate = "%{x}<br>%{y}% intrusion rate"
-
     # Add text above each bar to show the percentage difference from the average
     annotations = [
         dict(
@@ -208,19 +199,31 @@ def api_func(
         )
         for index, row in df_percent_action_by_demo.reset_index().iterrows()
     ]
-    fig.update_layout(annotations=annotations)
+    fig = BarSpec(
+        df_percent_action_by_demo,
+        x=demographic_category.value,
+        y="percentage",
+        barmode="group",
+        labels={
+            "percentage": "Intrusion Rate (%)",
+        },
+        title=f"Intrusion Rates by {demographic_category} in {geo_level_str} from {geo_filtered.get_date_range_str(TimeAggregation.quarter)}",
+        hovertemplate="%{x}<br>%{y}% intrusion rate",
+        layout={"annotations": annotations},
+    )
 
     # Create new one that is percent of contraband from the intrusions
-    df_percent_action_by_demo = (
-        df_filtered.groupby(demographic_category)[
-            [
-                "n_contraband",
-                police_action.sql_column,
+    with span("groupby"):
+        df_percent_action_by_demo = (
+            df_filtered.groupby(demographic_category, observed=True)[
+                [
+                    "n_contraband",
+                    police_action.sql_column,
+                ]
             ]
-        ]
-        .sum()
-        .reset_index()
-    )
+            .sum()
+            .reset_index()
+        )
 
     df_percent_action_by_demo["percentage"] = (
         100
@@ -239,18 +242,6 @@ def api_func(
         df_percent_action_by_demo[demographic_category],
         DemographicCategory(demographic_category).order_of_group,
     )
-    fig2 = px.bar(
-        df_percent_action_by_demo.sort_values(demographic_category),
-        x=demographic_category.value,
-        title=f"Intrusions Resulting in No Contraband by {demographic_category.value} in {geo_filtered.geography.string} from {geo_filtered.get_date_range_str(TimeAggregation.quarter)}",
-        labels={
-            f"{police_action.sql_column}_no_contraband": f"Number of {police_action.noun.title()} without Contraband"
-        },
-        y=f"{police_action.sql_column}_no_contraband",
-    )
-    for trace in fig2.data:
-        trace.hovertemplate = "%{x}<br>%{y:,} intrusions<br>"
-
     baseline_percentage = df_percent_action_by_demo[
         df_percent_action_by_demo[demographic_category] == demographic_baseline
     ][f"{police_action.sql_column}_no_contraband"].values[0]
@@ -273,9 +264,18 @@ def api_func(
         ).iterrows()
     ]
 
-    fig2.update_layout(
-        barmode="relative", annotations=annotations
-    )  # Relative bar chart
+    fig2 = BarSpec(
+        df_percent_action_by_demo.sort_values(demographic_category),
+        x=demographic_category.value,
+        title=f"Intrusions Resulting in No Contraband by {demographic_category.value} in {geo_filtered.geography.string} from {geo_filtered.get_date_range_str(TimeAggregation.quarter)}",
+        labels={
+            f"{police_action.sql_column}_no_contraband": f"Number of {police_action.noun.title()} without Contraband"
+        },
+        y=f"{police_action.sql_column}_no_contraband",
+        hovertemplate="%{x}<br>%{y:,} intrusions<br>",
+        # Relative bar chart
+        layout={"barmode": "relative", "annotations": annotations},
+    )
 
     # Create the bar chart using Plotly Express
     # Calculate percentage difference from the average
@@ -289,16 +289,6 @@ def api_func(
     df_percent_action_by_demo["found_multiplier"] = (
         df_percent_action_by_demo["percentage_found"]
     ) / (baseline_percentage)
-    fig3 = px.bar(
-        df_percent_action_by_demo.sort_values(demographic_category),
-        x=demographic_category.value,
-        y="percentage_found",
-        labels={"percentage_found": "Contraband Hit Rate (%)"},
-        title=f"Contraband Hit Rates by {demographic_category} in {geo_filtered.geography.string} from {geo_filtered.get_date_range_str(TimeAggregation.quarter)}",
-    )
-    for trace in fig3.data:
-        trace.hovertemplate = "%{x}<br>%{y:,}% contraband hit rate<br>"
-
     # Add text above each bar to show the percentage difference from the average
     annotations = [
         dict(
@@ -316,7 +306,15 @@ def api_func(
             demographic_category
         ).iterrows()
     ]
-    fig3.update_layout(annotations=annotations)
+    fig3 = BarSpec(
+        df_percent_action_by_demo.sort_values(demographic_category),
+        x=demographic_category.value,
+        y="percentage_found",
+        labels={"percentage_found": "Contraband Hit Rate (%)"},
+        title=f"Contraband Hit Rates by {demographic_category} in {geo_filtered.geography.string} from {geo_filtered.get_date_range_str(TimeAggregation.quarter)}",
+        hovertemplate="%{x}<br>%{y:,}% contraband hit rate<br>",
+        layout={"annotations": annotations},
+    )
 
     # Totals
     pct_not_found = (
@@ -28,6 +28,7 @@ from demographic_constants import (
     DEMOGRAPHICS_DISTRICT,
 )
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
+from timing import span
 from dash_helpers import (
     location_dropdown,
     qyear_dropdown,
@@ -95,7 +96,7 @@ def api_func(
         (DEMOGRAPHICS_DISTRICT["white"] / DEMOGRAPHICS_DISTRICT["total"]).sort_values()
         * 100
     ).round(1)
-    df_grouped = df_filtered.groupby("districtoccur")[
+    df_grouped = df_filtered.groupby("districtoccur", observed=True)[
         [col for col in df_filtered.columns if col.startswith("n_")]
     ].sum()
     df_grouped = df_grouped[
@@ -123,6 +124,7 @@ def api_func(
         df_grouped["n_contraband"] / df_grouped["n_intruded"] * 100
     ).round(1)
 
+    @span("figure")
     def _get_bar_fig(column, title="", labels={}, hovertemplate_suffix=""):
         labels["districtoccur"] = (
             "Majority Non-White Districts → Majority White Districts"
@@ -10,7 +10,6 @@ import dash_ag_grid as dag
 from datetime import date
 from datetime import timedelta
 from datetime import datetime
-import plotly.express as px
 import pandas as pd
 import sqlite3
 
@@ -29,6 +28,7 @@ from models import FilteredDf
 from models import QUARTERS, MOST_RECENT_QUARTER, SEASON_QUARTER_MAPPING, FIRST_QUARTER
 from models import Quarter
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
+from figure_specs import BarSpec
 from dash_helpers import (
     location_dropdown,
     qyear_dropdown,
@@ -116,7 +116,7 @@ def api_func(
 
     districts_string = english_comma_separated([d["District"] for d in district_bars])
     quarters = Quarters(start_date=start_qyear, end_date=end_qyear)
-    fig = px.bar(
+    fig = BarSpec(
         pd.DataFrame(district_bars, columns=["District", police_action.noun]),
         x="District",
         y=police_action.noun,
@@ -124,9 +124,8 @@ def api_func(
         labels={
             police_action.noun: f"Number of {police_action.noun.title()}",
         },
+        hovertemplate="District %{x}<br>%{y:,} " + police_action.noun,
     )
-    for trace in fig.data:
-        trace.hovertemplate = "District %{x}<br>%{y:,} " + police_action.noun
     return endpoint.output(
         fig_barplot=fig,
     )
@@ -8,7 +8,6 @@ import dash_ag_grid as dag
 from datetime import date
 from datetime import timedelta
 from datetime import datetime
-import plotly.express as px
 import pandas as pd
 import sqlite3
 
@@ -20,8 +19,9 @@ from models import RacialGroup
 from models import Geography
 from models import FilteredDf
 from models import QUARTERS, MOST_RECENT_QUARTER, SEASON_QUARTER_MAPPING
-from models import Quarter
+from models import year_season_labels
 from fastapi_models import Endpoint, location_annotation
+from figure_specs import BarSpec
 from dash_helpers import (
     location_dropdown,
     demographic_dropdown,
@@ -79,31 +79,18 @@ def api_func(
     police_action = PoliceAction.intrusion.value
     geo_filter = FilteredDf(location=location)
     geo_level_str = geo_filter.geography.string
-    df_geo_all_time = geo_filter.df
-
-    # Graph2
-    df_geo_total_all_time = (
-        df_geo_all_time.groupby(
-            [
-                "districtoccur",
-                "psa",
-                "year",
-                "quarter",
-                "q_str",
-            ]
-        )[[a.value.sql_column for a in PoliceAction]]
-        .sum()
-        .reset_index()
-    )
+    action_columns = [police_action.sql_column, PoliceAction.stop.value.sql_column]
 
     def _value_action_pct(start_date, end_date, value_column=police_action.sql_column):
         this_geo_filter = FilteredDf(
             location=location, start_date=start_date, end_date=end_date
         )
-        value = this_geo_filter.df[value_column].sum() / this_geo_filter.quarters.num
+        totals = this_geo_filter.aggregate(
+            [value_column, PoliceAction.stop.value.sql_column]
+        )
+        value = totals[value_column] / this_geo_filter.quarters.num
         value_stop = (
-            this_geo_filter.df[PoliceAction.stop.value.sql_column].sum()
-            / this_geo_filter.quarters.num
+            totals[PoliceAction.stop.value.sql_column] / this_geo_filter.quarters.num
         )
         pct_value = value / value_stop * 100
         return (
@@ -121,24 +108,20 @@ def api_func(
     value_covid, value_stop_covid, pct_covid = _value_action_pct(
         start_date="2020-03-01", end_date="2021-02-28"
     )
-    df_grouped = (
-        df_geo_all_time.groupby(time_aggregation)[
-            [col for col in df_geo_all_time.columns if col.startswith("n_")]
-        ]
-        .sum()
-        .reset_index()
-    )
+    df_grouped = geo_filter.aggregate(
+        action_columns, by=[time_aggregation]
+    ).reset_index()
     df_grouped["intrusion_rate"] = (
         df_grouped["n_intruded"] / df_grouped["n_stopped"] * 100
     ).round(1)
 
     df_grouped["x_label"] = (
-        df_grouped["quarter"].apply(Quarter.year_quarter_to_year_season)
+        year_season_labels(df_grouped["quarter"])
         if time_aggregation == "quarter"
         else df_grouped["year"]
     )
 
-    fig = px.bar(
+    fig = BarSpec(
         df_grouped,
         x="x_label",
         y=police_action.sql_column,
@@ -148,15 +131,13 @@ def api_func(
         },
         hover_data=["intrusion_rate"],
         title=f"Number of Intrusions During PPD Traffic Stops in {geo_level_str} from {geo_filter.get_date_range_str(time_aggregation)}",
+        hovertemplate="%{x}<br>%{y:,} intrusions<br>%{customdata[0]}% intrusion rate<extra></extra>",
     )
-    for trace in fig.data:
-        trace.hovertemplate = "%{x}<br>%{y:,} intrusions<br>%{customdata[0]}% intrusion rate<extra></extra>"
 
-    num_total = df_geo_total_all_time[police_action.sql_column].sum()
+    totals = geo_filter.aggregate(action_columns)
+    num_total = totals[police_action.sql_column]
     pct_total = (
-        100
-        * df_geo_total_all_time[police_action.sql_column].sum()
-        / df_geo_total_all_time[PoliceAction.stop.value.sql_column].sum()
+        100 * totals[police_action.sql_column] / totals[PoliceAction.stop.value.sql_column]
     ).round(1)
 
     return endpoint.output(
@@ -7,7 +7,6 @@ import dash_ag_grid as dag
 from datetime import date
 from datetime import timedelta
 from datetime import datetime
-import plotly.express as px
 import pandas as pd
 import sqlite3
 
@@ -19,8 +18,9 @@ from models import RacialGroup
 from models import Geography
 from models import FilteredDf
 from models import QUARTERS, MOST_RECENT_QUARTER, SEASON_QUARTER_MAPPING
-from models import Quarter
+from models import year_season_labels
 from fastapi_models import Endpoint, location_annotation
+from figure_specs import BarSpec
 from dash_helpers import (
     location_dropdown,
     demographic_dropdown,
@@ -72,22 +72,8 @@ def api_func(
     geo_filter = FilteredDf(location=location)
     geo_level_str = geo_filter.geography.string
     df_geo_all_time = geo_filter.df
-    df_geo_total_all_time = (
-        df_geo_all_time.groupby(
-            [
-                "districtoccur",
-                "psa",
-                "year",
-                "quarter_dt",
-                "quarter",
-                "q_str",
-            ]
-        )[[a.value.sql_column for a in PoliceAction]]
-        .sum()
-        .reset_index()
-    )
     df_grouped = (
-        df_geo_all_time.groupby(time_aggregation)[
+        df_geo_all_time.groupby(time_aggregation, observed=True)[
             ["n_frisked", "n_searched", "n_stopped"]
         ]
         .sum()
@@ -103,7 +89,7 @@ def api_func(
         value_name="total_count",
     )
     df_melted["x_label"] = (
-        df_melted["quarter"].apply(Quarter.year_quarter_to_year_season)
+        year_season_labels(df_melted["quarter"])
         if time_aggregation == "quarter"
         else df_melted["year"]
     )
@@ -118,7 +104,7 @@ def api_func(
     ).round(1)
 
     df_melted[" "] = df_melted["group"]
-    fig = px.bar(
+    fig = BarSpec(
         df_melted,
         x="x_label",
         y="total_count",
@@ -130,14 +116,11 @@ def api_func(
         barmode="group",
         hover_data=["frisk_rate", "search_rate"],
         color=" ",
+        hovertemplate={
+            "# of frisks": "%{x}<br>%{y:,} frisks<br>%{customdata[0]}% frisk rate<extra></extra>",
+            "# of searches": "%{x}<br>%{y:,} searches<br>%{customdata[1]}% search rate<extra></extra>",
+        },
     )
-    for trace in fig.data:
-        if trace["legendgroup"] == "# of frisks":
-            trace.hovertemplate = (
-                "%{x}<br>%{y:,} frisks<br>%{customdata[0]}% frisk rate<extra></extra>"
-            )
-        if trace["legendgroup"] == "# of searches":
-            trace.hovertemplate = "%{x}<br>%{y:,} searches<br>%{customdata[1]}% search rate<extra></extra>"
 
     return endpoint.output(
         fig_barplot=fig,
@@ -7,7 +7,6 @@ import dash_ag_grid as dag
 from datetime import date
 from datetime import timedelta
 from datetime import datetime
-import plotly.express as px
 import pandas as pd
 import sqlite3
 
@@ -26,6 +25,7 @@ from models import FilteredDf
 from models import QUARTERS, MOST_RECENT_QUARTER, SEASON_QUARTER_MAPPING
 from models import Quarter
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
+from figure_specs import BarSpec
 from dash_helpers import (
     deo_year_dropdown,
     location_dropdown,
@@ -96,7 +96,7 @@ def api_func(
     df_reasons = df_reasons[~df_reasons["violation_category"].isin(["Other", "None"])]
 
     df_reasons_grouped = (
-        df_reasons.groupby(["Race", "violation_category"])["n_stopped"]
+        df_reasons.groupby(["Race", "violation_category"], observed=True)["n_stopped"]
         .sum()
         .reset_index()
     )
@@ -106,13 +106,13 @@ def api_func(
     df_filt = df_reasons_grouped[df_reasons_grouped[col].isin(vals)].sort_values(
         [col, "n_stopped"], ascending=[race != "White", False]
     )
-    total_stops = df_filt.groupby(col)["n_stopped"].sum().to_dict()
+    total_stops = df_filt.groupby(col, observed=True)["n_stopped"].sum().to_dict()
 
     df_filt["pct_stopped"] = (
         100 * df_filt.apply(lambda x: x["n_stopped"] / total_stops[x[col]], axis=1)
     ).round(1)
-    df_filt["col_str"] = df_filt[col] + " drivers"
-    fig = px.bar(
+    df_filt["col_str"] = df_filt[col].astype(str) + " drivers"
+    fig = BarSpec(
         df_filt,
         x="violation_category",
         y="pct_stopped",
@@ -127,12 +127,11 @@ def api_func(
             "pct_stopped": "Percentage (%)",
             "violation_category": "Primary Reason for Traffic Stop",
         },
+        hovertemplate={
+            "Black drivers": "Black drivers<br>%{x}<br>%{y:.01f}% of traffic stops<br>%{customdata[0]:,} traffic stops<extra></extra>",
+            "White drivers": "White drivers<br>%{x}<br>%{y:.01f}% of traffic stops<br>%{customdata[0]:,} traffic stops<extra></extra>",
+        },
     )
-    for trace in fig.data:
-        if trace["legendgroup"] == "Black drivers":
-            trace.hovertemplate = "Black drivers<br>%{x}<br>%{y:.01f}% of traffic stops<br>%{customdata[0]:,} traffic stops<extra></extra>"
-        if trace["legendgroup"] == "White drivers":
-            trace.hovertemplate = "White drivers<br>%{x}<br>%{y:.01f}% of traffic stops<br>%{customdata[0]:,} traffic stops<extra></extra>"
 
     return endpoint.output(
         fig_barplot=fig,
@@ -8,7 +8,6 @@ import dash_ag_grid as dag
 from datetime import date
 from datetime import timedelta
 from datetime import datetime
-import plotly.express as px
 import pandas as pd
 import sqlite3
 
@@ -29,6 +28,7 @@ from models import FilteredDf
 from models import QUARTERS, MOST_RECENT_QUARTER, SEASON_QUARTER_MAPPING
 from models import Quarter
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
+from figure_specs import BarSpec
 from dash_helpers import (
     location_dropdown,
     deo_year_dropdown,
@@ -118,7 +118,7 @@ def api_func(
     )
 
     df_reasons_grouped = (
-        df_reasons.groupby(["Race", "violation_category"])["n_stopped"]
+        df_reasons.groupby(["Race", "violation_category"], observed=True)["n_stopped"]
         .sum()
         .reset_index()
     )
@@ -133,7 +133,9 @@ def api_func(
     ] = DistrictType.majority_nonwhite.value
 
     df_reasons_grouped_neighborhood = (
-        df_reasons.groupby(["violation_category", "majority_district"])["n_stopped"]
+        df_reasons.groupby(["violation_category", "majority_district"], observed=True)[
+            "n_stopped"
+        ]
         .sum()
         .reset_index()
     )
@@ -146,7 +148,7 @@ def api_func(
         100 * df_filt.apply(lambda x: x["n_stopped"] / total_stops[x[col]], axis=1)
     ).round(1)
     df_filt["col_str"] = df_filt[col] + " districts"
-    fig = px.bar(
+    fig = BarSpec(
         df_filt,
         x="violation_category",
         y="pct_stopped",
@@ -162,18 +164,15 @@ def api_func(
             "pct_stopped": "Percentage (%)",
             "violation_category": "Primary Reason for Traffic Stop",
         },
+        hovertemplate={
+            f"{district_type.value} districts": district_type.value
+            + " districts<br>%{x}<br>%{y:.01f}% of traffic stops<br>%{customdata[0]:,} traffic stops<extra></extra>"
+            for district_type in [
+                DistrictType.majority_nonwhite,
+                DistrictType.majority_white,
+            ]
+        },
     )
-    for trace in fig.data:
-        if trace["legendgroup"] == f"{DistrictType.majority_nonwhite.value} districts":
-            trace.hovertemplate = (
-                DistrictType.majority_nonwhite.value
-                + " districts<br>%{x}<br>%{y:.01f}% of traffic stops<br>%{customdata[0]:,} traffic stops<extra></extra>"
-            )
-        elif trace["legendgroup"] == f"{DistrictType.majority_white.value} districts":
-            trace.hovertemplate = (
-                DistrictType.majority_white.value
-                + " districts<br>%{x}<br>%{y:.01f}% of traffic stops<br>%{customdata[0]:,} traffic stops<extra></extra>"
-            )
 
     return endpoint.output(
         fig_barplot=fig,
@@ -8,7 +8,6 @@ import dash_ag_grid as dag
 from datetime import date
 from datetime import timedelta
 from datetime import datetime
-import plotly.express as px
 import pandas as pd
 import sqlite3
 
@@ -27,8 +26,9 @@ from models import RacialGroup
 from models import Geography
 from models import FilteredDf
 from models import QUARTERS, MOST_RECENT_QUARTER, SEASON_QUARTER_MAPPING
-from models import Quarter
+from models import year_season_labels
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
+from figure_specs import BarSpec
 from dash_helpers import (
     location_dropdown,
     qyear_dropdown,
@@ -95,18 +95,18 @@ def api_func(
         df_reasons["violation_category"].isin(VIOLATION_CATEGORIES_DEO_IMPACTED)
     ]
     df_grouped = (
-        df_reasons.groupby([time_aggregation, "violation_category"])[
+        df_reasons.groupby([time_aggregation, "violation_category"], observed=True)[
             [police_action.sql_column]
         ]
         .sum()
         .reset_index()
     )
     df_grouped["x_label"] = (
-        df_grouped["quarter"].apply(Quarter.year_quarter_to_year_season)
+        year_season_labels(df_grouped["quarter"])
         if time_aggregation == "quarter"
         else df_grouped["year"]
     )
-    fig = px.bar(
+    fig = BarSpec(
         df_grouped.sort_values(
             [time_aggregation, police_action.sql_column], ascending=[True, False]
         ),
@@ -118,15 +118,15 @@ def api_func(
             police_action.sql_column: "Number of Traffic Stops",
             "x_label": "Quarter" if time_aggregation == "quarter" else "Year",
         },
-    )
-    for trace in fig.data:
-        trace.hovertemplate = (
-            "%{x}<br>"
-            + trace["legendgroup"]
+        hovertemplate={
+            category: "%{x}<br>"
+            + category
             + "<br>%{y:,} "
             + police_action.noun
             + "<extra></extra>"
-        )
+            for category in df_grouped["violation_category"].unique()
+        },
+    )
 
     return endpoint.output(
         fig_barplot=fig,
@@ -1,5 +1,6 @@
 from dash import Dash, html, dcc, callback, Output, Input
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
+from figure_specs import BarSpec
 from models import QUARTERS, MOST_RECENT_QUARTER, SEASON_QUARTER_MAPPING
 from models import VIOLATION_CATEGORIES_OPERATIONAL
 import numpy as np
@@ -11,7 +12,6 @@ import dash_ag_grid as dag
 from datetime import date
 from datetime import timedelta
 from datetime import datetime
-import plotly.express as px
 import pandas as pd
 import sqlite3
 
@@ -67,7 +67,7 @@ def api_func(
         df_type=DfType.stops_by_reason,
     ).df
     df_percent_action_by_demo = (
-        df_filtered.groupby([demographic_category, "violation_category"])[
+        df_filtered.groupby([demographic_category, "violation_category"], observed=True)[
             [
                 police_action.sql_column,
             ]
@@ -82,9 +82,9 @@ def api_func(
                     VIOLATION_CATEGORIES_OPERATIONAL
                 )
             ]
-            .groupby(demographic_category)[police_action.sql_column]
+            .groupby(demographic_category, observed=True)[police_action.sql_column]
             .sum()
-            / df_percent_action_by_demo.groupby(demographic_category)[
+            / df_percent_action_by_demo.groupby(demographic_category, observed=True)[
                 police_action.sql_column
             ].sum()
             * 100
@@ -98,17 +98,16 @@ def api_func(
         df_percent_action_by_demo_pct[demographic_category],
         DemographicCategory(demographic_category).order_of_group,
     )
-    fig = px.bar(
+    fig = BarSpec(
         df_percent_action_by_demo_pct.sort_values(demographic_category),
         x=demographic_category.value,
         title=f"Percentage of Operational Stops by Race in {year}",
         labels={"pct_operational": "Percentage (%)"},
         y="pct_operational",
-    )
-    for trace in fig.data:
-        trace.hovertemplate = (
+        hovertemplate=(
             "%{x}<br>%{y:}% of traffic stops for operational violations<extra></extra>"
-        )
+        ),
+    )
 
     return endpoint.output(
         fig_barplot=fig,
@@ -3,8 +3,8 @@ from dash_helpers import (
     Subtitle,
 )
 from .num_accidents import LAYOUT as NUM_ACCIDENTS_LAYOUT
-from .hin_map import LAYOUT as HIN_MAP_LAYOUT
-from .shootings_vs_stops_maps import LAYOUT as SHOOTINGS_VS_STOPS_MAPS_LAYOUT
+from .hin_map import hin_map_layout
+from .shootings_vs_stops_maps import shootings_vs_stops_layout
 
 PAGE_TITLE = "Do traffic stops promote safety?"
 SUBTITLE_1 = Subtitle(name="Do traffic stops happen where car accidents happen?")
@@ -25,10 +25,14 @@ MENU_LAYOUT = [
     SUBTITLE_1.h2,
 ]
 
-layout = html.Div(
-    MENU_LAYOUT
-    + NUM_ACCIDENTS_LAYOUT
-    + HIN_MAP_LAYOUT
-    + [SUBTITLE_2.h2]
-    + SHOOTINGS_VS_STOPS_MAPS_LAYOUT
-)
+
+def layout():
+    # A function, which Dash calls on each page load, so that importing the
+    # page doesn't load the data behind its maps
+    return html.Div(
+        MENU_LAYOUT
+        + NUM_ACCIDENTS_LAYOUT
+        + [html.Div(hin_map_layout())]
+        + [SUBTITLE_2.h2]
+        + [html.Div(shootings_vs_stops_layout())]
+    )
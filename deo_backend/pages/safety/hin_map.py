@@ -15,14 +15,16 @@ from dash_helpers import (ActionWordType, Subtitle, TimeAggregationChoice,
                           demographic_dropdown, location_dropdown,
                           police_action_dropdown, qyear_dropdown)
 from demographic_constants import DEMOGRAPHICS_DISTRICT
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
 from models import (MOST_RECENT_QUARTER, QUARTERS, SEASON_QUARTER_MAPPING,
                     AgeGroup, DemographicCategory, FilteredDf, GenderGroup,
                     Geography, PoliceAction, PoliceActionName, Quarter,
                     QuarterHow, RacialGroup, hin_geojson_2020,
                     hin_geojson_2025, hin_sample_locations_df)
+from response_format import set_geometry_format
 from routers import ROUTERS
+from timing import span
 
 prefixes = __name__.split(".")[-2:]
 prefix = prefixes[0].replace("_", "-") + "-" + prefixes[1].replace("_", "-")
@@ -30,6 +32,7 @@ API_URL = f"/{prefixes[0]}/{prefix}"
 router = ROUTERS[prefixes[0]]
 
 
+@span("figure")
 def hin_map_2025():
     df = hin_sample_locations_df()
     endpoint = Endpoint(api_route=API_URL, inputs=locals())
@@ -79,10 +82,12 @@ def hin_map_2025():
         mapbox_center={"lat": df["lat"].median(), "lon": df["lng"].median()},
     )
     fig.update_layout(hovermode='closest')
+    # The layers are the features of this geometry, see Endpoint.json
+    fig.update_layout(meta={"geometry": "hin-2025"})
 
     return fig
 
-@router.get(API_URL)
+@router.get(API_URL, dependencies=[Depends(set_geometry_format)])
 def api_func():
     endpoint = Endpoint(api_route=API_URL, inputs=locals())
     map_hin = hin_map_2025()
@@ -99,7 +104,3 @@ def hin_map_layout():
         dcc.Graph(figure=map_hin_2025),
     ]
 
-
-LAYOUT = [
-    html.Div(hin_map_layout()),
-]
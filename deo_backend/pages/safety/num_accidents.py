@@ -7,12 +7,11 @@ import dash_ag_grid as dag
 from datetime import date
 from datetime import timedelta
 from datetime import datetime
-import plotly.express as px
 import pandas as pd
 import sqlite3
 
 from models import PoliceAction
-from models import before_deo_filter_hin, after_deo_filter_hin
+from models import DEO_WINDOWS
 from models import PoliceActionName
 from models import DfType
 from demographic_constants import (
@@ -25,8 +24,9 @@ from models import RacialGroup
 from models import Geography
 from models import FilteredDf
 from models import QUARTERS, MOST_RECENT_QUARTER, SEASON_QUARTER_MAPPING
-from models import Quarter
+from models import year_season_labels
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
+from figure_specs import BarSpec
 from dash_helpers import (
     location_dropdown,
     qyear_dropdown,
@@ -90,22 +90,8 @@ def api_func(
 
     df_geo_all_time = geo_filter.df
 
-    def _get_value_and_pct(start_date, end_date):
-        value = (
-            FilteredDf(location=location, start_date=start_date, end_date=end_date)
-            .df["n_stopped_locatable_on_hin"]
-            .mean()
-        )
-        value_stop = (
-            FilteredDf(location=location, start_date=start_date, end_date=end_date)
-            .df["n_stopped_locatable"]
-            .mean()
-        )
-        pct = value / value_stop * 100
-        return value, pct
-
     df_grouped = (
-        df_geo_all_time.groupby(time_aggregation)[
+        df_geo_all_time.groupby(time_aggregation, observed=True)[
             ["n_stopped_locatable", "n_stopped_locatable_on_hin"]
         ]
         .sum()
@@ -117,12 +103,12 @@ def api_func(
         / df_grouped["n_stopped_locatable"]
     ).round(1)
     df_grouped["x_label"] = (
-        df_grouped["quarter"].apply(Quarter.year_quarter_to_year_season)
+        year_season_labels(df_grouped["quarter"])
         if time_aggregation == "quarter"
         else df_grouped["year"]
     )
 
-    fig1 = px.bar(
+    fig1 = BarSpec(
         df_grouped,
         x="x_label",
         y="pct_in_hin",
@@ -131,21 +117,21 @@ def api_func(
             "pct_in_hin": "Percentage (%)",
             "x_label": "Quarter" if time_aggregation == "quarter" else "Year",
         },
+        hovertemplate="%{x}<br>%{y:}% of traffic stops on HIN",
+        layout={"yaxis": {"range": [0, 100]}},
     )
-    fig1.update_yaxes(range=[0, 100])
-
-    for trace in fig1.data:
-        trace.hovertemplate = "%{x}<br>%{y:}% of traffic stops on HIN"
 
     # Comparing Before vs After DEO
-    before_deo_ratio_on_hin = (
-        before_deo_filter_hin.df["n_stopped_locatable_on_hin"].sum()
-        / before_deo_filter_hin.df["n_stopped_locatable"].sum()
+    hin_filter = FilteredDf(location="*", df_type=DfType.stops_by_hin)
+    deo_totals = hin_filter.aggregate_windows(
+        DEO_WINDOWS, ["n_stopped_locatable", "n_stopped_locatable_on_hin"]
     )
-    after_deo_ratio_on_hin = (
-        after_deo_filter_hin.df["n_stopped_locatable_on_hin"].sum()
-        / after_deo_filter_hin.df["n_stopped_locatable"].sum()
+    ratio_on_hin = (
+        deo_totals["n_stopped_locatable_on_hin", "sum"]
+        / deo_totals["n_stopped_locatable", "sum"]
     )
+    before_deo_ratio_on_hin = ratio_on_hin["before_deo"]
+    after_deo_ratio_on_hin = ratio_on_hin["after_deo"]
     pct_increase_on_hin_with_deo = (
         100
         * (after_deo_ratio_on_hin - before_deo_ratio_on_hin)
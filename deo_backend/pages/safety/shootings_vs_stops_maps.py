@@ -8,21 +8,21 @@ import dash_ag_grid as dag
 import fastapi
 import pandas as pd
 import plotly.express as px
-import plotly.graph_objects as go
 from dash import dcc, html
 from dash_helpers import (ActionWordType, Subtitle, TimeAggregationChoice,
                           demographic_dropdown, location_dropdown,
                           police_action_dropdown, qyear_dropdown)
 from demographic_constants import DEMOGRAPHICS_DISTRICT
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, Query
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
+from figure_specs import ChoroplethSpec
 from models import (MOST_RECENT_QUARTER, QUARTERS, SEASON_QUARTER_MAPPING,
                     AgeGroup, DemographicCategory, FilteredDf, GenderGroup,
                     Geography, PoliceAction, PoliceActionName, Quarter,
                     QuarterHow, RacialGroup, df_shootings_raw,
-                    hin_geojson_2020, hin_sample_locations_df,
-                    police_districts_geojson)
+                    hin_geojson_2020, hin_sample_locations_df)
 from pydantic import BaseModel
+from response_format import set_geometry_format
 from routers import ROUTERS
 
 prefixes = __name__.split(".")[-2:]
@@ -84,7 +84,7 @@ def shootings_vs_stops_map(start, end, title, decrease_col, increase_col):
     df_shootings = df_shootings_raw()
     df_stops_start = (
         FilteredDf(start_date=start[0], end_date=start[1])
-        .df.groupby(["quarter", "districtoccur"])["n_stopped"]
+        .df.groupby(["quarter", "districtoccur"], observed=True)["n_stopped"]
         .sum()
         .reset_index()
     )
@@ -94,7 +94,9 @@ def shootings_vs_stops_map(start, end, title, decrease_col, increase_col):
         how="left",
     )
     df_year_start_by_district = (
-        df_year_start.groupby("districtoccur")[["n_stopped", "n_shootings"]]
+        df_year_start.groupby("districtoccur", observed=True)[
+            ["n_stopped", "n_shootings"]
+        ]
         .sum()
         .rename(
             columns={
@@ -105,7 +107,7 @@ def shootings_vs_stops_map(start, end, title, decrease_col, increase_col):
     )
     df_stops_end = (
         FilteredDf(start_date=end[0], end_date=end[1])
-        .df.groupby(["quarter", "districtoccur"])["n_stopped"]
+        .df.groupby(["quarter", "districtoccur"], observed=True)["n_stopped"]
         .sum()
         .reset_index()
     )
@@ -113,7 +115,9 @@ def shootings_vs_stops_map(start, end, title, decrease_col, increase_col):
         df_shootings, on=["quarter", "districtoccur"], how="left"
     )
     df_year_end_by_district = (
-        df_year_end.groupby("districtoccur")[["n_stopped", "n_shootings"]]
+        df_year_end.groupby("districtoccur", observed=True)[
+            ["n_stopped", "n_shootings"]
+        ]
         .sum()
         .rename(
             columns={"n_stopped": "n_stopped_end", "n_shootings": "n_shootings_end"}
@@ -174,10 +178,6 @@ def shootings_vs_stops_map(start, end, title, decrease_col, increase_col):
     colorscale_shootings = [green, white, end]
     # Create Choroplethmapbox trace
 
-    original_geojson = police_districts_geojson()
-
-    features = []
-
     def hovertext(row):
         def _rank_str(x):
             int_x = int(x)
@@ -231,50 +231,37 @@ def shootings_vs_stops_map(start, end, title, decrease_col, increase_col):
         )
 
     shootings_stops = pd.concat([most_decreased, most_increased])
-    for feature in original_geojson["features"]:
-        dist_numc = feature["properties"]["DIST_NUMC"]
-        rows = shootings_stops[shootings_stops["districtoccur"] == dist_numc]
-
-        if rows.empty:
+    # The properties of each district drawn, from its first row
+    properties = {}
+    for _, row in shootings_stops.iterrows():
+        if row["districtoccur"] in properties:
             continue
-
-        is_top_5_decrease = bool(rows.iloc[0]["is_top_5_decrease"])
-        is_top_5_increase = bool(rows.iloc[0]["is_top_5_increase"])
-
-        row = rows.iloc[0]
-        feature["properties"][f"is_top_{decrease_col_obj.column}_change"] = (
-            is_top_5_decrease
-        )
-        feature["properties"][f"is_top_{increase_col_obj.column}_change"] = (
-            is_top_5_increase
-        )
-        feature["properties"]["hovertext"] = hovertext(
-            row,
-        )
-        features.append(feature)
-    geojson = {"type": "FeatureCollection", "features": features}
-
-    hovertext = [hovertext(row) for i, row in shootings_stops.iterrows()]
-    choropleth_mapbox_shootings = go.Choroplethmapbox(
-        geojson=geojson,
-        featureidkey="properties.DIST_NUMC",
-        locations=shootings_stops["districtoccur"],
-        z=shootings_stops[f"ranked_{decrease_col}_decrease"]
-        * shootings_stops[f"ranked_{increase_col}_increase"],
-        colorscale=colorscale_shootings,
-        marker_opacity=0.7,
-        hovertemplate="%{text}<extra></extra>",
-        text=hovertext,
-    )
-    # Create Mapbox figure
-
-    fig = go.Figure(choropleth_mapbox_shootings)
-
-    fig.update_layout(
+        properties[row["districtoccur"]] = {
+            f"is_top_{decrease_col_obj.column}_change": bool(row["is_top_5_decrease"]),
+            f"is_top_{increase_col_obj.column}_change": bool(row["is_top_5_increase"]),
+            "hovertext": hovertext(row),
+        }
+
+    fig = ChoroplethSpec(
+        geometry="police-districts",
         title=title,
-        mapbox_style="carto-positron",
-        mapbox_zoom=10,
-        mapbox_center={"lat": 39.9526, "lon": -75.1652},
+        properties=properties,
+        locations=shootings_stops["districtoccur"].tolist(),
+        z=(
+            shootings_stops[f"ranked_{decrease_col}_decrease"]
+            * shootings_stops[f"ranked_{increase_col}_increase"]
+        ).tolist(),
+        text=[hovertext(row) for i, row in shootings_stops.iterrows()],
+        trace={
+            "colorscale": colorscale_shootings,
+            "marker_opacity": 0.7,
+            "hovertemplate": "%{text}<extra></extra>",
+        },
+        layout={
+            "mapbox_style": "carto-positron",
+            "mapbox_zoom": 10,
+            "mapbox_center": {"lat": 39.9526, "lon": -75.1652},
+        },
     )
     return (
         fig,
@@ -299,7 +286,7 @@ def get_text_sentence_deo(n_stops_start: int, n_stops_end: int):
     return f"Comparing before and after Driving Equality, the Philadelphia Police Department decreased traffic stops by {-1*stops_diff:,} stops, a {-1*pct_diff:.01f}% decrease. The map below compares the 5 districts with the largest percent decreases in traffic stops to the 5 districts with the largest percent increases in shootings. This map attempts to see whether the districts with the largest percent decreases in traffic stops also had the largest percent increases in shootings. Here, only one district, the 3rd district, had such an outcome, with the third largest percent decrease of traffic stops and the third largest percent increase in shootings."
 
 
-@router.get(API_URL)
+@router.get(API_URL, dependencies=[Depends(set_geometry_format)])
 def api_func():
     endpoint = Endpoint(api_route=API_URL, inputs=locals())
     map_surge, n_surge_stops_start, n_surge_stops_end = shootings_vs_stops_map(
@@ -348,13 +335,11 @@ def shootings_vs_stops_layout():
             "During a surge in traffic stops from 2018 to 2019, which districts had the largest increases in traffic stops? Were these the same districts that had the largest decreases in shootings?"
         ),
         dcc.Markdown(get_text_sentence_surge(n_surge_stops_start, n_surge_stops_end)),
-        dcc.Graph(figure=map_surge),
+        dcc.Graph(figure=map_surge.plotly()),
         html.Div(
             "Driving Equality came into effect on March 3, 2022. In the year after Driving Equality, which districts had the largest percent decreases in traffic stops, compared to 2021? (See What is Driving Equality? to learn more about these date comparisons.) Were these the same districts that had the largest percent increases in shootings?"
         ),
         dcc.Markdown(get_text_sentence_deo(n_deo_stops_start, n_deo_stops_end)),
-        dcc.Graph(figure=map_deo),
+        dcc.Graph(figure=map_deo.plotly()),
     ]
 
-
-LAYOUT = [html.Div(shootings_vs_stops_layout())]
@@ -1,11 +1,16 @@
 from fastapi import APIRouter
 from dash import Dash, html, dcc, callback, Output, Input
-from .annual_summary import LAYOUT as SUMMARY_LAYOUT
+from .annual_summary import layout as summary_layout
 
 PAGE_TITLE = "Snapshot Summary..."
-layout = html.Div(
-    [
-        html.Br(),
-        SUMMARY_LAYOUT,
-    ]
-)
+
+
+def layout():
+    # A function, which Dash calls on each page load, so that importing the
+    # page doesn't load the data
+    return html.Div(
+        [
+            html.Br(),
+            html.Div(summary_layout()),
+        ]
+    )
@@ -1,7 +1,6 @@
 from dash import Dash, html, dcc, callback, Output, Input
 from models import TimeAggregation
 import numpy as np
-from plotly.graph_objs import Figure
 import uuid
 from typing import Literal
 from typing import Annotated
@@ -11,13 +10,12 @@ from datetime import date
 from pydantic import BaseModel
 from datetime import timedelta
 from datetime import datetime
-import plotly.express as px
 import pandas as pd
 import sqlite3
 
 from models import PoliceAction
 from models import AgeGroup
-from models import before_deo_filter, after_deo_filter
+import models
 from models import DemographicCategory
 from models import GenderGroup
 from models import RacialGroup
@@ -26,7 +24,7 @@ from models import FilteredDf
 from models import QUARTERS, MOST_RECENT_QUARTER, SEASON_QUARTER_MAPPING
 from models import Quarter
 from fastapi_models import Endpoint, location_annotation
-from models import ALL_QUARTERS
+from figure_specs import BarSpec
 from dash_helpers import (
     location_dropdown,
     demographic_dropdown,
@@ -46,18 +44,14 @@ API_URL = f"/{prefixes[0]}/{prefix}"
 router = ROUTERS[prefixes[0]]
 
 
-start_date = ALL_QUARTERS[-4]
-end_date = ALL_QUARTERS[-1]
-
-
 class SnapshotSummaryData(BaseModel):
     filtered_df: FilteredDf
     n_total: int
     avg_monthly_stops: int
     pct_not_found: float
-    fig: Figure
-    fig_deo_pct: Figure
-    fig_deo_total: Figure
+    fig: BarSpec
+    fig_deo_pct: BarSpec
+    fig_deo_total: BarSpec
     num_stops_year_before_deo: int
     num_stops_year_after_deo: int
     num_stops_white_deo_decrease: int
@@ -70,21 +64,28 @@ class SnapshotSummaryData(BaseModel):
 def get_summary():
     police_action = PoliceAction.stop.value
     demographic_category = DemographicCategory.race.value
-    date_filter = FilteredDf(start_date=start_date, end_date=end_date)
-    df_date = date_filter.df
+    # Looked up here rather than imported, since building them loads the data
+    before_deo_filter = models.before_deo_filter
+    after_deo_filter = models.after_deo_filter
+    date_filter = FilteredDf(
+        start_date=models.ALL_QUARTERS[-4], end_date=models.ALL_QUARTERS[-1]
+    )
+    date_totals = date_filter.aggregate(
+        [police_action.sql_column, "n_contraband", "n_intruded"]
+    )
 
     avg_monthly_stops = date_filter.get_avg_monthly_value(police_action)
-    n_total = df_date[police_action.sql_column].sum()
+    n_total = date_totals[police_action.sql_column]
 
     # Miss Rate
     pct_not_found = (
-        1 - (df_date["n_contraband"].sum() / df_date["n_intruded"].sum())
+        1 - (date_totals["n_contraband"] / date_totals["n_intruded"])
     ) * 100
 
     # demographic_breakdown_of_stops_graph
-    n_actions_by_demo = df_date.groupby(demographic_category)[
-        police_action.sql_column
-    ].sum()
+    n_actions_by_demo = date_filter.aggregate(
+        [police_action.sql_column], by=[demographic_category]
+    )[police_action.sql_column]
 
     stop_pct_col = "% of traffic stops"
     pop_pct_col = "% of city population"
@@ -119,7 +120,7 @@ def get_summary():
         DemographicCategory(demographic_category).order_of_group,
     )
 
-    fig = px.bar(
+    fig = BarSpec(
         df_melted.sort_values(demographic_category),
         x=demographic_category,
         title=f"Racial Demographics of Traffic Stops vs. City Population from {date_filter.get_date_range_str(TimeAggregation.quarter)}",
@@ -130,25 +131,22 @@ def get_summary():
         },
         barmode="group",
         color=" ",
+        hovertemplate={
+            stop_pct_col: "%{x}<br>%{y}% of traffic stops<extra></extra>",
+            pop_pct_col: "%{x}<br>%{y}% of city population<extra></extra>",
+        },
     )
-    for trace in fig.data:
-        if trace["legendgroup"] == stop_pct_col:
-            trace.hovertemplate = "%{x}<br>%{y}% of traffic stops<extra></extra>"
-        else:
-            trace.hovertemplate = "%{x}<br>%{y}% of city population<extra></extra>"
 
-    value_before_deo = before_deo_filter.df["n_stopped"].sum()
-    value_after_deo = after_deo_filter.df["n_stopped"].sum()
+    value_before_deo = before_deo_filter.aggregate(["n_stopped"])["n_stopped"]
+    value_after_deo = after_deo_filter.aggregate(["n_stopped"])["n_stopped"]
 
     # demographic_breakdown_of_stops_graph
-    df_date_before = before_deo_filter.df
-    n_actions_by_demo_before = df_date_before.groupby(demographic_category)[
-        police_action.sql_column
-    ].sum()
-    df_date_after = after_deo_filter.df
-    n_actions_by_demo_after = df_date_after.groupby(demographic_category)[
-        police_action.sql_column
-    ].sum()
+    n_actions_by_demo_before = before_deo_filter.aggregate(
+        [police_action.sql_column], by=[demographic_category]
+    )[police_action.sql_column]
+    n_actions_by_demo_after = after_deo_filter.aggregate(
+        [police_action.sql_column], by=[demographic_category]
+    )[police_action.sql_column]
 
     pre_deo_pct_col = "% before Driving Equality"
     pre_deo_num_col = "# before Driving Equality"
@@ -184,7 +182,7 @@ def get_summary():
         DemographicCategory(demographic_category).order_of_group,
     )
 
-    fig_deo_pct = px.bar(
+    fig_deo_pct = BarSpec(
         df_melted_deo.sort_values(demographic_category),
         x=demographic_category,
         title="Racial Demographics of Traffic Stops Before and After Driving Equality vs. City Population",
@@ -195,14 +193,12 @@ def get_summary():
         },
         barmode="group",
         color=" ",
+        hovertemplate={
+            pre_deo_pct_col: "Before Driving Equality<br>%{x}<br>%{y}% of traffic stops<extra></extra>",
+            post_deo_pct_col: "After Driving Equality<br>%{x}<br>%{y}% of traffic stops<extra></extra>",
+            pop_pct_col: "%{x}<br>%{y}% of city population<extra></extra>",
+        },
     )
-    for trace in fig_deo_pct.data:
-        if trace["legendgroup"] == pre_deo_pct_col:
-            trace.hovertemplate = "Before Driving Equality<br>%{x}<br>%{y}% of traffic stops<extra></extra>"
-        elif trace["legendgroup"] == post_deo_pct_col:
-            trace.hovertemplate = "After Driving Equality<br>%{x}<br>%{y}% of traffic stops<extra></extra>"
-        else:
-            trace.hovertemplate = "%{x}<br>%{y}% of city population<extra></extra>"
 
     df_melted_deo = pd.melt(
         df_deo.reset_index(names=demographic_category),
@@ -217,7 +213,7 @@ def get_summary():
         DemographicCategory(demographic_category).order_of_group,
     )
 
-    fig_deo_total = px.bar(
+    fig_deo_total = BarSpec(
         df_melted_deo.sort_values(demographic_category),
         x=demographic_category,
         title="Number of Traffic Stops by Race Before and After Driving Equality",
@@ -228,16 +224,11 @@ def get_summary():
         },
         barmode="group",
         color=" ",
+        hovertemplate={
+            pre_deo_num_col: "Before Driving Equality<br>%{x}<br>%{y:,} traffic stops<extra></extra>",
+            post_deo_num_col: "After Driving Equality<br>%{x}<br>%{y:,} traffic stops<extra></extra>",
+        },
     )
-    for trace in fig_deo_total.data:
-        if trace["legendgroup"] == pre_deo_num_col:
-            trace.hovertemplate = (
-                "Before Driving Equality<br>%{x}<br>%{y:,} traffic stops<extra></extra>"
-            )
-        elif trace["legendgroup"] == post_deo_num_col:
-            trace.hovertemplate = (
-                "After Driving Equality<br>%{x}<br>%{y:,} traffic stops<extra></extra>"
-            )
     df_deo_num_stops_decrease = (
         df_deo["# before Driving Equality"] - df_deo["# after Driving Equality"]
     )
@@ -329,7 +320,7 @@ def layout():
         html.Div(
             [
                 "In the last year, what were the racial disparities in traffic stops by Philadelphia police? How does the city population compare to who was stopped?",
-                dcc.Graph(figure=summary_data.fig),
+                dcc.Graph(figure=summary_data.fig.plotly()),
                 dcc.Markdown(
                     "When Philadelphia police intrude during traffic stops, they do not find any contraband most of the time. "
                     + get_text_sentence_contraband(summary_data)
@@ -348,16 +339,14 @@ def layout():
                     .replace("</span>", "**")
                     + ", compared to 2021 (see What is Driving Equality? to learn more about these date comparisons). Concerningly, racial disparities in traffic stops have persisted."
                 ),
-                dcc.Graph(figure=summary_data.fig_deo_pct),
+                dcc.Graph(figure=summary_data.fig_deo_pct.plotly()),
                 dcc.Markdown(
                     get_text_sentence_num_deo(summary_data)
                     .replace("<span>", "**")
                     .replace("</span>", "**")
                 ),
-                dcc.Graph(figure=summary_data.fig_deo_total),
+                dcc.Graph(figure=summary_data.fig_deo_total.plotly()),
             ]
         ),
     ]
 
-
-LAYOUT = html.Div(layout())
@@ -21,9 +21,9 @@ from models import GenderGroup
 from models import RacialGroup
 from models import FilteredDf
 import pandas as pd
-import plotly.express as px
 from routers import ROUTERS
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
+from figure_specs import BarSpec
 
 prefixes = __name__.split(".")[-2:]
 prefix = prefixes[1].replace("_", "-")
@@ -74,14 +74,11 @@ def api_func(
     geo_filter = FilteredDf(
         location=location, start_date=start_qyear, end_date=end_qyear
     )
-    df_geo_all_time = geo_filter.df
 
     # Demographic
-    df_timeseries_demo = (
-        df_geo_all_time.groupby(demographic_category)[police_action.sql_column]
-        .sum()
-        .reset_index()
-    )
+    df_timeseries_demo = geo_filter.aggregate(
+        [police_action.sql_column], by=[demographic_category]
+    ).reset_index()
 
     df_timeseries_demo["percentage"] = (
         df_timeseries_demo[police_action.sql_column]
@@ -97,7 +94,7 @@ def api_func(
         demographic_category
     ].str.title()
 
-    fig = px.bar(
+    fig = BarSpec(
         df_timeseries_demo,
         x=demographic_category,
         y="percentage",
@@ -107,14 +104,13 @@ def api_func(
         },
         title=f"Percent of PPD {police_action.noun.title()} in {geo_filter.geography.string} by {demographic_category} from {geo_filter.get_date_range_str(TimeAggregation.quarter)}",
         hover_data=[police_action.sql_column],
-    )
-    for trace in fig.data:
-        trace.hovertemplate = (
+        hovertemplate=(
             "%{x}<br>%{y}% of "
             + police_action.noun
             + "<br>%{customdata[0]:,} "
             + police_action.noun
-        )
+        ),
+    )
     return endpoint.output(
         fig_barplot=fig,
     )
@@ -18,12 +18,12 @@ from dash_helpers import (
     location_dropdown,
     qyear_dropdown,
 )
-from models import Quarter
-import plotly.express as px
+from models import year_season_labels
 from models import FilteredDf
 import pandas as pd
 from routers import ROUTERS
 from fastapi_models import Endpoint, location_annotation, quarter_annotation
+from figure_specs import BarSpec
 
 prefixes = __name__.split(".")[-2:]
 prefix = prefixes[1].replace("_", "-")
@@ -201,14 +201,12 @@ def q2_groups(
     df_group2["group"] = "Group 2"
     df_groups = (
         pd.concat([df_group1, df_group2])
-        .groupby(["group", "quarter"])
+        .groupby(["group", "quarter"], observed=True)
         .sum(numeric_only=True)
         .reset_index()
     )
-    df_groups["season"] = df_groups["quarter"].apply(
-        Quarter.year_quarter_to_year_season
-    )
-    fig = px.bar(
+    df_groups["season"] = year_season_labels(df_groups["quarter"])
+    fig = BarSpec(
         df_groups,
         title=f"Number of PPD {police_action.noun.title()} in {geo_filter.geography.string}, Comparing Group 1 to Group 2, from {geo_filter.get_date_range_str(TimeAggregation.quarter)}",
         x="season",
@@ -220,13 +218,12 @@ def q2_groups(
         barmode="group",
         color="group",
         hover_data=["group"],
-    )
-    for trace in fig.data:
-        trace.hovertemplate = (
+        hovertemplate=(
             "%{x}<br>%{customdata[0]}<br>%{y:,} "
             + police_action.noun
             + "<extra></extra>"
-        )
-    fig.update_traces(showlegend=False)
+        ),
+        traces={"showlegend": False},
+    )
 
     return endpoint.output(fig_barplot=fig)
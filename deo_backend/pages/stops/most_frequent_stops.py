@@ -81,7 +81,9 @@ def stops__most_frequent_stops(
     # Most stopped folks
     total = df_geo[police_action.sql_column].sum()
     sorted_values = (
-        df_geo.groupby([v for v in DemographicCategory])[police_action.sql_column]
+        df_geo.groupby([v for v in DemographicCategory], observed=True)[
+            police_action.sql_column
+        ]
         .sum()
         .sort_values(ascending=False)
         / total
@@ -96,7 +98,7 @@ def stops__most_frequent_stops(
     # Ranked Demographics
     sorted_values = (
         (
-            df_geo.groupby([v.value for v in DemographicCategory])[
+            df_geo.groupby([v.value for v in DemographicCategory], observed=True)[
                 police_action.sql_column
             ]
             .sum()
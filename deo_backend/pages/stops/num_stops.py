@@ -7,7 +7,6 @@ import dash_ag_grid as dag
 from datetime import date
 from datetime import timedelta
 from datetime import datetime
-import plotly.express as px
 import pandas as pd
 import sqlite3
 
@@ -19,8 +18,9 @@ from models import RacialGroup
 from models import Geography
 from models import FilteredDf
 from models import QUARTERS, MOST_RECENT_QUARTER, SEASON_QUARTER_MAPPING
-from models import Quarter
+from models import year_season_labels
 from fastapi_models import Endpoint, location_annotation
+from figure_specs import BarSpec
 from dash_helpers import (
     location_dropdown,
     qyear_dropdown,
@@ -78,49 +78,34 @@ def api_func(
 
     police_action = PoliceAction.stop.value
     geo_filter = FilteredDf(location=location)
-    df_geo_all_time = geo_filter.df
     geo_level_str = geo_filter.geography.string
 
-    # Graph2
-    df_geo_total_all_time = (
-        df_geo_all_time.groupby(
-            [
-                "districtoccur",
-                "psa",
-                "year",
-                "quarter",
-                "q_str",
-            ]
-        )[[a.value.sql_column for a in PoliceAction]]
-        .sum()
-        .reset_index()
-    )
-
-    value_2014_to_2018 = FilteredDf(
-        location=location, start_date="2014-Q1", end_date="2018-Q4"
-    ).get_avg_monthly_value(police_action)
-
-    value_2019_surge = FilteredDf(
-        location=location, start_date="2019-Q1", end_date="2019-Q4"
-    ).get_avg_monthly_value(police_action)
-
-    value_covid = FilteredDf(
-        location=location, start_date="2020-Q2", end_date="2021-Q1"
-    ).get_avg_monthly_value(police_action)
-
-    num_total = df_geo_total_all_time[police_action.sql_column].sum()
-    df_grouped = (
-        df_geo_all_time.groupby(time_aggregation)[[police_action.sql_column]]
-        .sum()
-        .reset_index()
+    windows = geo_filter.aggregate_windows(
+        {
+            "2014_to_2018": ("2014-Q1", "2018-Q4"),
+            "2019_surge": ("2019-Q1", "2019-Q4"),
+            "covid": ("2020-Q2", "2021-Q1"),
+        },
+        [police_action.sql_column],
     )
+    monthly = windows[police_action.sql_column, "monthly"].round().astype(int)
+    value_2014_to_2018 = monthly["2014_to_2018"]
+    value_2019_surge = monthly["2019_surge"]
+    value_covid = monthly["covid"]
+
+    num_total = geo_filter.aggregate([police_action.sql_column])[
+        police_action.sql_column
+    ]
+    df_grouped = geo_filter.aggregate(
+        [police_action.sql_column], by=[time_aggregation]
+    ).reset_index()
     df_grouped["x_label"] = (
-        df_grouped["quarter"].apply(Quarter.year_quarter_to_year_season)
+        year_season_labels(df_grouped["quarter"])
         if time_aggregation == "quarter"
         else df_grouped["year"]
     )
 
-    fig1 = px.bar(
+    fig1 = BarSpec(
         df_grouped,
         x="x_label",
         y=police_action.sql_column,
@@ -129,9 +114,8 @@ def api_func(
             police_action.sql_column: "Number of Traffic Stops",
             "x_label": "Quarter" if time_aggregation == "quarter" else "Year",
         },
+        hovertemplate="%{x}<br>%{y:,} " + police_action.noun,
     )
-    for trace in fig1.data:
-        trace.hovertemplate = "%{x}<br>%{y:,} " + police_action.noun
 
     full_data_sentence = f"From {geo_filter.get_date_range_str_long(time_aggregation)}, Philadelphia police made a total of <span>{num_total:,}</span> {police_action.noun} in {geo_level_str}."
     data_over_time_sentences = f"""
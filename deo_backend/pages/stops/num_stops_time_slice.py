@@ -85,8 +85,7 @@ def stops__num_stops_time_slice(
         location=location, start_date=start_qyear, end_date=end_qyear
     )
     geo_level_str = geo_filter.geography.string
-    df_geo = geo_filter.df
-    total = df_geo[police_action.sql_column].sum()
+    total = geo_filter.aggregate([police_action.sql_column])[police_action.sql_column]
     total_per_month = geo_filter.get_avg_monthly_value(police_action)
 
     return endpoint.output(
@@ -7,7 +7,6 @@ import dash_ag_grid as dag
 from datetime import date
 from datetime import timedelta
 from datetime import datetime
-import plotly.express as px
 import pandas as pd
 import sqlite3
 
@@ -23,6 +22,7 @@ from models import FilteredDf
 from models import QUARTERS, MOST_RECENT_QUARTER, SEASON_QUARTER_MAPPING
 from models import Quarter
 from fastapi_models import Endpoint
+from figure_specs import BarSpec
 from dash_helpers import (
     location_dropdown,
     qyear_dropdown,
@@ -98,18 +98,13 @@ def stops__seasonal(
     geo_level_str = geo_filter.geography.string
 
     df_geo_total_all_time = (
-        df_geo_all_time.groupby(
-            [
-                "districtoccur",
-                "psa",
-                "year",
-                "quarter",
-                "q_str",
-            ]
-        )[[a.value.sql_column for a in PoliceAction]]
+        df_geo_all_time.groupby(["year", "quarter"], observed=True)[
+            [a.value.sql_column for a in PoliceAction]
+        ]
         .sum()
         .reset_index()
     )
+    df_geo_total_all_time["q_str"] = df_geo_total_all_time["quarter"].str[-2:]
 
     df_geo_quarter_year_select = (
         df_geo_total_all_time[df_geo_total_all_time.q_str.isin(q_over_year_select)]
@@ -135,7 +130,7 @@ def stops__seasonal(
     ]
 
     q_over_year_select_str = english_comma_separated(q_over_year_select_labels)
-    fig2 = px.bar(
+    fig2 = BarSpec(
         df_geo_quarter_select,
         x="year",
         y=police_action.sql_column,
@@ -144,10 +139,10 @@ def stops__seasonal(
             police_action.sql_column: f"Number of {police_action.noun.title()}",
             "year": f"Times of Year: {q_over_year_select_str}",
         },
-    ).update_xaxes(dtick=1)
-    for trace in fig2.data:
-        trace.hovertemplate = (
+        hovertemplate=(
             q_over_year_select_str + "<br>%{x}<br>%{y:,} " + police_action.noun
-        )
+        ),
+        layout={"xaxis": {"dtick": 1}},
+    )
 
     return endpoint.output(fig_barplot=fig2)
@@ -0,0 +1,377 @@
+"""
+Renders the API responses for every input the dashboard can send, ahead of
+time. Most routes take their inputs from small closed sets (the location
+dropdown, the quarters, the DEO years and the Enum/Literal parameters), so
+their whole input space is rendered. Routes taking several multi-selects
+declare the subset to render in `ROUTE_DOMAINS`.
+
+The bodies are written to `objects/` under their sha256 and `manifest.json`
+maps every path and normalized query to one, so the directory can be pushed
+to a CDN as is, or served by the API by setting PRERENDER_DIR. It must be
+rendered again whenever the DB or the code of the endpoints change, which the
+API checks with `response_version`.
+
+    poetry run python deo_backend/prerender.py --jobs 8
+"""
+
+import asyncio
+import functools
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import types
+import typing
+from concurrent.futures import ProcessPoolExecutor
+from enum import Enum
+from typing import Any, Callable
+from urllib.parse import urlencode
+
+import click
+from fastapi import FastAPI
+
+os.environ["SERVER_TYPE"] = "fastapi"
+
+import pages.snapshot  # required before `from routers import ROUTERS` to load the routes
+import pages.stops  # required before `from routers import ROUTERS` to load the routes
+import pages.neighborhoods  # required before `from routers import ROUTERS` to load the routes
+import pages.safety  # required before `from routers import ROUTERS` to load the routes
+import pages.reasons  # required before `from routers import ROUTERS` to load the routes
+from dash_helpers import LOCATION_OPTIONS
+from demographic_constants import DEMOGRAPHICS_DISTRICT
+from env import DATA_DIR
+from models import (
+    DATA_VERSION,
+    DEO_YEARS,
+    FIRST_QUARTER,
+    FOUR_QUARTERS_AGO,
+    MOST_RECENT_QUARTER,
+    QUARTERS,
+    AgeGroup,
+    DemographicCategory,
+    GenderGroup,
+    RacialGroup,
+    warmup,
+)
+from response_cache import (
+    BUNDLE_MANIFEST,
+    bundle_object_path,
+    normalize_query,
+    response_version,
+)
+from routers import ROUTERS
+
+# Query parameters of one request
+Inputs = dict[str, Any]
+# The values taken together by a few query parameters of a route
+Domains = dict[tuple[str, ...], list[Inputs]]
+
+
+def choices(name: str, values) -> list[Inputs]:
+    return [{name: value} for value in values]
+
+
+def quarter_ranges(ranges) -> list[Inputs]:
+    return [{"start_qyear": start, "end_qyear": end} for start, end in ranges]
+
+
+def preset_quarter_ranges() -> list[Inputs]:
+    """The default windows of the routes and every full year."""
+    ranges = [
+        (FOUR_QUARTERS_AGO, MOST_RECENT_QUARTER),
+        (FIRST_QUARTER, MOST_RECENT_QUARTER),
+    ]
+    quarters = set(QUARTERS.year_quarters)
+    for year in sorted(set(QUARTERS.years)):
+        if f"{year}-Q1" in quarters and f"{year}-Q4" in quarters:
+            ranges.append((f"{year}-Q1", f"{year}-Q4"))
+    return quarter_ranges(ranges)
+
+
+@functools.cache
+def shared_domains() -> Domains:
+    quarters = QUARTERS.year_quarters
+    return {
+        ("location",): choices("location", [o["value"] for o in LOCATION_OPTIONS]),
+        ("start_qyear", "end_qyear"): quarter_ranges(
+            (start, end) for i, start in enumerate(quarters) for end in quarters[i:]
+        ),
+        ("year",): choices("year", DEO_YEARS),
+        ("demographic_category",): choices(
+            "demographic_category", [c.value for c in DemographicCategory]
+        ),
+    }
+
+
+def group_comparison_domains() -> Domains:
+    """
+    Two groups differing in a single category, e.g. Black and White people of
+    every age and gender, rather than every pair of subsets.
+    """
+    categories = {
+        "age_group": [a.value for a in AgeGroup],
+        "gender_group": [g.value for g in GenderGroup],
+        "racial_group": [r.value for r in RacialGroup],
+    }
+    groups = []
+    for varied, values in categories.items():
+        for first, second in itertools.permutations(values, 2):
+            inputs = {}
+            for name, all_values in categories.items():
+                inputs[f"{name}1"] = [first] if name == varied else all_values
+                inputs[f"{name}2"] = [second] if name == varied else all_values
+            groups.append(inputs)
+    return {
+        tuple(groups[0]): groups,
+        ("start_qyear", "end_qyear"): preset_quarter_ranges(),
+    }
+
+
+def demographic_baseline_domains() -> Domains:
+    return {
+        ("demographic_category", "demographic_baseline"): [
+            {"demographic_category": c.value, "demographic_baseline": baseline}
+            for c in DemographicCategory
+            for baseline in c.order_of_group
+        ],
+        ("start_qyear", "end_qyear"): preset_quarter_ranges(),
+    }
+
+
+def compare_districts_domains() -> Domains:
+    """The pair of districts the dashboard starts with and each district alone."""
+    return {
+        ("districts",): choices(
+            "districts",
+            [["12", "05"], *([district] for district in DEMOGRAPHICS_DISTRICT.index)],
+        ),
+        ("start_qyear", "end_qyear"): preset_quarter_ranges(),
+    }
+
+
+ROUTE_DOMAINS: dict[str, Callable[[], Domains]] = {
+    "/stops/seasonal": lambda: {
+        ("q_over_year_select",): choices(
+            "q_over_year_select",
+            [
+                list(quarters)
+                for n in range(1, 5)
+                for quarters in itertools.combinations(["Q1", "Q2", "Q3", "Q4"], n)
+            ],
+        )
+    },
+    "/stops/group-comparison": group_comparison_domains,
+    "/neighborhoods/neighborhoods-by-demographic-category": demographic_baseline_domains,
+    "/neighborhoods/neighborhoods-compare-districts": compare_districts_domains,
+}
+
+
+def field_choices(field) -> list[Inputs] | None:
+    """
+    Every value of an Enum or Literal parameter, one at a time for lists.
+    Other parameters are left to their default, or None if they have none or
+    are lists, whose values the dashboard sends.
+    """
+    annotation = field.field_info.annotation
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        # Optional parameters, e.g. `list[str] | None`
+        annotation = next(a for a in typing.get_args(annotation) if a is not type(None))
+    multiple = typing.get_origin(annotation) is list
+    if multiple:
+        annotation = typing.get_args(annotation)[0]
+    if isinstance(annotation, type) and issubclass(annotation, Enum):
+        values = [member.value for member in annotation]
+    elif typing.get_origin(annotation) is typing.Literal:
+        values = list(typing.get_args(annotation))
+    elif not field.required and not multiple:
+        return [{}]
+    else:
+        return None
+    return choices(field.alias, [[v] for v in values] if multiple else values)
+
+
+def route_inputs(route) -> list[Inputs] | None:
+    """Every request to render for `route`, or None if it can't be enumerated."""
+    fields = {field.alias: field for field in route.dependant.query_params}
+    covered = set()
+    parts = []
+    declared = ROUTE_DOMAINS.get(route.path, dict)()
+    # Declared domains come first and take precedence over shared ones
+    for names, domain in itertools.chain(declared.items(), shared_domains().items()):
+        if set(names) <= fields.keys() and not covered.intersection(names):
+            parts.append(domain)
+            covered.update(names)
+    for name, field in fields.items():
+        if name not in covered:
+            domain = field_choices(field)
+            if domain is None:
+                return None
+            parts.append(domain)
+    return [
+        {name: value for inputs in combination for name, value in inputs.items()}
+        for combination in itertools.product(*parts)
+    ]
+
+
+def query_strings(route, inputs: Inputs) -> list[str]:
+    """
+    The normalized query of `inputs`, and those of the same request with any
+    of the parameters that are at their default left out.
+    """
+    defaults = [
+        field.alias
+        for field in route.dependant.query_params
+        if not field.required and inputs.get(field.alias) == field.default
+    ]
+    queries = []
+    for n in range(len(defaults) + 1):
+        for omitted in itertools.combinations(defaults, n):
+            params = {k: v for k, v in inputs.items() if k not in omitted}
+            queries.append(normalize_query(urlencode(params, doseq=True).encode()))
+    return queries
+
+
+@functools.cache
+def router_app() -> FastAPI:
+    app = FastAPI()
+    for router in ROUTERS.values():
+        app.include_router(router)
+    return app
+
+
+async def asgi_get(app, path: str, query: str) -> tuple[int, bytes]:
+    """A GET request made directly to the ASGI `app`, without a server."""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "server": ("prerender", 80),
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query.encode(),
+        "headers": [],
+    }
+    status = None
+    chunks = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    try:
+        await app(scope, receive, send)
+    except Exception:
+        # Already answered with a 500 by the error middleware
+        status = 500
+    return status, b"".join(chunks)
+
+
+def render_chunk(requests: list[tuple[str, str]]) -> list[tuple[int, bytes]]:
+    async def render():
+        return [await asgi_get(router_app(), path, query) for path, query in requests]
+
+    return asyncio.run(render())
+
+
+def render_route(
+    route, inputs: list[Inputs], executor: ProcessPoolExecutor | None
+) -> list[tuple[int, bytes]]:
+    requests = [(route.path, query_strings(route, i)[0]) for i in inputs]
+    chunks = [requests[i : i + 32] for i in range(0, len(requests), 32)]
+    results = (
+        executor.map(render_chunk, chunks) if executor else map(render_chunk, chunks)
+    )
+    return [result for chunk in results for result in chunk]
+
+
+def write_object(output_dir: str, body: bytes) -> str:
+    digest = hashlib.sha256(body).hexdigest()
+    path = bundle_object_path(output_dir, digest)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+    return digest
+
+
+@click.command
+@click.option(
+    "--output-dir",
+    default=os.path.join(DATA_DIR, "prerendered"),
+    show_default=True,
+)
+@click.option("--jobs", default=os.cpu_count(), show_default=True)
+@click.option("--route", "paths", multiple=True, help="Only render these paths.")
+@click.option("--count-only", is_flag=True, help="Only print the number of requests.")
+def cli(output_dir, jobs, paths, count_only):
+    routes = [
+        route
+        for router in ROUTERS.values()
+        for route in router.routes
+        if not paths or route.path in paths
+    ]
+    route_domains = {}
+    for route in routes:
+        inputs = route_inputs(route)
+        if inputs is None:
+            print(f"{route.path}: skipped, declare its inputs in ROUTE_DOMAINS")
+        else:
+            print(f"{route.path}: {len(inputs)} requests")
+            route_domains[route.path] = (route, inputs)
+    if count_only:
+        return
+
+    # Loaded before forking so that the workers share the tables
+    warmup()
+    executor = None
+    if jobs > 1:
+        executor = ProcessPoolExecutor(
+            jobs, mp_context=multiprocessing.get_context("fork")
+        )
+
+    # Rendering some routes again keeps the others if the data and code are
+    # the same
+    version = response_version(DATA_VERSION)
+    manifest_path = os.path.join(output_dir, BUNDLE_MANIFEST)
+    responses = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["version"] == version:
+            responses = manifest["responses"]
+
+    for path, (route, inputs) in route_domains.items():
+        results = render_route(route, inputs, executor)
+        responses[path] = {}
+        failed = 0
+        for i, (status, body) in zip(inputs, results):
+            if status != 200:
+                failed += 1
+                continue
+            digest = write_object(output_dir, body)
+            for query in query_strings(route, i):
+                responses[path][query] = digest
+        print(f"{path}: rendered {len(inputs) - failed}, failed {failed}")
+    if executor:
+        executor.shutdown()
+
+    with open(f"{manifest_path}.tmp", "w") as f:
+        json.dump({"version": version, "responses": responses}, f)
+    os.replace(f"{manifest_path}.tmp", manifest_path)
+    print(f"Complete and saved to {output_dir}")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,284 @@
+"""
+Profiles of slow requests, kept in memory to diagnose them against the
+production data. Off unless PROFILE_THRESHOLD_MS or PROFILE_SECRET is set.
+
+- Endpoints still running after PROFILE_THRESHOLD_MS have their stack
+  sampled from then on, kept as collapsed stacks (flamegraph.pl, speedscope).
+- Requests with an `X-Debug-Profile` header signed with PROFILE_SECRET are
+  run with cProfile, skipping the response cache, kept as .pstats (snakeviz,
+  `python -m pstats`). The header signs the path and query of the request,
+  and is made with:
+
+    poetry run python deo_backend/profiling.py "/stops/num-stops?location=22-1"
+
+The last PROFILE_BUFFER_SIZE profiles are listed at /debug/profiles, which
+like /debug/timings requires PROFILE_SECRET to be set and a signed header.
+"""
+
+import cProfile
+import hashlib
+import hmac
+import itertools
+import marshal
+import os
+import sys
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Callable, NamedTuple
+
+from env import PROFILE_BUFFER_SIZE, PROFILE_SECRET, PROFILE_THRESHOLD_MS
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.encoders import jsonable_encoder
+from response_cache import normalize_query
+
+PROFILE_HEADER = "x-debug-profile"
+# Seconds a signed header stays valid
+SIGNATURE_TTL = 300
+# Seconds between two samples of a slow endpoint's stack
+SAMPLE_INTERVAL = 0.005
+
+# Seconds
+PROFILE_THRESHOLD = float(PROFILE_THRESHOLD_MS) / 1000 if PROFILE_THRESHOLD_MS else None
+
+# Whether the current request carries a valid signed header
+PROFILE_REQUEST: ContextVar[bool] = ContextVar("PROFILE_REQUEST", default=False)
+
+
+def signature(secret: str, timestamp: str, path: str, query: bytes = b"") -> str:
+    """
+    Of the path and normalized query, so that a header can't be replayed on
+    other inputs of the same route.
+    """
+    message = f"{timestamp}:{path}?{normalize_query(query)}"
+    return hmac.new(secret.encode(), message.encode(), hashlib.sha256).hexdigest()
+
+
+def sign(url: str, secret: str | None = PROFILE_SECRET) -> str:
+    """The `X-Debug-Profile` header of a request to `url`, a path and query."""
+    path, _, query = url.partition("?")
+    timestamp = str(int(time.time()))
+    return f"{timestamp}.{signature(secret, timestamp, path, query.encode())}"
+
+
+def is_signed(header: str | bytes | None, path: str, query: bytes = b"") -> bool:
+    if PROFILE_SECRET is None or not header:
+        return False
+    if isinstance(header, bytes):
+        header = header.decode("latin-1")
+    timestamp, _, digest = header.partition(".")
+    if not timestamp.isdigit() or abs(time.time() - int(timestamp)) > SIGNATURE_TTL:
+        return False
+    return hmac.compare_digest(
+        digest, signature(PROFILE_SECRET, timestamp, path, query)
+    )
+
+
+def is_profile_request(scope) -> bool:
+    """Whether an ASGI request carries a valid signed header."""
+    return is_signed(
+        dict(scope["headers"]).get(PROFILE_HEADER.encode()),
+        scope["path"],
+        scope.get("query_string", b""),
+    )
+
+
+async def set_profile_request(request: Request):
+    # Async so that it is set in the request's context, like the formats
+    PROFILE_REQUEST.set(is_profile_request(request.scope))
+
+
+class Capture(NamedTuple):
+    """A profile of an endpoint, sent back from the workers of the pool."""
+
+    trigger: str
+    duration: float
+    format: str
+    data: bytes
+
+
+def collapse(frame) -> str:
+    """The stack of `frame` as `outer;...;inner` functions."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(
+            f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+        )
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+class SlowCallSampler:
+    """
+    One thread sampling the stacks of the endpoints that have been running
+    for longer than `threshold`, idle while no endpoint runs.
+    """
+
+    def __init__(self, threshold: float, interval: float = SAMPLE_INTERVAL):
+        self.threshold = threshold
+        self.interval = interval
+        # The start and stacks of the endpoint running in each thread
+        self.running: dict[int, tuple[float, Counter]] = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread: threading.Thread | None = None
+
+    def start(self, thread_id: int) -> Counter:
+        stacks = Counter()
+        with self.lock:
+            self.running[thread_id] = (time.perf_counter(), stacks)
+            # Started again in the forked workers, which don't have it
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+        self.wake.set()
+        return stacks
+
+    def stop(self, thread_id: int):
+        with self.lock:
+            del self.running[thread_id]
+
+    def _run(self):
+        while True:
+            with self.lock:
+                running = list(self.running.items())
+                if not running:
+                    self.wake.clear()
+            if not running:
+                self.wake.wait()
+                continue
+            time.sleep(self.interval)
+            # Under the lock, so that the stacks of an endpoint don't change
+            # once stop() returns, and with the endpoints running now rather
+            # than before the sleep, which may have stopped since or been
+            # followed by another request in their thread
+            with self.lock:
+                now = time.perf_counter()
+                frames = sys._current_frames()
+                for thread_id, (start, stacks) in self.running.items():
+                    if now - start >= self.threshold and thread_id in frames:
+                        stacks[collapse(frames[thread_id])] += 1
+                del frames
+
+
+SAMPLER = SlowCallSampler(PROFILE_THRESHOLD) if PROFILE_THRESHOLD else None
+
+
+def run_profiled(func: Callable, values: dict) -> tuple[Any, Capture | None]:
+    """
+    `func(**values)` run in this thread, and its profile if the request
+    carries a signed header or if it was slower than PROFILE_THRESHOLD_MS.
+    """
+    if PROFILE_REQUEST.get():
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profile is running, which Python 3.12+ doesn't allow
+            return func(**values), None
+        start = time.perf_counter()
+        try:
+            result = func(**values)
+        finally:
+            profile.disable()
+        duration = time.perf_counter() - start
+        profile.create_stats()
+        # What Profile.dump_stats() writes
+        return result, Capture(
+            "header", duration, "pstats", marshal.dumps(profile.stats)
+        )
+    if SAMPLER is None:
+        return func(**values), None
+    thread_id = threading.get_ident()
+    stacks = SAMPLER.start(thread_id)
+    start = time.perf_counter()
+    try:
+        result = func(**values)
+    finally:
+        SAMPLER.stop(thread_id)
+    duration = time.perf_counter() - start
+    if duration < PROFILE_THRESHOLD or not stacks:
+        return result, None
+    collapsed = "".join(f"{stack} {count}\n" for stack, count in stacks.items())
+    return result, Capture("threshold", duration, "collapsed", collapsed.encode())
+
+
+class ProfileRecord(NamedTuple):
+    id: int
+    time: datetime
+    route: str
+    inputs: dict
+    capture: Capture
+
+    def summary(self) -> dict:
+        return {
+            "id": self.id,
+            "time": self.time.isoformat(timespec="seconds"),
+            "route": self.route,
+            "inputs": jsonable_encoder(self.inputs),
+            "trigger": self.capture.trigger,
+            "duration_ms": round(self.capture.duration * 1000, 1),
+            "format": self.capture.format,
+            "url": f"/debug/profiles/{self.id}",
+        }
+
+
+PROFILES: deque[ProfileRecord] = deque(maxlen=PROFILE_BUFFER_SIZE)
+_ids = itertools.count(1)
+
+
+def keep_profile(route: str, inputs: dict, capture: Capture | None):
+    if capture is not None:
+        PROFILES.append(
+            ProfileRecord(next(_ids), datetime.now(), route, inputs, capture)
+        )
+
+
+async def check_access(request: Request):
+    """Of the debug routes, hidden unless PROFILE_SECRET is set."""
+    if PROFILE_SECRET is None:
+        raise HTTPException(404, "Not Found")
+    if not is_profile_request(request.scope):
+        raise HTTPException(403, f"Requires a signed {PROFILE_HEADER} header")
+
+
+router = APIRouter(include_in_schema=False, dependencies=[Depends(check_access)])
+
+
+@router.get("/debug/profiles")
+def list_profiles():
+    return [record.summary() for record in reversed(PROFILES)]
+
+
+@router.get("/debug/profiles/{profile_id}")
+def get_profile(profile_id: int):
+    for record in PROFILES:
+        if record.id == profile_id:
+            capture = record.capture
+            if capture.format == "pstats":
+                return Response(
+                    capture.data,
+                    media_type="application/octet-stream",
+                    headers={
+                        "content-disposition": f'attachment; filename="profile-{profile_id}.pstats"'
+                    },
+                )
+            return Response(capture.data, media_type="text/plain")
+    raise HTTPException(404, "No such profile, only the last ones are kept")
+
+
+if __name__ == "__main__":
+    # Not imported by the server, which doesn't depend on click
+    import click
+
+    @click.command
+    @click.argument("url")
+    @click.option("--secret", envvar="PROFILE_SECRET", required=True)
+    def cli(url, secret):
+        """Prints the X-Debug-Profile header of a request to URL, a path and query."""
+        print(f"{PROFILE_HEADER}: {sign(url, secret)}")
+
+    cli()
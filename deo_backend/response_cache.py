@@ -0,0 +1,443 @@
+import asyncio
+import functools
+import glob
+import gzip
+import hashlib
+import json
+import os
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Callable, Collection, NamedTuple
+from urllib.parse import parse_qsl, urlencode
+
+import anyio
+from timing import span
+
+try:
+    import brotli
+except ImportError:  # Optional, responses are only gzipped without it
+    brotli = None
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    not_modified: int
+    prerendered: int
+    coalesced: int
+    entries: int
+    nbytes: int
+
+
+@dataclass
+class CachedResponse:
+    headers: list[tuple[bytes, bytes]]
+    body: bytes
+    etag: bytes
+    # The body compressed with each content-coding it was requested with
+    encoded: dict[bytes, bytes] = field(default_factory=dict)
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.body) + sum(map(len, self.encoded.values()))
+
+    def encoded_etag(self, encoding: bytes | None) -> bytes:
+        if encoding is None:
+            return self.etag
+        return self.etag[:-1] + b"-" + encoding + b'"'
+
+
+def compressor(encoding: bytes) -> tuple[Callable[[bytes], bytes], Callable[[], bytes]]:
+    """The functions compressing the chunks of a body and ending it."""
+    if encoding == b"br":
+        compressor = brotli.Compressor(quality=5)
+        return compressor.process, compressor.finish
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress, compressor.flush
+
+
+def compress(body: bytes, encoding: bytes) -> bytes:
+    if encoding == b"br":
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, 6)
+
+
+def accepted_encoding(accept_encoding: bytes | None) -> bytes | None:
+    """The content-coding to send given `Accept-Encoding`, preferring brotli."""
+    if not accept_encoding:
+        return None
+    accepted = set()
+    for coding in accept_encoding.lower().split(b","):
+        name, _, params = coding.partition(b";")
+        q = params.strip().removeprefix(b"q=")
+        try:
+            if params and float(q) == 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(name.strip())
+    if brotli is not None and b"br" in accepted:
+        return b"br"
+    if b"gzip" in accepted:
+        return b"gzip"
+    return None
+
+
+def normalize_query(query_string: bytes) -> str:
+    """
+    Sorts the parameters by name, keeping the order of repeated ones since
+    e.g. `districts=12&districts=05` sets the order of the bars.
+    """
+    params = parse_qsl(query_string.decode("latin-1"), keep_blank_values=True)
+    return urlencode(sorted(params, key=lambda kv: kv[0]))
+
+
+def etag_matches(if_none_match: bytes, etag: bytes) -> bool:
+    """
+    The weak comparison `If-None-Match` requires (RFC 9110 13.1.2), since
+    proxies compressing or rewriting responses turn their ETags into weak ones.
+    """
+    tags = [tag.strip().removeprefix(b"W/") for tag in if_none_match.split(b",")]
+    return b"*" in tags or etag in tags
+
+
+# The modules rendering the responses, relative to deo_backend/
+RESPONSE_CODE = ["pages", "figure_specs.py", "fastapi_models.py", "models.py"]
+
+
+@functools.cache
+def code_fingerprint() -> str:
+    """The sha256 of the RESPONSE_CODE files."""
+    root = os.path.dirname(os.path.abspath(__file__))
+    paths = []
+    for name in RESPONSE_CODE:
+        path = os.path.join(root, name)
+        if os.path.isdir(path):
+            paths += sorted(glob.glob(os.path.join(path, "**", "*.py"), recursive=True))
+        else:
+            paths.append(path)
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.relpath(path, root).encode() + b"\0")
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+def response_version(data_version: str) -> str:
+    """
+    What the responses depend on: the data, and the code rendering them so
+    that a bundle isn't served by a server with other endpoints.
+    """
+    return f"{data_version}:{code_fingerprint()}"
+
+
+BUNDLE_MANIFEST = "manifest.json"
+
+
+def bundle_object_path(directory: str, digest: str) -> str:
+    return os.path.join(directory, "objects", digest[:2], f"{digest}.json")
+
+
+class StaticBundle:
+    """
+    Responses rendered ahead of time by prerender.py: a manifest mapping each
+    path and normalized query to the sha256 of the body, which is stored under
+    `objects/` by that hash.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        with open(os.path.join(directory, BUNDLE_MANIFEST)) as f:
+            manifest = json.load(f)
+        self.version = manifest["version"]
+        self.responses: dict[str, dict[str, str]] = manifest["responses"]
+
+    def get(self, path: str, query: str) -> bytes | None:
+        digest = self.responses.get(path, {}).get(query)
+        if digest is None:
+            return None
+        with open(bundle_object_path(self.directory, digest), "rb") as f:
+            return f.read()
+
+
+class ResponseCacheMiddleware:
+    """
+    ASGI middleware caching the successful GET responses of `paths`.
+
+    The data only changes with a new DB, so responses are keyed by path,
+    normalized query and `version`, and kept until evicted by size. Every
+    cached response gets a strong ETag and an `If-None-Match` matching it (or
+    `*`) is answered with a 304 and no body.
+
+    Misses are looked up in the prerendered `bundle` before calling the
+    endpoint, if it was rendered for the same `version`. Streamed responses
+    (without a Content-Length) are sent on as they come when missed, so
+    without an ETag or Content-Length, and cached once complete: only the
+    later requests get them.
+
+    Bodies of `min_compress_bytes` or more are sent with brotli (if it's
+    installed) or gzip when accepted, and each compressed variant is cached
+    alongside the body with its own ETag.
+
+    Concurrent misses of the same key are coalesced: the first calls the
+    endpoint and the others wait for its response instead of computing it
+    again, unless it fails or isn't a 200.
+
+    Requests for which `bypass(scope)` is true are passed through uncached.
+    """
+
+    def __init__(
+        self,
+        app,
+        *,
+        paths: Collection[str],
+        version: str,
+        max_bytes: int = 64 * 2**20,
+        bundle: StaticBundle | None = None,
+        min_compress_bytes: int = 500,
+        bypass: Callable[[dict], bool] | None = None,
+    ):
+        if bundle is not None and bundle.version != version:
+            print(
+                f"PRERENDER: ignoring {bundle.directory}, rendered for"
+                f" {bundle.version} instead of {version}"
+            )
+            bundle = None
+        self.app = app
+        self.paths = set(paths)
+        self.version = version
+        self.max_bytes = max_bytes
+        self.bundle = bundle
+        self.min_compress_bytes = min_compress_bytes
+        self.bypass = bypass
+        self.hits = 0
+        self.misses = 0
+        self.not_modified = 0
+        self.prerendered = 0
+        self.coalesced = 0
+        self._inflight: dict[tuple, asyncio.Future] = {}
+        self._entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+        self._nbytes = 0
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] != "GET"
+            or scope["path"] not in self.paths
+            or (self.bypass is not None and self.bypass(scope))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        key = (
+            scope["path"],
+            normalize_query(scope.get("query_string", b"")),
+            self.version,
+        )
+        request_headers = dict(scope["headers"])
+        if_none_match = request_headers.get(b"if-none-match")
+        encoding = accepted_encoding(request_headers.get(b"accept-encoding"))
+        cached = self._entries.get(key)
+        if cached is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+        else:
+            self.misses += 1
+            cached = self._from_bundle(key)
+            if cached is None:
+                cached = await self._single_flight(scope, receive, send, key, encoding)
+            if cached is None:
+                return
+
+        if len(cached.body) < self.min_compress_bytes:
+            encoding = None
+        etag = cached.encoded_etag(encoding)
+        if if_none_match is not None and etag_matches(if_none_match, etag):
+            self.not_modified += 1
+            await self._send(send, 304, cached.headers, b"", etag, encoding)
+            return
+        body = cached.body
+        if encoding is not None:
+            body = cached.encoded.get(encoding)
+            if body is None:
+                with span("compress"):
+                    body = await anyio.to_thread.run_sync(
+                        compress, cached.body, encoding
+                    )
+                self._add_encoded(key, cached, encoding, body)
+        await self._send(send, 200, cached.headers, body, etag, encoding)
+
+    async def _single_flight(
+        self, scope, receive, send, key, encoding: bytes | None
+    ) -> CachedResponse | None:
+        """
+        The response of the endpoint, computed once for concurrent requests
+        of the same key, or None if it was already sent.
+        """
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            # Shielded so that a client going away doesn't cancel the others
+            cached = await asyncio.shield(inflight)
+            if cached is not None:
+                return cached
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        cached = None
+        sent = False
+        try:
+            cached, sent = await self._call_app(scope, receive, send, key, encoding)
+        finally:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+            future.set_result(cached)
+        return None if sent else cached
+
+    async def _call_app(
+        self, scope, receive, send, key, encoding: bytes | None
+    ) -> tuple[CachedResponse | None, bool]:
+        """
+        Runs the endpoint and buffers its response, returning it and whether
+        it was already sent. Anything but a complete 200 response is passed
+        through uncached, and streamed responses are sent as they come. A
+        stream that raises or stops before its last chunk (the app returns
+        early when the client disconnects) isn't complete.
+        """
+        start = None
+        chunks = []
+        passthrough = False
+        streamed = None
+        complete = False
+
+        async def buffering_send(message):
+            nonlocal start, passthrough, streamed, complete
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start = message
+                if message["status"] != 200:
+                    passthrough = True
+                    await send(message)
+                elif b"content-length" not in dict(message.get("headers", [])):
+                    streamed = []
+                    headers = self._headers(message.get("headers", []), encoding)
+                    await send({**message, "headers": headers})
+            elif message["type"] == "http.response.body":
+                body = message.get("body", b"")
+                chunks.append(body)
+                more_body = message.get("more_body", False)
+                complete = not more_body
+                if streamed is None:
+                    return
+                if encoding is not None:
+                    body = compress_chunk(body)
+                    if not more_body:
+                        body += finish()
+                    streamed.append(body)
+                await send(
+                    {"type": "http.response.body", "body": body, "more_body": more_body}
+                )
+
+        if encoding is not None:
+            compress_chunk, finish = compressor(encoding)
+        await self.app(scope, receive, buffering_send)
+        if passthrough or start is None or not complete:
+            return None, True
+
+        headers = [
+            (name, value)
+            for name, value in start.get("headers", [])
+            if name.lower() not in (b"content-length", b"etag")
+        ]
+        cached = self._cache(key, headers, b"".join(chunks))
+        if streamed is None:
+            return cached, False
+        if encoding is not None:
+            self._add_encoded(key, cached, encoding, b"".join(streamed))
+        return cached, True
+
+    def _from_bundle(self, key) -> CachedResponse | None:
+        if self.bundle is None:
+            return None
+        path, query, _ = key
+        body = self.bundle.get(path, query)
+        if body is None:
+            return None
+        self.prerendered += 1
+        return self._cache(key, [(b"content-type", b"application/json")], body)
+
+    def _cache(self, key, headers, body: bytes) -> CachedResponse:
+        digest = hashlib.sha256(self.version.encode() + body).hexdigest()[:32]
+        etag = f'"{digest}"'.encode()
+        cached = CachedResponse(headers=headers, body=body, etag=etag)
+        self._store(key, cached)
+        return cached
+
+    def _store(self, key, cached: CachedResponse):
+        size = cached.nbytes
+        if size > self.max_bytes:
+            return
+        if key in self._entries:
+            # Two requests for the same key were computed concurrently
+            self._nbytes -= self._entries[key].nbytes
+        self._entries[key] = cached
+        self._nbytes += size
+        self._evict()
+
+    def _add_encoded(self, key, cached: CachedResponse, encoding, body: bytes):
+        if encoding in cached.encoded:
+            return
+        cached.encoded[encoding] = body
+        if self._entries.get(key) is cached:
+            self._nbytes += len(body)
+            self._evict()
+
+    def _evict(self):
+        while self._nbytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._nbytes -= evicted.nbytes
+
+    @staticmethod
+    def _headers(headers, encoding: bytes | None, etag: bytes | None = None):
+        headers = list(headers) + [(b"vary", b"Accept-Encoding")]
+        if b"cache-control" not in dict(headers):
+            # Clients revalidate every time, which is a 304 while the DB is the same
+            headers.append((b"cache-control", b"no-cache"))
+        if etag is not None:
+            headers.append((b"etag", etag))
+        if encoding is not None:
+            headers.append((b"content-encoding", encoding))
+        return headers
+
+    @classmethod
+    async def _send(cls, send, status, headers, body, etag, encoding):
+        headers = cls._headers(headers, encoding, etag)
+        if status == 304:
+            headers = [
+                (k, v)
+                for k, v in headers
+                if k.lower() not in (b"content-type", b"content-encoding")
+            ]
+        else:
+            headers.append((b"content-length", str(len(body)).encode()))
+        await send(
+            {"type": "http.response.start", "status": status, "headers": headers}
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    def info(self) -> CacheInfo:
+        return CacheInfo(
+            self.hits,
+            self.misses,
+            self.not_modified,
+            self.prerendered,
+            self.coalesced,
+            len(self._entries),
+            self._nbytes,
+        )
+
+    def clear(self):
+        self._entries.clear()
+        self._nbytes = 0
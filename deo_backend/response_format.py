@@ -0,0 +1,128 @@
+from contextvars import ContextVar
+from enum import Enum
+from typing import Annotated
+
+from fastapi import Query
+
+
+class ResponseFormat(str, Enum):
+    records = "records"
+    columnar = "columnar"
+
+
+RESPONSE_FORMAT: ContextVar[ResponseFormat] = ContextVar(
+    "RESPONSE_FORMAT", default=ResponseFormat.records
+)
+
+
+async def set_response_format(
+    response_format: Annotated[
+        ResponseFormat,
+        Query(
+            alias="format",
+            description="`columnar` returns the figure data and table rows as one array per field",
+        ),
+    ] = ResponseFormat.records,
+):
+    # Async so that it is set in the request's context, which the endpoint
+    # threads copy
+    RESPONSE_FORMAT.set(response_format)
+
+
+class GeometryFormat(str, Enum):
+    inline = "inline"
+    reference = "reference"
+
+
+class GeometryDetail(str, Enum):
+    """The simplified variants written by update_db/simplify_maps.py"""
+
+    full = "full"
+    medium = "medium"
+    low = "low"
+
+
+GEOMETRY_FORMAT: ContextVar[GeometryFormat] = ContextVar(
+    "GEOMETRY_FORMAT", default=GeometryFormat.inline
+)
+GEOMETRY_DETAIL: ContextVar[GeometryDetail] = ContextVar(
+    "GEOMETRY_DETAIL", default=GeometryDetail.full
+)
+
+
+async def set_geometry_format(
+    geometry_format: Annotated[
+        GeometryFormat,
+        Query(
+            alias="geometry",
+            description="`reference` returns the URL of the static geometries of the maps, from `/geometry`, instead of their features",
+        ),
+    ] = GeometryFormat.inline,
+    detail: Annotated[
+        GeometryDetail,
+        Query(
+            description="`medium` and `low` simplify the geometries, `low` is enough for the whole city"
+        ),
+    ] = GeometryDetail.full,
+):
+    GEOMETRY_FORMAT.set(geometry_format)
+    GEOMETRY_DETAIL.set(detail)
+
+
+def dictionary_encode(values: list) -> tuple[list[str], list] | None:
+    """
+    The distinct strings of `values` and the index of each value among them,
+    for a column of strings or of lists of strings (e.g. hover text lines)
+    repeating some of them. None values are kept as is.
+    """
+    present = [value for value in values if value is not None]
+    lookup: dict[str, int] = {}
+    if present and all(isinstance(value, str) for value in present):
+        indices = [
+            None if value is None else lookup.setdefault(value, len(lookup))
+            for value in values
+        ]
+        count = len(present)
+    elif present and all(
+        isinstance(value, list) and all(isinstance(s, str) for s in value)
+        for value in present
+    ):
+        indices = [
+            (
+                None
+                if value is None
+                else [lookup.setdefault(s, len(lookup)) for s in value]
+            )
+            for value in values
+        ]
+        count = sum(len(value) for value in present)
+    else:
+        return None
+    if len(lookup) == count:
+        return None
+    return list(lookup), indices
+
+
+def columnar(records: list[dict]) -> dict:
+    """
+    `records` as one array per field, in the order of `schema`. Fields of
+    repeated strings hold indices into the `dictionary` of their schema entry.
+
+        {
+            "length": 2,
+            "schema": [{"name": "group", "dictionary": ["Black"]}, {"name": "Stops"}],
+            "columns": [[0, 0], [120, 80]],
+        }
+    """
+    names = list(dict.fromkeys(name for record in records for name in record))
+    schema = []
+    columns = []
+    for name in names:
+        values = [record.get(name) for record in records]
+        field = {"name": name}
+        encoded = dictionary_encode(values)
+        if encoded is not None:
+            field["dictionary"], values = encoded
+        schema.append(field)
+        columns.append(values)
+    return {"length": len(records), "schema": schema, "columns": columns}
@@ -1,9 +1,19 @@
-from fastapi import APIRouter
+from execution import ExecutionRoute
+from fastapi import APIRouter, Depends
+from profiling import set_profile_request
+from response_format import set_response_format
+
+# Every route takes the `format` query parameter, may be profiled and runs
+# its endpoint with the execution backend
+options = {
+    "dependencies": [Depends(set_response_format), Depends(set_profile_request)],
+    "route_class": ExecutionRoute,
+}
 
 ROUTERS = {
-    "stops": APIRouter(tags=["Stops"]),
-    "snapshot": APIRouter(tags=["Snapshot"]),
-    "neighborhoods": APIRouter(tags=["Neighborhoods"]),
-    "safety": APIRouter(tags=["Safety"]),
-    "reasons": APIRouter(tags=["Reasons"]),
+    "stops": APIRouter(tags=["Stops"], **options),
+    "snapshot": APIRouter(tags=["Snapshot"], **options),
+    "neighborhoods": APIRouter(tags=["Neighborhoods"], **options),
+    "safety": APIRouter(tags=["Safety"], **options),
+    "reasons": APIRouter(tags=["Reasons"], **options),
 }
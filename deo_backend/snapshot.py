@@ -0,0 +1,129 @@
+"""
+Columnar copies of the SQLite tables in Feather (Arrow IPC) format, keyed by
+the DB file's sha256. Loading them memory-mapped replaces `pd.read_sql`, which
+builds every value as a Python object, on each worker start.
+
+Needs pyarrow, the optional `snapshots` extra. Without it, or when the
+snapshot can't be written or read, loaders get None back and read from SQLite
+as before.
+"""
+
+import functools
+import hashlib
+import os
+import shutil
+import sqlite3
+from typing import Collection
+
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.feather as feather
+except ImportError:
+    pyarrow = feather = None
+
+SNAPSHOT_TABLES = [
+    "car_ped_stops_quarterly",
+    "car_ped_stops_quarterly_reason",
+    "car_ped_stops_hin_pct",
+    "shootings",
+    "car_ped_stops_hin_random_sample",
+]
+
+
+@functools.cache
+def db_hash(sqlite_file: str) -> str:
+    digest = hashlib.sha256()
+    with open(sqlite_file, "rb") as f:
+        for chunk in iter(lambda: f.read(2**20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def snapshot_dir(sqlite_file: str) -> str:
+    name = os.path.splitext(os.path.basename(sqlite_file))[0]
+    return os.path.join(
+        os.path.dirname(sqlite_file),
+        "snapshots",
+        f"{name}-{db_hash(sqlite_file)[:16]}",
+    )
+
+
+def write_snapshot(sqlite_file: str, tables: list[str] = SNAPSHOT_TABLES):
+    """
+    Writes every table to `snapshot_dir` and removes the snapshots of older
+    versions of the same DB. Text columns are dictionary-encoded.
+    """
+    if feather is None:
+        raise ImportError("Writing snapshots needs pyarrow")
+    directory = snapshot_dir(sqlite_file)
+    os.makedirs(directory, exist_ok=True)
+    con = sqlite3.connect(sqlite_file)
+    for table in tables:
+        df = pd.read_sql(f'select * from "{table}"', con)
+        for col in df.columns[df.dtypes == object]:
+            df[col] = df[col].astype("category")
+        # Written under a temporary name so that concurrent workers never
+        # read a partial file. Uncompressed so that it can be memory-mapped.
+        path = os.path.join(directory, f"{table}.feather")
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        feather.write_feather(df, tmp_path, compression="uncompressed")
+        os.replace(tmp_path, path)
+
+    parent, current = os.path.split(directory)
+    name = current.rsplit("-", 1)[0]
+    for other in os.listdir(parent):
+        if other != current and other.rsplit("-", 1)[0] == name:
+            shutil.rmtree(os.path.join(parent, other), ignore_errors=True)
+
+
+def read_table(
+    sqlite_file: str,
+    table: str,
+    /,
+    *,
+    categorical: Collection[str] = (),
+    drop: Collection[str] = (),
+) -> pd.DataFrame | None:
+    """
+    `table` from the snapshot of `sqlite_file`, writing the snapshot first if
+    there is none yet. Text columns in `categorical` stay Categoricals, the
+    others are turned back into objects like `pd.read_sql` returns them.
+    """
+    if feather is None:
+        return None
+    path = os.path.join(snapshot_dir(sqlite_file), f"{table}.feather")
+    if not os.path.exists(path) and not _write(sqlite_file, path):
+        return None
+    try:
+        df = _load(path, drop)
+    except (OSError, pyarrow.ArrowException) as e:
+        # Truncated or written by an incompatible pyarrow
+        print(f"SNAPSHOT: can't read {path}, writing it again: {e}")
+        if not _write(sqlite_file, path):
+            return None
+        try:
+            df = _load(path, drop)
+        except (OSError, pyarrow.ArrowException) as e:
+            print(f"SNAPSHOT: can't read {path}: {e}")
+            return None
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype) and col not in categorical:
+            df[col] = df[col].astype(object).where(df[col].notna(), None)
+    return df
+
+
+def _write(sqlite_file: str, path: str) -> bool:
+    try:
+        write_snapshot(sqlite_file)
+    except (OSError, pyarrow.ArrowException) as e:
+        print(f"SNAPSHOT: can't write {path}: {e}")
+        return False
+    return True
+
+
+def _load(path: str, drop: Collection[str]) -> pd.DataFrame:
+    arrow_table = feather.read_table(path, memory_map=True)
+    columns = [col for col in arrow_table.column_names if col not in drop]
+    return arrow_table.select(columns).to_pandas()
@@ -0,0 +1,104 @@
+import sqlite3
+import threading
+
+import pandas as pd
+
+# Indexes the pushdown queries rely on, created on every table FilteredDf
+# reads. Geography filters use the first, city-wide time windows the second.
+INDEXES = {
+    "geography_quarter": ["districtoccur", "psa", "quarter"],
+    "quarter": ["quarter"],
+}
+INDEXED_TABLES = [
+    "car_ped_stops_quarterly",
+    "car_ped_stops_quarterly_reason",
+    "car_ped_stops_hin_pct",
+]
+
+
+def quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def create_indexes(con: sqlite3.Connection):
+    for table in INDEXED_TABLES:
+        for name, columns in INDEXES.items():
+            con.execute(
+                f"CREATE INDEX IF NOT EXISTS {quote(f'ix_{table}_{name}')}"
+                f" ON {quote(table)} ({', '.join(map(quote, columns))})"
+            )
+    con.commit()
+
+
+def where_clause(
+    where: dict[str, str | list[str] | tuple[str, str] | None],
+) -> tuple[str, list]:
+    """
+    Same filter format as StopCube.select: a string or list of values to
+    match, or an inclusive (first, last) range.
+    """
+    clauses = []
+    params = []
+    for column, selection in where.items():
+        if selection is None:
+            continue
+        if isinstance(selection, tuple):
+            clauses.append(f"{quote(column)} BETWEEN ? AND ?")
+            params += list(selection)
+            continue
+        if isinstance(selection, str):
+            selection = [selection]
+        clauses.append(f"{quote(column)} IN ({', '.join('?' * len(selection))})")
+        params += list(selection)
+    return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+
+class SqlPushdown:
+    """
+    Runs FilteredDf filters and aggregations as parameterized queries against
+    the SQLite DB instead of on tables loaded in memory.
+    """
+
+    def __init__(self, sqlite_file: str):
+        self.sqlite_file = sqlite_file
+        self._local = threading.local()
+
+    @property
+    def con(self) -> sqlite3.Connection:
+        # One read-only connection per thread of the FastAPI threadpool
+        con = getattr(self._local, "con", None)
+        if con is None:
+            con = sqlite3.connect(f"file:{self.sqlite_file}?mode=ro", uri=True)
+            self._local.con = con
+        return con
+
+    def rows(self, table: str, /, *, where) -> pd.DataFrame:
+        sql, params = where_clause(where)
+        # In the order of the table, like the rows loaded in memory, rather
+        # than of the index used, so that ties sort the same on both backends
+        query = f"SELECT * FROM {quote(table)}{sql} ORDER BY rowid"
+        return pd.read_sql(query, self.con, params=params)
+
+    def count(self, table: str, /, *, where) -> int:
+        sql, params = where_clause(where)
+        query = f"SELECT COUNT(*) FROM {quote(table)}{sql}"
+        return self.con.execute(query, params).fetchone()[0]
+
+    def aggregate(
+        self, table: str, columns: list[str], /, *, by: list[str] = (), where
+    ) -> pd.DataFrame:
+        """
+        `SUM` of `columns` grouped by `by`. Rows with a NULL group key are
+        left out, like pandas groupby does.
+        """
+        sql, params = where_clause(where)
+        for column in by:
+            sql += (" AND " if sql else " WHERE ") + f"{quote(column)} IS NOT NULL"
+        select = [quote(c) for c in by] + [
+            f"COALESCE(SUM({quote(c)}), 0) AS {quote(c)}" for c in columns
+        ]
+        query = f"SELECT {', '.join(select)} FROM {quote(table)}{sql}"
+        if by:
+            group_by = ", ".join(map(quote, by))
+            query += f" GROUP BY {group_by}"
+        return pd.read_sql(query, self.con, params=params)
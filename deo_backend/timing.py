@@ -0,0 +1,119 @@
+"""
+Durations of the stages of a request (filtering, aggregating, building the
+figures, Endpoint.json...), sent in its `Server-Timing` header and summed by
+route for /debug/timings. Stages are timed with `span()`, which does nothing
+outside of a request, e.g. under Dash.
+
+    with span("filter"):
+        df = ...
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Sequence
+
+from metrics import route_path
+from starlette.routing import BaseRoute
+
+# Seconds spent in each stage of the current request, set by TimingMiddleware
+STAGES: ContextVar[dict[str, float] | None] = ContextVar("STAGES", default=None)
+
+
+@contextmanager
+def span(name: str):
+    """
+    Adds the time spent in the block to the stage `name`. Stages may nest
+    and repeat, so they don't add up to the total.
+    """
+    stages = STAGES.get()
+    if stages is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stages[name] = stages.get(name, 0.0) + time.perf_counter() - start
+
+
+def add_stages(stages: dict[str, float]):
+    """Adds the stages timed elsewhere, e.g. in a worker process."""
+    current = STAGES.get()
+    if current is not None:
+        for name, seconds in stages.items():
+            current[name] = current.get(name, 0.0) + seconds
+
+
+def server_timing(stages: dict[str, float]) -> bytes:
+    return ", ".join(
+        f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages.items()
+    ).encode()
+
+
+class StageTimes:
+    """The number of requests and total seconds of each stage, by route."""
+
+    def __init__(self):
+        self.routes: dict[str, dict[str, list]] = {}
+
+    def add(self, route: str, stages: dict[str, float]):
+        route_stages = self.routes.setdefault(route, {})
+        for name, seconds in stages.items():
+            count_total = route_stages.setdefault(name, [0, 0.0])
+            count_total[0] += 1
+            count_total[1] += seconds
+
+    def summary(self) -> dict:
+        return {
+            route: {
+                name: {
+                    "count": count,
+                    "total_ms": round(total * 1000, 1),
+                    "mean_ms": round(total * 1000 / count, 2),
+                }
+                for name, (count, total) in sorted(
+                    stages.items(), key=lambda item: -item[1][1]
+                )
+            }
+            for route, stages in sorted(self.routes.items())
+        }
+
+
+class TimingMiddleware:
+    """
+    ASGI middleware timing the stages of each HTTP request, added outside of
+    the response cache so that cached responses don't keep the header of
+    the request that computed them.
+    """
+
+    def __init__(self, app, *, stage_times: StageTimes, routes: Sequence[BaseRoute]):
+        self.app = app
+        self.stage_times = stage_times
+        self.routes = routes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stages = {}
+        token = STAGES.set(stages)
+        start = time.perf_counter()
+
+        async def timing_send(message):
+            if message["type"] == "http.response.start":
+                # Stages after this, like streaming the body, are only summed
+                timings = {**stages, "total": time.perf_counter() - start}
+                message["headers"] = [
+                    *message.get("headers", []),
+                    (b"server-timing", server_timing(timings)),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, timing_send)
+        finally:
+            STAGES.reset(token)
+            stages["total"] = time.perf_counter() - start
+            self.stage_times.add(route_path(self.routes, scope), stages)
@@ -0,0 +1,68 @@
+"""
+Writes the simplified variants of the maps/ GeoJSONs, served with `detail=`,
+next to the originals as `<name>.<detail>.geojson`. Polygons sharing edges
+(districts, PSAs) are simplified as a coverage so that neighbors still meet,
+and the coordinates are snapped to the precision of each level.
+
+    poetry run python deo_backend/update_db/simplify_maps.py
+"""
+
+import json
+import os
+
+import click
+import numpy as np
+import shapely
+from shapely.geometry import mapping, shape
+
+MAPS_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "maps")
+MAPS = ["police_districts", "police_psas", "hin_2020", "hin_2025"]
+
+# Simplification tolerance and decimals kept, in degrees (0.0001 is ~10m)
+DETAIL_LEVELS = {
+    "medium": (0.0001, 5),
+    "low": (0.0005, 4),
+}
+
+
+def simplify(geometries: np.ndarray, tolerance: float, decimals: int) -> np.ndarray:
+    if all(g.geom_type in ("Polygon", "MultiPolygon") for g in geometries):
+        if not shapely.coverage_is_valid(geometries):
+            print("  WARNING: the polygons overlap or have gaps, edges may not match")
+        simplified = shapely.coverage_simplify(geometries, tolerance)
+    else:
+        simplified = shapely.simplify(geometries, tolerance, preserve_topology=True)
+    simplified = shapely.set_precision(simplified, 10**-decimals)
+    # Rounded again so that the coordinates are written with `decimals` at most
+    return shapely.transform(simplified, lambda coords: np.round(coords, decimals))
+
+
+@click.command
+@click.option("--maps-dir", default=MAPS_DIR, show_default=True)
+def cli(maps_dir):
+    for name in MAPS:
+        with open(os.path.join(maps_dir, f"{name}.geojson")) as f:
+            geojson = json.load(f)
+        features = geojson["features"]
+        geometries = np.array([shape(f["geometry"]) for f in features], dtype=object)
+        n_coordinates = shapely.get_num_coordinates(geometries).sum()
+        for detail, (tolerance, decimals) in DETAIL_LEVELS.items():
+            simplified = simplify(geometries, tolerance, decimals)
+            variant = {
+                **geojson,
+                "features": [
+                    {**feature, "geometry": mapping(geometry)}
+                    for feature, geometry in zip(features, simplified)
+                ],
+            }
+            path = os.path.join(maps_dir, f"{name}.{detail}.geojson")
+            with open(path, "w") as f:
+                json.dump(variant, f, separators=(",", ":"))
+            print(
+                f"{path}: {shapely.get_num_coordinates(simplified).sum()} of"
+                f" {n_coordinates} coordinates, {os.path.getsize(path):,} bytes"
+            )
+
+
+if __name__ == "__main__":
+    cli()
@@ -6,6 +6,8 @@ import sqlite3
 import os
 
 from deo_backend.env import ZIP_FILENAME, DATA_DIR
+from deo_backend import snapshot
+from deo_backend.sql_pushdown import create_indexes
 
 from models import ProcessZip
 
@@ -95,6 +97,12 @@ def make_db(df_tables, sqlite_file, most_recent_quarter):
     pd.DataFrame([{"most_recent_quarter": most_recent_quarter}]).to_sql(
         "settings", con=sqlite3.connect(sqlite_file), index=False, if_exists="replace"
     )
+    create_indexes(sqlite3.connect(sqlite_file))
+    if snapshot.feather is None:
+        # Loaders read from SQLite without it
+        print("Snapshot skipped, it needs pyarrow: poetry install -E snapshots")
+    else:
+        snapshot.write_snapshot(sqlite_file)
     print(f"Complete and saved to {sqlite_file}")
 
 
@@ -0,0 +1,25 @@
+"""
+The tests run against a synthetic DB written to a temporary directory. It is
+written when this file is imported, before the test modules import the app,
+since env.py reads DB_FILENAME on import.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+from synthetic_db import write_synthetic_db
+
+DB_DIR = tempfile.mkdtemp(prefix="deo-tests-")
+atexit.register(shutil.rmtree, DB_DIR, ignore_errors=True)
+DB_PATH = os.path.join(DB_DIR, "synthetic.db")
+write_synthetic_db(DB_PATH)
+
+# SQLITE_FILE joins DB_FILENAME to the data directory, which keeps it absolute
+os.environ["DB_FILENAME"] = DB_PATH
+os.environ["SERVER_TYPE"] = "fastapi"
+os.environ["FILTERED_DF_BACKEND"] = "memory"
+os.environ["EXECUTION_BACKEND"] = "threads"
+for name in ["PRERENDER_DIR", "PROFILE_SECRET", "PROFILE_THRESHOLD_MS"]:
+    os.environ.pop(name, None)
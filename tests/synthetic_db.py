@@ -0,0 +1,136 @@
+"""
+A small DB with the tables and columns of the real one, filled with random
+counts for every PSA, so that the tests don't need the Open Data Philly
+download.
+"""
+
+import itertools
+import os
+import sqlite3
+
+import numpy as np
+import pandas as pd
+
+DEMOGRAPHICS_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "..",
+    "deo_backend",
+    "data",
+    "demographics",
+)
+
+RACES = ["Asian", "Black", "Latino", "White", "All Other Races"]
+GENDERS = ["Male", "Female"]
+AGE_RANGES = ["Under 25", "25-34", "35-44", "45-54", "55-64", "65+"]
+VIOLATION_CATEGORIES = [
+    "Display License Plate",
+    "Lights",
+    "Registration",
+    "Speeding/Reckless/Careless Driving",
+    "Red Light/Stop Sign/Yield",
+    "Other",
+    "None",
+]
+MOST_RECENT_QUARTER = "2025-Q4"
+
+
+def with_quarter_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """The quarter columns of update_db.py, from the quarter start dates."""
+    df = df.copy()
+    df["quarter_dt_str"] = df["quarter"]
+    df["quarter_dt"] = pd.to_datetime(df["quarter"])
+    df["quarter"] = (
+        df["quarter_dt"].dt.year.astype(str)
+        + "-Q"
+        + df["quarter_dt"].dt.quarter.astype(str)
+    )
+    df["quarter_date"] = df["quarter_dt"].dt.date
+    df["q_str"] = "Q" + df["quarter_dt"].dt.quarter.astype(str)
+    df["year"] = df["quarter_dt"].dt.year
+    return df
+
+
+def write_synthetic_db(path: str, *, seed: int = 0, first_year: int = 2014):
+    rng = np.random.default_rng(seed)
+    geographies = pd.read_csv(
+        os.path.join(DEMOGRAPHICS_DIR, "police_geographies.csv"), dtype=str
+    )
+    # A district missing from the demographics, as in the real data
+    psas = list(geographies[["district", "psa"]].itertuples(index=False)) + [
+        ("77", "1")
+    ]
+    quarters = pd.date_range(
+        f"{first_year}-01-01", MOST_RECENT_QUARTER, freq="QS-JAN"
+    ).strftime("%Y-%m-%dT00:00:00.000000Z")
+    keys = [
+        (district, psa, quarter, race, gender, age_range, category)
+        for (district, psa), quarter, race, gender, age_range, category in (
+            itertools.product(
+                psas, quarters, RACES, GENDERS, AGE_RANGES, VIOLATION_CATEGORIES
+            )
+        )
+    ]
+    keys = [key for key, kept in zip(keys, rng.random(len(keys)) < 0.15) if kept]
+    df = pd.DataFrame(
+        keys,
+        columns=[
+            "districtoccur",
+            "psa",
+            "quarter",
+            "Race",
+            "Gender",
+            "Age Range",
+            "violation_category",
+        ],
+    )
+    n = len(df)
+    df["n_stopped"] = rng.integers(1, 60, n)
+    df["n_people_in_stopped_vehicles"] = df["n_stopped"] + rng.integers(0, 20, n)
+    df["n_searched"] = rng.integers(0, 5, n)
+    df["n_arrested"] = rng.integers(0, 3, n)
+    df["n_frisked"] = rng.integers(0, 5, n)
+    df["n_intruded"] = df["n_searched"] + df["n_frisked"]
+    df["n_contraband"] = rng.integers(0, 2, n)
+
+    quarterly = (
+        df.drop(columns=["violation_category"])
+        .groupby(["districtoccur", "psa", "quarter", "Race", "Gender", "Age Range"])
+        .sum()
+        .reset_index()
+    )
+    by_hin = (
+        df.groupby(["districtoccur", "psa", "quarter"])["n_stopped"]
+        .sum()
+        .reset_index(name="n_stopped_locatable")
+    )
+    by_hin["n_stopped_locatable_on_hin"] = (by_hin["n_stopped_locatable"] * 0.3).astype(
+        int
+    )
+    shootings = (
+        df.groupby(["districtoccur", "quarter"])["n_arrested"]
+        .sum()
+        .reset_index(name="n_shootings")
+    )
+    shootings["n_outside"] = shootings["n_shootings"] // 2
+    sample = pd.DataFrame(
+        {
+            "lat": 39.95 + rng.normal(0, 0.03, 200),
+            "lng": -75.16 + rng.normal(0, 0.03, 200),
+            "on_hin": rng.random(200) < 0.4,
+            "stops_objectid": np.arange(200),
+            "location": "somewhere",
+            "stname": "Main St",
+            "year": int(MOST_RECENT_QUARTER[:4]),
+        }
+    )
+
+    con = sqlite3.connect(path)
+    with_quarter_columns(quarterly).to_sql("car_ped_stops_quarterly", con, index=False)
+    with_quarter_columns(df).to_sql("car_ped_stops_quarterly_reason", con, index=False)
+    with_quarter_columns(by_hin).to_sql("car_ped_stops_hin_pct", con, index=False)
+    with_quarter_columns(shootings).to_sql("shootings", con, index=False)
+    sample.to_sql("car_ped_stops_hin_random_sample", con, index=False)
+    pd.DataFrame([{"most_recent_quarter": MOST_RECENT_QUARTER}]).to_sql(
+        "settings", con, index=False
+    )
+    con.close()
@@ -0,0 +1,158 @@
+"""
+FilteredDf served from the stop cube, from SQLite (FILTERED_DF_BACKEND=sql)
+and by grouping its frame, each against pandas on the table read as is.
+"""
+
+import functools
+import sqlite3
+
+import models
+import pandas as pd
+import pytest
+from models import (
+    DIVISION_TO_DISTRICTS_MAPPING,
+    DemographicCategory,
+    DfType,
+    FilteredDf,
+)
+from sql_pushdown import SqlPushdown
+
+COLUMNS = ["n_stopped", "n_frisked"]
+LOCATIONS = ["*", "NWPD", "22*", "22-1", "77"]
+QUARTER_RANGES = [(None, None), ("2024-Q2", "2025-Q1"), ("2025-Q4", "2025-Q4")]
+BYS = [
+    [],
+    ["quarter"],
+    ["year"],
+    ["Race"],
+    ["Race", "Gender", "Age Range"],
+    ["districtoccur", "psa"],
+]
+
+
+@functools.cache
+def raw_table(table: str) -> pd.DataFrame:
+    with sqlite3.connect(models.SQLITE_FILE) as con:
+        return pd.read_sql(f"select * from {table}", con)
+
+
+def reference(table: str, location: str, start: str | None, end: str | None):
+    """The rows of `table` in `location` and the quarters from start to end."""
+    df = raw_table(table)
+    if location in DIVISION_TO_DISTRICTS_MAPPING:
+        df = df[df["districtoccur"].isin(DIVISION_TO_DISTRICTS_MAPPING[location])]
+    elif location != "*":
+        district, _, psa = location.rstrip("*").partition("-")
+        df = df[df["districtoccur"] == district]
+        if psa:
+            df = df[df["psa"] == psa]
+    if start is not None:
+        df = df[(df["quarter"] >= start) & (df["quarter"] <= end)]
+    return df
+
+
+def reference_sum(df: pd.DataFrame, by: list[str]):
+    return df.groupby(by)[COLUMNS].sum() if by else df[COLUMNS].sum()
+
+
+def normalized(result, by: list[str]) -> pd.DataFrame:
+    """Either result as a frame of the `by` labels and int64 sums, sorted."""
+    if not by:
+        return pd.DataFrame(
+            [result[COLUMNS].astype("int64").to_numpy()], columns=COLUMNS
+        )
+    df = result.reset_index()[by + COLUMNS]
+    for col in by:
+        df[col] = df[col].astype(str)
+    return df.astype({col: "int64" for col in COLUMNS}).sort_values(
+        by, ignore_index=True
+    )
+
+
+@pytest.fixture
+def sql_backend(monkeypatch):
+    monkeypatch.setattr(models, "SQL_PUSHDOWN", SqlPushdown(models.SQLITE_FILE))
+    models.FILTERED_DF_CACHE.clear()
+    yield
+    models.FILTERED_DF_CACHE.clear()
+
+
+cases = pytest.mark.parametrize(
+    "location, quarters, by",
+    [
+        (location, quarters, by)
+        for location in LOCATIONS
+        for quarters in QUARTER_RANGES
+        for by in BYS
+    ],
+)
+
+
+@cases
+def test_cube_matches_pandas(location, quarters, by):
+    filtered = FilteredDf(
+        location=location, start_date=quarters[0], end_date=quarters[1]
+    )
+    assert filtered.uses_cube
+    expected = reference_sum(
+        reference("car_ped_stops_quarterly", location, *quarters), by
+    )
+    pd.testing.assert_frame_equal(
+        normalized(filtered.aggregate(COLUMNS, by=by), by), normalized(expected, by)
+    )
+
+
+@cases
+def test_sql_matches_pandas(sql_backend, location, quarters, by):
+    filtered = FilteredDf(
+        location=location, start_date=quarters[0], end_date=quarters[1]
+    )
+    assert not filtered.uses_cube
+    expected = reference_sum(
+        reference("car_ped_stops_quarterly", location, *quarters), by
+    )
+    pd.testing.assert_frame_equal(
+        normalized(filtered.aggregate(COLUMNS, by=by), by), normalized(expected, by)
+    )
+
+
+@pytest.mark.parametrize(
+    "by", [[], ["violation_category"], ["Race", "violation_category"], ["year"]]
+)
+@pytest.mark.parametrize("location", LOCATIONS)
+def test_groupby_matches_pandas(location, by):
+    """stops_by_reason isn't in the cube, so its frame is grouped."""
+    filtered = FilteredDf(
+        location=location,
+        start_date="2024-Q2",
+        end_date="2025-Q1",
+        df_type=DfType.stops_by_reason,
+    )
+    expected = reference_sum(
+        reference("car_ped_stops_quarterly_reason", location, "2024-Q2", "2025-Q1"),
+        by,
+    )
+    pd.testing.assert_frame_equal(
+        normalized(filtered.aggregate(COLUMNS, by=by), by), normalized(expected, by)
+    )
+
+
+@pytest.mark.parametrize("quarters", QUARTER_RANGES)
+@pytest.mark.parametrize("location", LOCATIONS)
+def test_sql_rows_match_memory(location, quarters, request):
+    """Same rows in the same order, so that ties sort the same on both."""
+    memory = FilteredDf(
+        location=location, start_date=quarters[0], end_date=quarters[1]
+    ).df.reset_index(drop=True)
+    request.getfixturevalue("sql_backend")
+    sql = FilteredDf(
+        location=location, start_date=quarters[0], end_date=quarters[1]
+    ).df.reset_index(drop=True)
+    pd.testing.assert_frame_equal(
+        sql, memory[sql.columns], check_dtype=False, check_categorical=False
+    )
+    # The categories of the other dimensions are those observed in the rows
+    for category in DemographicCategory:
+        assert list(sql[category.value].cat.categories) == list(
+            memory[category.value].cat.categories
+        )
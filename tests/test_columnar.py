@@ -0,0 +1,118 @@
+"""
+`columnar()` decoded back into records, on its own and against the records
+format of the app.
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+from response_format import columnar
+
+
+def records(table: dict) -> list[dict]:
+    """The records of a `columnar()` table, with None for missing fields."""
+    columns = []
+    for field, values in zip(table["schema"], table["columns"]):
+        assert len(values) == table["length"]
+        dictionary = field.get("dictionary")
+        if dictionary is not None:
+            values = [
+                (
+                    None
+                    if index is None
+                    else (
+                        [dictionary[i] for i in index]
+                        if isinstance(index, list)
+                        else dictionary[index]
+                    )
+                )
+                for index in values
+            ]
+        columns.append(values)
+    names = [field["name"] for field in table["schema"]]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def filled(rows: list[dict]) -> list[dict]:
+    """`rows` with every field of any of them, None where missing."""
+    names = list(dict.fromkeys(name for row in rows for name in row))
+    return [{name: row.get(name) for name in names} for row in rows]
+
+
+RECORDS = [
+    {"group": "Black", "Stops": 120, "hover_text": ["Race=Black", "Stops=120"]},
+    {"group": "Black", "Stops": 80, "hover_text": ["Race=Black", "Stops=80"]},
+    {"group": None, "Stops": None, "hover_text": None, "annotation": "note"},
+    {"group": "White", "Stops": 3.5, "hover_text": ["Race=White", "Stops=3.5"]},
+]
+
+
+@pytest.mark.parametrize(
+    "rows",
+    [
+        [],
+        RECORDS,
+        # Distinct strings, which are kept as is
+        [{"label": "a"}, {"label": "b"}, {"label": None}],
+        # Not all strings
+        [{"value": "a"}, {"value": "a"}, {"value": 1}],
+    ],
+)
+def test_round_trip(rows):
+    assert records(columnar(rows)) == filled(rows)
+
+
+def test_dictionaries():
+    table = columnar(RECORDS)
+    schema = {field["name"]: field for field in table["schema"]}
+    assert [field["name"] for field in table["schema"]] == [
+        "group",
+        "Stops",
+        "hover_text",
+        "annotation",
+    ]
+    assert schema["group"]["dictionary"] == ["Black", "White"]
+    assert table["columns"][0] == [0, 0, None, 1]
+    assert "dictionary" not in schema["Stops"]
+    assert "dictionary" not in schema["annotation"]
+    assert table["columns"][2][0] == [0, 1]
+    assert table["columns"][2][1] == [0, 2]
+
+
+@pytest.fixture(scope="module")
+def client():
+    from main_fastapi import app
+
+    return TestClient(app, headers={"accept-encoding": "identity"})
+
+
+@pytest.mark.parametrize(
+    "path, params",
+    [
+        ("/stops/num-stops", {"location": "*"}),
+        ("/stops/num-stops", {"location": "22*"}),
+        (
+            "/stops/by-demographic-category",
+            {"location": "*", "demographic_category": "Race"},
+        ),
+        ("/stops/most-frequent-stops", {}),
+        ("/snapshot/annual-summary", {}),
+        ("/neighborhoods/searches-vs-frisks", {}),
+        ("/reasons/reasons-deo-impacts", {}),
+    ],
+)
+def test_matches_records(client, path, params):
+    expected = client.get(path, params=params)
+    response = client.get(path, params={**params, "format": "columnar"})
+    assert expected.status_code == response.status_code == 200
+    expected, response = expected.json(), response.json()
+    assert expected["figures"] or expected["tables"]
+    for name, figure in response["figures"].items():
+        for key in ["data", "trendlines"]:
+            assert records(figure[key]) == filled(expected["figures"][name][key])
+        assert figure["properties"] == expected["figures"][name]["properties"]
+    assert response["figures"].keys() == expected["figures"].keys()
+    assert {name: records(table) for name, table in response["tables"].items()} == {
+        name: filled(rows) for name, rows in expected["tables"].items()
+    }
+    for key in ["text", "geojsons", "data"]:
+        assert response[key] == expected[key]
@@ -0,0 +1,62 @@
+"""
+The process pool after one of its workers died. The endpoints are defined
+here, which the spawned workers import like the pages.
+"""
+
+import os
+import signal
+import threading
+import time
+
+import execution
+from execution import ExecutionRoute, start_process_pool, stop_process_pool
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+
+LOADED = []
+
+
+def warmup():
+    LOADED.append(os.getpid())
+
+
+router = APIRouter(route_class=ExecutionRoute)
+
+
+@router.get("/worker")
+def worker():
+    return {"pid": os.getpid(), "loaded": bool(LOADED)}
+
+
+@router.get("/slow")
+def slow():
+    time.sleep(5)
+    return {}
+
+
+def test_worker_death():
+    app = FastAPI()
+    app.include_router(router)
+    warmup()
+    start_process_pool(1, 4, warmup)
+    try:
+        client = TestClient(app)
+        first = client.get("/worker").json()
+        pid = next(iter(execution._pool.executor._processes))
+        assert first == {"pid": pid, "loaded": True}
+
+        timer = threading.Timer(0.5, os.kill, (pid, signal.SIGKILL))
+        timer.start()
+        response = client.get("/slow")
+        timer.join()
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+
+        # Spawned rather than forked from this process, running warmup()
+        executor = execution._pool.executor
+        assert executor._mp_context.get_start_method() == "spawn"
+        second = client.get("/worker").json()
+        assert second["pid"] != pid
+        assert second["loaded"]
+    finally:
+        stop_process_pool()
@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+from frame_cache import FrameCache
+
+
+def frame() -> pd.DataFrame:
+    return pd.DataFrame(
+        {"n_stopped": [1, 2, 3], "Race": pd.Categorical(["Black", "White", "Black"])}
+    )
+
+
+@pytest.mark.parametrize("hit", [False, True])
+def test_writes_leave_the_entry(hit):
+    cache = FrameCache(max_entries=2, max_bytes=2**20)
+    if hit:
+        cache.get("key", frame)
+    df = cache.get("key", frame)
+    df["n_stopped"] *= 10
+    df.loc[0, "Race"] = "White"
+    df.iloc[1, 0] = -1
+    df["share"] = df["n_stopped"] / 2
+    pd.testing.assert_frame_equal(cache.get("key", frame), frame())
+    assert cache.info().misses == 1
+
+
+def test_bounds():
+    nbytes = int(frame().memory_usage(index=True).sum())
+    cache = FrameCache(max_entries=2, max_bytes=2 * nbytes)
+    for key in ["a", "b", "a", "c"]:
+        cache.get(key, frame)
+    # "b" was the least recently used
+    assert cache.info() == (1, 3, 2, 2 * nbytes)
+    cache.get("b", frame)
+    assert cache.info().misses == 4
+    assert FrameCache(max_entries=2, max_bytes=nbytes - 1).get("a", frame) is not None
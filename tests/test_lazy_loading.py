@@ -0,0 +1,34 @@
+"""
+Importing the app loads no table, which is left to `warmup()` or the first
+request. Run in a fresh interpreter, since the other tests load them.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+
+@pytest.mark.parametrize("module", ["main_fastapi", "prerender"])
+def test_import_loads_no_table(module):
+    env = {
+        **os.environ,
+        "PYTHONPATH": os.pathsep.join([ROOT, os.path.join(ROOT, "deo_backend")]),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", f"import {module}"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    # The loaders of models.py print these
+    loaded = [
+        line
+        for line in result.stdout.splitlines()
+        if line.startswith(("SQLITE:", "CUBE:"))
+    ]
+    assert loaded == []
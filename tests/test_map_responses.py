@@ -0,0 +1,40 @@
+"""The map responses, whose GeoJSON features are made as they are streamed."""
+
+import figure_specs
+import pytest
+from fastapi.testclient import TestClient
+
+PATH = "/safety/safety-shootings-vs-stops-maps"
+
+
+@pytest.fixture(scope="module")
+def client():
+    from main_fastapi import app
+
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def test_features(client):
+    response = client.get(PATH, params={"detail": "low"})
+    assert response.status_code == 200
+    geojsons = response.json()["geojsons"]
+    assert [geojson["properties"]["map_key"] for geojson in geojsons] == [
+        "map_surge",
+        "map_deo",
+    ]
+    assert all(geojson["features"] for geojson in geojsons)
+
+
+def test_features_error(client, monkeypatch):
+    """Failing to make the first features is still a 500."""
+
+    def failing(*args):
+        raise OSError("can't read the geometry")
+
+    monkeypatch.setattr(figure_specs, "load_geometry", failing)
+    response = client.get(PATH, params={"detail": "medium"})
+    assert response.status_code == 500
+    monkeypatch.undo()
+    response = client.get(PATH, params={"detail": "medium"})
+    assert response.status_code == 200
+    assert response.json()["geojsons"][0]["features"]
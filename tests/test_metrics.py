@@ -0,0 +1,53 @@
+"""The labels of the requests in /metrics and /debug/timings."""
+
+import pytest
+from fastapi.testclient import TestClient
+
+
+@pytest.fixture(scope="module")
+def client():
+    from main_fastapi import app
+
+    return TestClient(app)
+
+
+def requests(client, route: str) -> float:
+    """The count of the requests of `route` in /metrics."""
+    prefix = f'deo_http_response_size_bytes_count{{route="{route}"}} '
+    for line in client.get("/metrics").text.splitlines():
+        if line.startswith(prefix):
+            return float(line[len(prefix) :])
+    return 0
+
+
+@pytest.mark.parametrize(
+    "path, route",
+    [
+        ("/stops/num-stops?location=22%2A", "/stops/num-stops"),
+        ("/geometry/police-districts?detail=low", "/geometry/police-districts"),
+        ("/debug/profiles/3", "/debug/profiles/{profile_id}"),
+        ("/debug/profiles/4", "/debug/profiles/{profile_id}"),
+        ("/nowhere/3", "other"),
+    ],
+)
+def test_route_label(client, path, route):
+    before = requests(client, route)
+    client.get(path)
+    assert requests(client, route) == before + 1
+
+
+def test_other_method(client):
+    before = requests(client, "/stops/num-stops")
+    assert client.post("/stops/num-stops").status_code == 405
+    assert requests(client, "/stops/num-stops") == before + 1
+
+
+def test_stage_times_route(client):
+    from main_fastapi import STAGE_TIMES
+
+    def count(route: str) -> int:
+        return STAGE_TIMES.summary().get(route, {}).get("total", {}).get("count", 0)
+
+    before = count("/debug/profiles/{profile_id}")
+    client.get("/debug/profiles/5")
+    assert count("/debug/profiles/{profile_id}") == before + 1
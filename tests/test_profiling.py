@@ -0,0 +1,125 @@
+"""
+The signed `X-Debug-Profile` header, valid for its path and query within
+SIGNATURE_TTL and only there, and the sampler of slow endpoints.
+"""
+
+import threading
+import time
+
+import profiling
+import pytest
+from fastapi.testclient import TestClient
+from profiling import SIGNATURE_TTL, is_signed, sign, signature
+
+SECRET = "test-secret"
+PATH = "/stops/num-stops"
+QUERY = b"location=22%2A&start_qyear=2024-Q1"
+
+
+@pytest.fixture
+def secret(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_SECRET", SECRET)
+
+
+def signed_at(timestamp: int, path: str = PATH, query: bytes = QUERY) -> str:
+    return f"{timestamp}.{signature(SECRET, str(timestamp), path, query)}"
+
+
+def test_signed(secret):
+    header = sign(f"{PATH}?{QUERY.decode()}", SECRET)
+    assert is_signed(header, PATH, QUERY)
+    assert is_signed(header.encode(), PATH, QUERY)
+    # The query is normalized
+    assert is_signed(header, PATH, b"start_qyear=2024-Q1&location=22%2A")
+
+
+def test_expired(secret):
+    now = int(time.time())
+    assert is_signed(signed_at(now - SIGNATURE_TTL + 5), PATH, QUERY)
+    assert not is_signed(signed_at(now - SIGNATURE_TTL - 1), PATH, QUERY)
+    assert not is_signed(signed_at(now + SIGNATURE_TTL + 1), PATH, QUERY)
+
+
+@pytest.mark.parametrize(
+    "path, query",
+    [
+        (PATH, b"location=22%2A&start_qyear=2023-Q1"),
+        (PATH, b"location=22%2A"),
+        (PATH, b""),
+        ("/stops/seasonal", QUERY),
+    ],
+)
+def test_replayed(secret, path, query):
+    assert not is_signed(sign(f"{PATH}?{QUERY.decode()}", SECRET), path, query)
+
+
+@pytest.mark.parametrize(
+    "header",
+    [
+        None,
+        "",
+        "nonsense",
+        f"{int(time.time())}.{'0' * 64}",
+        f"x{int(time.time())}.{'0' * 64}",
+    ],
+)
+def test_malformed(secret, header):
+    assert not is_signed(header, PATH, QUERY)
+
+
+def test_other_secret(secret):
+    assert not is_signed(sign(f"{PATH}?{QUERY.decode()}", "other"), PATH, QUERY)
+
+
+def test_without_secret():
+    assert profiling.PROFILE_SECRET is None
+    assert not is_signed(sign(f"{PATH}?{QUERY.decode()}", SECRET), PATH, QUERY)
+
+
+@pytest.fixture(scope="module")
+def client():
+    from main_fastapi import app
+
+    return TestClient(app)
+
+
+@pytest.mark.parametrize("path", ["/debug/profiles", "/debug/timings"])
+def test_debug_routes(client, monkeypatch, path):
+    assert client.get(path).status_code == 404
+    monkeypatch.setattr(profiling, "PROFILE_SECRET", SECRET)
+    assert client.get(path).status_code == 403
+    headers = {profiling.PROFILE_HEADER: sign(path, SECRET)}
+    assert client.get(path, headers=headers).status_code == 200
+    assert client.get(path + "?other=1", headers=headers).status_code == 403
+
+
+def busy(seconds: float):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+
+def test_sampler():
+    sampler = profiling.SlowCallSampler(threshold=0.001, interval=0.0005)
+    thread_id = threading.get_ident()
+    stacks = sampler.start(thread_id)
+    busy(0.05)
+    sampler.stop(thread_id)
+    assert any("busy" in stack for stack in stacks)
+
+
+def test_sampler_stop():
+    """No sample is added once stop() returns, e.g. from the next request."""
+    sampler = profiling.SlowCallSampler(threshold=0, interval=0.05)
+    thread_id = threading.get_ident()
+    stacks = sampler.start(thread_id)
+    # Stopped while the sampler sleeps between two samples
+    time.sleep(0.01)
+    sampler.stop(thread_id)
+    stopped = dict(stacks)
+    # The next request of the same thread, running when the sampler wakes
+    next_stacks = sampler.start(thread_id)
+    time.sleep(0.12)
+    sampler.stop(thread_id)
+    assert stacks == stopped
+    assert next_stacks
@@ -0,0 +1,211 @@
+import asyncio
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from metrics import find_middleware
+from response_cache import ResponseCacheMiddleware
+
+BIG = {"values": list(range(500))}
+SMALL = {"value": 1}
+
+
+@pytest.fixture
+def app():
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.get("/big")
+    def big(n: int = 0):
+        app.state.calls += 1
+        return {**BIG, "n": n}
+
+    @app.get("/small")
+    def small():
+        app.state.calls += 1
+        return SMALL
+
+    @app.get("/streamed")
+    def streamed():
+        app.state.calls += 1
+        return StreamingResponse(
+            iter([b'{"values":', json.dumps(BIG["values"]).encode(), b"}"]),
+            media_type="application/json",
+        )
+
+    @app.get("/failing")
+    def failing():
+        app.state.calls += 1
+        return StreamingResponse(iter([b"{}"]), status_code=404)
+
+    app.add_middleware(
+        ResponseCacheMiddleware,
+        paths=["/big", "/small", "/streamed", "/failing"],
+        version="test",
+    )
+    return app
+
+
+@pytest.fixture
+def client(app):
+    return TestClient(app, headers={"accept-encoding": "identity"})
+
+
+def cache(client) -> ResponseCacheMiddleware:
+    # After a request, which builds the middleware stack
+    return find_middleware(client.app, ResponseCacheMiddleware)
+
+
+def test_hit(client, app):
+    first = client.get("/big", params={"n": 1})
+    second = client.get("/big", params={"n": 1})
+    assert first.status_code == second.status_code == 200
+    assert first.json() == second.json() == {**BIG, "n": 1}
+    assert first.headers["etag"] == second.headers["etag"]
+    assert int(second.headers["content-length"]) == len(second.content)
+    assert app.state.calls == 1
+    assert cache(client).info().hits == 1
+
+
+def test_query_is_normalized(client, app):
+    client.get("/big?n=2&other=a")
+    client.get("/big?other=a&n=2")
+    assert app.state.calls == 1
+
+
+def test_inputs_are_cached_apart(client, app):
+    assert client.get("/big", params={"n": 1}).json()["n"] == 1
+    assert client.get("/big", params={"n": 2}).json()["n"] == 2
+    assert app.state.calls == 2
+
+
+@pytest.mark.parametrize(
+    "if_none_match",
+    ["{etag}", "W/{etag}", '"other", {etag}', "*"],
+)
+def test_not_modified(client, if_none_match):
+    etag = client.get("/big").headers["etag"]
+    response = client.get(
+        "/big", headers={"if-none-match": if_none_match.format(etag=etag)}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert cache(client).info().not_modified == 1
+
+
+def test_modified(client):
+    client.get("/big")
+    response = client.get("/big", headers={"if-none-match": '"other"'})
+    assert response.status_code == 200
+    assert response.json() == {**BIG, "n": 0}
+
+
+def test_gzip(client):
+    plain = client.get("/big")
+    response = client.get("/big", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    # Each encoding has its own ETag
+    assert response.headers["etag"] != plain.headers["etag"]
+    assert response.json() == plain.json()
+    again = client.get("/big", headers={"accept-encoding": "gzip"})
+    assert again.headers["etag"] == response.headers["etag"]
+
+
+def test_brotli(client):
+    pytest.importorskip("brotli")
+    response = client.get("/big", headers={"accept-encoding": "gzip, br"})
+    assert response.headers["content-encoding"] == "br"
+    assert response.json() == {**BIG, "n": 0}
+
+
+def test_gzip_refused(client):
+    response = client.get("/big", headers={"accept-encoding": "gzip;q=0"})
+    assert "content-encoding" not in response.headers
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get("/small", headers={"accept-encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.json() == SMALL
+
+
+def test_streamed_miss(client, app):
+    # Sent as it comes, so without the headers of a complete body
+    first = client.get("/streamed", headers={"accept-encoding": "gzip"})
+    assert "etag" not in first.headers
+    assert first.headers["content-encoding"] == "gzip"
+    assert first.json() == BIG
+    # Cached once complete
+    second = client.get("/streamed", headers={"accept-encoding": "gzip"})
+    assert "etag" in second.headers
+    assert "content-length" in second.headers
+    assert second.json() == BIG
+    assert app.state.calls == 1
+
+
+def test_errors_are_not_cached(client, app):
+    assert client.get("/failing").status_code == 404
+    assert client.get("/failing").status_code == 404
+    assert app.state.calls == 2
+
+
+def test_clear(client, app):
+    client.get("/big")
+    cache(client).clear()
+    client.get("/big")
+    assert app.state.calls == 2
+
+
+def test_failed_stream(app):
+    """A stream raising once started is neither complete nor cached."""
+
+    def chunks():
+        yield b'{"values":'
+        raise ValueError("while streaming")
+
+    @app.get("/broken")
+    def broken():
+        app.state.calls += 1
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    client = TestClient(app)
+    client.get("/small")
+    cache(client).paths.add("/broken")
+    for _ in range(2):
+        # Raised in an exception group by the task group of the response
+        with pytest.raises(Exception):
+            client.get("/broken")
+    assert app.state.calls == 3
+    assert cache(client).info().entries == 1
+
+
+def test_unfinished_stream():
+    """A stream that ends without its last chunk, e.g. on a disconnect."""
+    calls = 0
+
+    async def unfinished(scope, receive, send):
+        nonlocal calls
+        calls += 1
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b"{", "more_body": True})
+
+    middleware = ResponseCacheMiddleware(unfinished, paths=["/"], version="test")
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "query_string": b"",
+        "headers": [],
+    }
+
+    async def send(message):
+        pass
+
+    for _ in range(2):
+        asyncio.run(middleware(scope, None, send))
+    assert calls == 2
+    assert middleware.info().entries == 0